@@ -1,25 +1,29 @@
 from flask import Flask, redirect, url_for
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager
 from config import Config
+from app.db_routing import RoutingSession, REPLICA_BIND, init_routing
 import os
 
-db = SQLAlchemy()
-migrate = Migrate()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 login = LoginManager()
 login.login_view = "auth.login"
 
-celery_app = None  # sẽ được set trong create_app
-
-
 def create_app(config_class=Config):
-    app = Flask(__name__)
+    # QUIZ_INSTANCE_PATH: đặt instance/ (DB, chứng chỉ, snapshot) ngoài thư mục code
+    app = Flask(__name__, instance_path=os.environ.get("QUIZ_INSTANCE_PATH"))
     app.config.from_object(config_class)
 
+    # Read-replica (optional): route @read_only đọc từ bind "replica"
+    replica_uri = app.config.get("REPLICA_DATABASE_URI")
+    if replica_uri:
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        binds[REPLICA_BIND] = replica_uri
+        app.config["SQLALCHEMY_BINDS"] = binds
+
     # Init extensions
     db.init_app(app)
-    migrate.init_app(app, db)
+    init_routing(app)
     login.init_app(app)
 
     # Tạo thư mục certificate
@@ -30,17 +34,16 @@ def create_app(config_class=Config):
     # Register blueprints
     from app.auth import auth_bp
     from app.quiz import quiz_bp
+    from app.api import api_bp
 
     app.register_blueprint(auth_bp, url_prefix="/auth")
     app.register_blueprint(quiz_bp, url_prefix="/quiz")
+    app.register_blueprint(api_bp, url_prefix="/api")
 
-    # Celery (optional – fallback nếu chưa cài)
-    try:
-        from app.celery_app import make_celery
-        global celery_app
-        celery_app = make_celery(app)
-    except Exception:
-        print("⚠ Celery chưa cài, background task sẽ chạy sync.")
+    # CLI: flask archive-submissions, ..., flask db (Flask-Migrate load khi gọi)
+    # Celery: tạo lần đầu có task cần gửi (app/celery_app.py)
+    from app.commands import register_commands
+    register_commands(app)
 
     # Route /
     @app.route("/")
@@ -0,0 +1,253 @@
+"""
+Phòng chờ khi mở đề (admission control) cho start_quiz.
+
+Mỗi quiz có một token bucket: admission_rate học sinh / giây, dồn tối đa
+admission_burst. Người đến sau khi hết token lấy số thứ tự (ticket) và chờ;
+mỗi token nạp lại cho số tiếp theo vào (FIFO), nên vị trí trong hàng chờ
+= ticket - số đã được vào.
+
+Trạng thái dùng chung giữa các worker qua backend:
+    ADMISSION_BACKEND = "memory"  → dict trong process (dev / 1 worker)
+    ADMISSION_BACKEND = "redis"   → Lua script atomic trên ADMISSION_REDIS_URL
+
+Đã vào thì giữ quyền trong thời gian làm bài + ADMISSION_GRACE_SECONDS,
+nộp bài xong thì nhả (lượt sau phải xếp hàng lại). Quyền vào chỉ chặn lúc
+mở đề, nộp bài luôn được nhận. Số thứ tự không được poll lại trong
+ADMISSION_TICKET_SECONDS (+ thời gian chờ ước lượng) coi như đã rời hàng.
+Ticket và quyền vào hết hạn được dọn mỗi _PRUNE_SECONDS.
+"""
+import math
+import threading
+import time
+
+from flask import current_app
+
+_PRUNE_SECONDS = 10
+
+
+class Admission:
+    def __init__(self, admitted, position=0, admitted_at=None, rate=None):
+        self.admitted = admitted
+        self.position = position
+        self.admitted_at = admitted_at
+        self.rate = rate
+
+    @property
+    def retry_after(self):
+        """Ước lượng số giây phải chờ (để client poll hợp lý)."""
+        if self.admitted or not self.rate:
+            return 0
+        return max(1, math.ceil(self.position / self.rate))
+
+
+# =============================
+#           BACKENDS
+# =============================
+class _QuizState:
+    __slots__ = ("tokens", "last", "next_ticket", "served", "tickets", "admitted", "pruned")
+
+    def __init__(self, burst, now):
+        self.tokens = float(burst)
+        self.last = now
+        self.next_ticket = 1
+        self.served = 0
+        self.tickets = {}    # user_id → (ticket, expires_at)
+        self.admitted = {}   # user_id → (admitted_at, expires_at)
+        self.pruned = now
+
+
+class MemoryAdmissionBackend:
+    """Trạng thái trong process: chỉ đúng khi chạy 1 worker."""
+
+    def __init__(self):
+        self._quizzes = {}
+        self._lock = threading.Lock()
+
+    def enter(self, quiz_id, user_id, rate, burst, ttl, ticket_ttl, now):
+        with self._lock:
+            state = self._quizzes.get(quiz_id)
+            if state is None:
+                state = self._quizzes[quiz_id] = _QuizState(burst, now)
+            if now - state.pruned >= _PRUNE_SECONDS:
+                self._drop_expired(state, now)
+
+            granted = state.admitted.get(user_id)
+            if granted and granted[1] > now:
+                return True, 0, granted[0]
+
+            state.tokens = min(burst, state.tokens + max(0.0, now - state.last) * rate)
+            state.last = now
+
+            if user_id in state.tickets:
+                ticket = state.tickets[user_id][0]
+            else:
+                ticket = state.next_ticket
+                state.next_ticket += 1
+
+            served = min(int(state.tokens), state.next_ticket - 1 - state.served)
+            state.served += served
+            state.tokens -= served
+
+            if ticket <= state.served:
+                state.tickets.pop(user_id, None)
+                state.admitted[user_id] = (now, now + ttl)
+                return True, 0, now
+            position = ticket - state.served
+            state.tickets[user_id] = (ticket, now + ticket_ttl + position / rate)
+            return False, position, None
+
+    @staticmethod
+    def _drop_expired(state, now):
+        for entries in (state.tickets, state.admitted):
+            for uid in [u for u, (_, exp) in entries.items() if exp <= now]:
+                del entries[uid]
+        state.pruned = now
+
+    def release(self, quiz_id, user_id):
+        with self._lock:
+            state = self._quizzes.get(quiz_id)
+            if state is not None:
+                state.admitted.pop(user_id, None)
+
+
+_ENTER_SCRIPT = """
+local now = tonumber(ARGV[5])
+local pruned = tonumber(redis.call('HGET', KEYS[1], 'pruned')) or 0
+if now - pruned >= tonumber(ARGV[7]) then
+    for i = 2, 3 do
+        local entries = redis.call('HGETALL', KEYS[i])
+        for j = 1, #entries, 2 do
+            local exp = tonumber(string.match(entries[j + 1], ':([^:]+)$')) or 0
+            if exp <= now then redis.call('HDEL', KEYS[i], entries[j]) end
+        end
+    end
+    redis.call('HSET', KEYS[1], 'pruned', ARGV[5])
+end
+
+local granted = redis.call('HGET', KEYS[3], ARGV[1])
+if granted then
+    local at, exp = string.match(granted, '([^:]+):([^:]+)')
+    if tonumber(exp) > now then return {1, 0, at} end
+    redis.call('HDEL', KEYS[3], ARGV[1])
+end
+
+local rate = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local ttl = tonumber(ARGV[4])
+local st = redis.call('HMGET', KEYS[1], 'tokens', 'last', 'next', 'served')
+local tokens = tonumber(st[1]) or burst
+local last = tonumber(st[2]) or now
+local nxt = tonumber(st[3]) or 1
+local served = tonumber(st[4]) or 0
+tokens = math.min(burst, tokens + math.max(0, now - last) * rate)
+
+local entry = redis.call('HGET', KEYS[2], ARGV[1])
+local ticket = entry and tonumber(string.match(entry, '^([^:]+)'))
+if not ticket then
+    ticket = nxt
+    nxt = nxt + 1
+end
+
+local n = math.min(math.floor(tokens), nxt - 1 - served)
+served = served + n
+tokens = tokens - n
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'last', ARGV[5], 'next', nxt, 'served', served)
+for i = 1, 3 do redis.call('EXPIRE', KEYS[i], math.ceil(ttl * 2)) end
+
+if ticket <= served then
+    redis.call('HDEL', KEYS[2], ARGV[1])
+    redis.call('HSET', KEYS[3], ARGV[1], ARGV[5] .. ':' .. tostring(now + ttl))
+    return {1, 0, ARGV[5]}
+end
+local position = ticket - served
+redis.call('HSET', KEYS[2], ARGV[1], ticket .. ':' .. tostring(now + tonumber(ARGV[6]) + position / rate))
+return {0, position}
+"""
+
+
+class RedisAdmissionBackend:
+    """Trạng thái trong Redis, mỗi lần vào là 1 Lua script (atomic giữa các worker)."""
+
+    def __init__(self, url, prefix="admission"):
+        # chỉ import khi dùng backend redis: app khởi động không kéo theo redis
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("Cần cài redis để dùng ADMISSION_BACKEND = 'redis'.") from None
+        self._client = redis.Redis.from_url(url)
+        self._enter = self._client.register_script(_ENTER_SCRIPT)
+        self._prefix = prefix
+
+    def _keys(self, quiz_id):
+        base = f"{self._prefix}:{quiz_id}"
+        return [f"{base}:state", f"{base}:tickets", f"{base}:admitted"]
+
+    def enter(self, quiz_id, user_id, rate, burst, ttl, ticket_ttl, now):
+        result = self._enter(
+            keys=self._keys(quiz_id),
+            args=[user_id, rate, burst, ttl, repr(now), ticket_ttl, _PRUNE_SECONDS],
+        )
+        if result[0]:
+            return True, 0, float(result[2])
+        return False, int(result[1]), None
+
+    def release(self, quiz_id, user_id):
+        self._client.hdel(self._keys(quiz_id)[2], user_id)
+
+
+def get_backend():
+    """Backend theo config, tạo 1 lần cho mỗi app."""
+    app = current_app._get_current_object()
+    backend = app.extensions.get("admission")
+    if backend is None:
+        kind = app.config.get("ADMISSION_BACKEND", "memory")
+        if kind == "redis":
+            backend = RedisAdmissionBackend(
+                app.config.get("ADMISSION_REDIS_URL") or app.config.get("CELERY_BROKER_URL")
+            )
+        else:
+            backend = MemoryAdmissionBackend()
+        app.extensions["admission"] = backend
+    return backend
+
+
+# =============================
+#             API
+# =============================
+def _ttl(time_limit):
+    if time_limit:
+        return time_limit * 60 + current_app.config.get("ADMISSION_GRACE_SECONDS", 300)
+    return current_app.config.get("ADMISSION_TTL_SECONDS", 3 * 3600)
+
+
+def admit(quiz_id, user_id, rate, burst=None, time_limit=None):
+    """Cho user vào quiz nếu còn lượt, ngược lại trả về vị trí trong hàng chờ."""
+    if not rate:
+        return Admission(True)
+    if not burst:
+        burst = max(1, math.ceil(rate))
+
+    ticket_ttl = current_app.config.get("ADMISSION_TICKET_SECONDS", 60)
+    admitted, position, admitted_at = get_backend().enter(
+        quiz_id, user_id, float(rate), int(burst), _ttl(time_limit), ticket_ttl, time.time()
+    )
+    return Admission(admitted, position, admitted_at, rate)
+
+
+def admit_quiz(quiz, user_id):
+    return admit(quiz.id, user_id, quiz.admission_rate, quiz.admission_burst, quiz.time_limit)
+
+
+def release(quiz_id, user_id):
+    """Nhả quyền vào sau khi nộp bài."""
+    get_backend().release(quiz_id, user_id)
+
+
+def remaining_seconds(time_limit, admission):
+    """Thời gian làm bài còn lại, tính từ lúc được vào (không tính lúc chờ)."""
+    if not time_limit:
+        return None
+    if admission.admitted_at is None:
+        return time_limit * 60
+    elapsed = time.time() - admission.admitted_at
+    return max(0, round(time_limit * 60 - elapsed))
@@ -0,0 +1,310 @@
+from functools import wraps
+from datetime import datetime
+
+from flask import jsonify, request, url_for, abort, current_app, make_response
+from flask_login import current_user
+from werkzeug.exceptions import HTTPException
+
+from app import db
+from app.api import api_bp
+from app.models import Quiz, Choice, Submission
+from app.grading import grade_submission
+from app.histograms import percentile
+from app.monitor import track_started
+from app.practice import draw_for_user
+from app.question_pool import load_questions
+from app.snapshots import get_snapshot
+from app.admission import admit_quiz, release
+from app.tasks import grade_essay_submission
+
+
+def api_login_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not current_user.is_authenticated:
+            abort(401)
+        return f(*args, **kwargs)
+    return decorated
+
+
+@api_bp.errorhandler(HTTPException)
+def handle_http_error(e):
+    return jsonify(error=e.name, message=e.description), e.code
+
+
+def _get_quiz_or_404(quiz_id):
+    return Quiz.query.filter_by(id=quiz_id, is_active=True, deleted_at=None).first_or_404()
+
+
+def _get_own_attempt_or_404(attempt_id):
+    attempt = Submission.query.get_or_404(attempt_id)
+    if attempt.user_id != current_user.id:
+        abort(403)
+    return attempt
+
+
+def _remaining_seconds(quiz, attempt):
+    if not quiz.time_limit:
+        return None
+    elapsed = (datetime.utcnow() - attempt.created_at).total_seconds()
+    return max(0, int(quiz.time_limit * 60 - elapsed))
+
+
+def _past_deadline(quiz, attempt):
+    """Hết time_limit (cộng thời gian trễ mạng cho phép) → không nhận đáp án mới."""
+    if not quiz.time_limit:
+        return False
+    elapsed = (datetime.utcnow() - attempt.created_at).total_seconds()
+    grace = current_app.config.get("API_DEADLINE_GRACE_SECONDS", 30)
+    return elapsed > quiz.time_limit * 60 + grace
+
+
+def _waiting_response(admission):
+    response = jsonify(
+        error="Too Many Requests",
+        message="Đang trong phòng chờ, thử lại sau.",
+        position=admission.position,
+        retry_after=admission.retry_after,
+    )
+    response.headers["Retry-After"] = str(admission.retry_after)
+    return response, 429
+
+
+def _attempt_json(quiz, attempt):
+    return {
+        "attempt_id": attempt.id,
+        "quiz_id": quiz.id,
+        "question_ids": attempt.question_ids or [],
+        "answers": attempt.draft_answers or {},
+        "bank_version": quiz.bank_version or 0,
+        "questions_url": url_for(
+            "api.quiz_questions", quiz_id=quiz.id, attempt=attempt.id, v=quiz.bank_version or 0
+        ),
+        "remaining_seconds": _remaining_seconds(quiz, attempt),
+        "finished": attempt.finished_at is not None,
+    }
+
+
+def _result_json(quiz, attempt):
+    data = {
+        "attempt_id": attempt.id,
+        "quiz_id": quiz.id,
+        "score": attempt.score,
+        "correct_answers": attempt.correct_answers,
+        "total_questions": attempt.total_questions,
+        "time_spent": attempt.time_spent,
+        "passed": attempt.score >= quiz.pass_score,
+        "percentile": percentile(quiz.id, attempt.score),
+        "finished_at": attempt.finished_at.isoformat() if attempt.finished_at else None,
+    }
+    if quiz.show_explanation:
+        data["answers"] = [
+            {
+                "question_id": a.question_id,
+                "user_answer": a.response,
+                "choice_id": a.choice_id,
+                "is_correct": a.is_correct,
+                "score": a.score,
+                "checked": a.checked,
+            }
+            for a in attempt.answers
+        ]
+    return data
+
+
+# =============================
+#       QUESTION PAYLOAD
+# =============================
+def _questions_payload(quiz, question_ids):
+    """Các câu đã rút cho lượt làm, theo thứ tự rút (không kèm đáp án đúng)."""
+    questions = load_questions(quiz, question_ids)
+    if get_snapshot(quiz) is not None:
+        choices_by_q = {q.id: q.choices for q in questions}
+    else:
+        choices_by_q = {}
+        rows = (
+            Choice.query.filter(Choice.question_id.in_([q.id for q in questions]))
+            .order_by(Choice.id)
+            .all()
+        )
+        for c in rows:
+            choices_by_q.setdefault(c.question_id, []).append(c)
+
+    return {
+        "quiz_id": quiz.id,
+        "bank_version": quiz.bank_version or 0,
+        "questions": [
+            {
+                "id": q.id,
+                "type": q.type,
+                "content": q.content,
+                "difficulty": q.difficulty,
+                "time_limit": q.time_limit,
+                # fill_in: choices là đáp án chấp nhận → không gửi cho client
+                "choices": [
+                    {"id": c.id, "content": c.content}
+                    for c in choices_by_q.get(q.id, [])
+                ] if q.type in ("mcq", "true_false") else [],
+            }
+            for q in questions
+        ],
+    }
+
+
+def _open_attempt(quiz):
+    """Lượt làm đang mở của user cho quiz: ?attempt=<id>, không có thì lượt mới nhất."""
+    query = Submission.query.filter_by(
+        user_id=current_user.id, quiz_id=quiz.id, finished_at=None
+    )
+    attempt_id = request.args.get("attempt", type=int)
+    if attempt_id is not None:
+        query = query.filter_by(id=attempt_id)
+    return query.order_by(Submission.id.desc()).first()
+
+
+@api_bp.route("/quizzes/<int:quiz_id>/questions")
+@api_login_required
+def quiz_questions(quiz_id):
+    """
+    Câu hỏi của lượt làm đang mở (chỉ các câu đã rút), qua phòng chờ như lúc
+    bắt đầu. Payload bất biến theo (lượt làm, bank_version) → strong ETag.
+    ?v=<bank_version> đúng bản hiện tại → cache dài hạn (immutable),
+    không có / lệch version → client phải revalidate (304 nếu chưa đổi).
+    """
+    quiz = _get_quiz_or_404(quiz_id)
+    admission = admit_quiz(quiz, current_user.id)
+    if not admission.admitted:
+        return _waiting_response(admission)
+
+    attempt = _open_attempt(quiz)
+    if attempt is None:
+        abort(409, "Cần bắt đầu lượt làm trước khi tải câu hỏi.")
+    if _past_deadline(quiz, attempt):
+        abort(409, "Đã hết giờ làm bài.")
+
+    # created_at: id quiz có thể được dùng lại sau khi purge
+    version = quiz.bank_version or 0
+    created = int(quiz.created_at.timestamp()) if quiz.created_at else 0
+    etag = f"quiz-{quiz.id}-{created}-v{version}-a{attempt.id}"
+
+    # payload riêng từng user → không cho proxy / CDN dùng chung
+    if request.args.get("v", type=int) == version:
+        max_age = current_app.config.get("API_QUESTIONS_MAX_AGE", 31536000)
+        cache_control = f"private, max-age={max_age}, immutable"
+    else:
+        cache_control = "private, no-cache"
+
+    # revalidate trước khi load câu hỏi
+    if request.if_none_match.contains(etag):
+        response = make_response("", 304)
+    else:
+        response = jsonify(_questions_payload(quiz, attempt.question_ids or []))
+
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+# =============================
+#       ATTEMPT LIFECYCLE
+# =============================
+@api_bp.route("/quizzes/<int:quiz_id>/attempts", methods=["POST"])
+@api_login_required
+def start_attempt(quiz_id):
+    quiz = _get_quiz_or_404(quiz_id)
+
+    # exam mode: không cho làm lại, lượt đang dở thì trả lại lượt đó
+    if quiz.mode == "exam":
+        existing = Submission.query.filter_by(
+            user_id=current_user.id, quiz_id=quiz.id
+        ).first()
+        if existing and existing.finished_at is not None:
+            abort(409, "Bài thi này đã được nộp.")
+        if existing:
+            return jsonify(_attempt_json(quiz, existing))
+
+    admission = admit_quiz(quiz, current_user.id)
+    if not admission.admitted:
+        return _waiting_response(admission)
+
+    attempt = Submission(
+        user_id=current_user.id,
+        quiz_id=quiz.id,
+        question_ids=draw_for_user(quiz, current_user.id),
+        draft_answers={},
+    )
+    db.session.add(attempt)
+    db.session.commit()
+    track_started(quiz, current_user.id)
+    return jsonify(_attempt_json(quiz, attempt)), 201
+
+
+@api_bp.route("/attempts/<int:attempt_id>")
+@api_login_required
+def get_attempt(attempt_id):
+    attempt = _get_own_attempt_or_404(attempt_id)
+    return jsonify(_attempt_json(attempt.quiz, attempt))
+
+
+@api_bp.route("/attempts/<int:attempt_id>/answers", methods=["PUT", "PATCH"])
+@api_login_required
+def save_answers(attempt_id):
+    attempt = _get_own_attempt_or_404(attempt_id)
+    if attempt.finished_at is not None:
+        abort(409, "Bài đã nộp, không thể sửa.")
+    if _past_deadline(attempt.quiz, attempt):
+        abort(409, "Đã hết giờ làm bài, chỉ có thể nộp bài.")
+
+    data = request.get_json(silent=True) or {}
+    answers = data.get("answers")
+    if not isinstance(answers, dict):
+        abort(400, "Cần trường 'answers': {question_id: answer}.")
+
+    allowed = {str(qid) for qid in attempt.question_ids or []}
+    draft = dict(attempt.draft_answers or {})
+    for qid, value in answers.items():
+        if str(qid) not in allowed:
+            abort(400, f"Câu hỏi {qid} không thuộc lượt làm này.")
+        draft[str(qid)] = None if value is None else str(value)
+
+    # gán dict mới để SQLAlchemy nhận ra cột JSON đã đổi
+    attempt.draft_answers = draft
+    db.session.commit()
+    return jsonify(_attempt_json(attempt.quiz, attempt))
+
+
+@api_bp.route("/attempts/<int:attempt_id>/submit", methods=["POST"])
+@api_login_required
+def submit_attempt(attempt_id):
+    attempt = _get_own_attempt_or_404(attempt_id)
+    quiz = attempt.quiz
+    if attempt.finished_at is not None:
+        abort(409, "Bài đã nộp.")
+
+    # nộp sau giờ vẫn nhận: nháp chỉ gồm đáp án lưu trước hạn (save_answers chặn sau hạn)
+    questions = load_questions(quiz, attempt.question_ids or [])
+    draft = attempt.draft_answers or {}
+    user_answers = {q.id: draft.get(str(q.id)) for q in questions}
+
+    time_spent = int((datetime.utcnow() - attempt.created_at).total_seconds())
+    if quiz.time_limit:
+        time_spent = min(time_spent, quiz.time_limit * 60)
+    attempt.time_spent = time_spent
+    has_essay = grade_submission(attempt, questions, user_answers)
+    db.session.commit()
+    if quiz.admission_rate:
+        release(quiz.id, current_user.id)
+
+    if has_essay:
+        grade_essay_submission(attempt.id)
+
+    return jsonify(_result_json(quiz, attempt))
+
+
+@api_bp.route("/attempts/<int:attempt_id>/result")
+@api_login_required
+def attempt_result(attempt_id):
+    attempt = _get_own_attempt_or_404(attempt_id)
+    if attempt.finished_at is None:
+        abort(409, "Bài chưa nộp.")
+    return jsonify(_result_json(attempt.quiz, attempt))
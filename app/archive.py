@@ -0,0 +1,402 @@
+"""
+Lưu trữ lạnh (cold storage) cho submissions/answers cũ.
+
+Dữ liệu được chuyển khỏi DB sang file nén theo cột, chia partition theo
+quiz và tháng. Mỗi lô archive ghi một part mới (tên theo id submission nhỏ
+nhất của part), không đọc / ghi lại cả partition:
+
+    instance/<ARCHIVE_FOLDER>/quiz_<id>/<YYYY-MM>/submissions-<id>.parquet
+    instance/<ARCHIVE_FOLDER>/quiz_<id>/<YYYY-MM>/answers-<id>.parquet
+
+(file submissions.parquet / answers.parquet của layout cũ vẫn đọc được).
+Chạy lại sau khi lỗi giữa chừng có thể ghi trùng dòng → dedupe khi đọc.
+
+Nếu chưa cài pyarrow thì fallback sang CSV nén gzip (.csv.gz).
+Bảng `archived_submissions` giữ index nhỏ (id → partition) để đọc lại.
+"""
+import csv
+import gzip
+import os
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+from operator import itemgetter
+
+from flask import current_app
+from sqlalchemy import or_
+
+from app import db
+from app.models import (
+    Submission,
+    Answer,
+    Quiz,
+    User,
+    ArchivedSubmission,
+)
+
+NULL_MARKER = "\\N"
+
+
+# =============================
+#        FILE FORMAT
+# =============================
+def _columns(model):
+    return list(model.__table__.columns)
+
+
+def _encode(value):
+    if value is None:
+        return NULL_MARKER
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+def _decode(column, raw):
+    if raw == NULL_MARKER:
+        return None
+
+    python_type = column.type.python_type
+    if python_type is bool:
+        return raw == "1"
+    if python_type is datetime:
+        return datetime.fromisoformat(raw)
+    if python_type is bytes:
+        return bytes.fromhex(raw)
+    if python_type in (int, float):
+        return python_type(raw)
+    return raw
+
+
+@lru_cache(maxsize=None)
+def _parquet():
+    """pyarrow.parquet nếu đã cài, None nếu chưa (chỉ import khi đọc / ghi archive)."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+    return pq
+
+
+def _file_path(partition_dir, name, ext):
+    return os.path.join(partition_dir, f"{name}.{ext}")
+
+
+def _part_files(partition_dir, table):
+    """Mọi part của bảng trong partition: <table>-<id>.<ext> và <table>.<ext> (layout cũ)."""
+    if not os.path.isdir(partition_dir):
+        return []
+    pattern = re.compile(rf"^{table}(-\d+)?\.(parquet|csv\.gz)$")
+    return sorted(
+        os.path.join(partition_dir, name)
+        for name in os.listdir(partition_dir)
+        if pattern.match(name)
+    )
+
+
+def _write_rows(partition_dir, name, model, rows):
+    os.makedirs(partition_dir, exist_ok=True)
+    columns = _columns(model)
+    pq = _parquet()
+
+    if pq is not None:
+        import pyarrow as pa
+
+        path = _file_path(partition_dir, name, "parquet")
+        tmp_path = path + ".tmp"
+        data = {c.name: [r.get(c.name) for r in rows] for c in columns}
+        pq.write_table(pa.table(data), tmp_path, compression="zstd")
+    else:
+        path = _file_path(partition_dir, name, "csv.gz")
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow([c.name for c in columns])
+            for r in rows:
+                writer.writerow([_encode(r.get(c.name)) for c in columns])
+
+    # ghi file tạm rồi rename → reader không bao giờ thấy file ghi dở
+    os.replace(tmp_path, path)
+
+    # đổi format (csv ↔ parquet) thì xóa file cũ
+    for ext in ("parquet", "csv.gz"):
+        other = _file_path(partition_dir, name, ext)
+        if other != path and os.path.exists(other):
+            os.remove(other)
+
+
+@lru_cache(maxsize=32)
+def _read_rows_cached(path, mtime_ns, tablename):
+    model = Submission if tablename == Submission.__tablename__ else Answer
+    columns = {c.name: c for c in _columns(model)}
+
+    if path.endswith(".parquet"):
+        pq = _parquet()
+        if pq is None:
+            raise RuntimeError("Cần cài pyarrow để đọc archive parquet: " + path)
+        return tuple(pq.read_table(path).to_pylist())
+
+    with gzip.open(path, "rt", newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        return tuple(
+            {name: _decode(columns[name], raw) for name, raw in zip(header, row)}
+            for row in reader
+        )
+
+
+# =============================
+#          PARTITION
+# =============================
+def _archive_root():
+    folder = current_app.config.get("ARCHIVE_FOLDER", "archive")
+    return os.path.join(current_app.instance_path, folder)
+
+
+def partition_key(created_at):
+    return (created_at or datetime.utcnow()).strftime("%Y-%m")
+
+
+def _partition_dir(quiz_id, partition):
+    return os.path.join(_archive_root(), f"quiz_{quiz_id}", partition)
+
+
+def _partition_rows(partition_dir, table, model):
+    """Dòng của bảng trong partition (mọi part), đã dedupe."""
+    parts = tuple(
+        (path, os.stat(path).st_mtime_ns) for path in _part_files(partition_dir, table)
+    )
+    return _partition_rows_cached(parts, model.__tablename__)
+
+
+@lru_cache(maxsize=32)
+def _partition_rows_cached(parts, tablename):
+    model = Submission if tablename == Submission.__tablename__ else Answer
+    # answer: khóa theo (submission_id, id) — id answer không phải AUTOINCREMENT
+    key = itemgetter("id") if model is Submission else itemgetter("submission_id", "id")
+    rows = {}
+    for path, mtime_ns in parts:
+        for r in _read_rows_cached(path, mtime_ns, tablename):
+            rows[key(r)] = r
+    return tuple(rows.values())
+
+
+def _row_dict(obj):
+    return {c.name: getattr(obj, c.name) for c in _columns(type(obj))}
+
+
+# =============================
+#           ARCHIVE
+# =============================
+def archive_submissions(retention_days=None, include_inactive=True):
+    """
+    Chuyển submissions (và answers) cũ hơn retention_days, hoặc thuộc quiz
+    đã ẩn, sang cold storage. Chạy theo lô, commit sau mỗi lô.
+    Trả về số submissions đã chuyển.
+    """
+    if retention_days is None:
+        retention_days = current_app.config.get("ARCHIVE_RETENTION_DAYS", 365)
+    chunk_size = current_app.config.get("ARCHIVE_CHUNK_SIZE", 1000)
+
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    conditions = [Submission.created_at < cutoff]
+    if include_inactive:
+        inactive_quiz_ids = db.session.query(Quiz.id).filter(Quiz.is_active.is_(False))
+        conditions.append(Submission.quiz_id.in_(inactive_quiz_ids))
+
+    total = 0
+    while True:
+        submissions = (
+            Submission.query
+            .filter(or_(*conditions), Submission.finished_at.isnot(None))
+            .order_by(Submission.id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not submissions:
+            return total
+
+        ids = [s.id for s in submissions]
+        answers_by_sub = {}
+        for ans in Answer.query.filter(Answer.submission_id.in_(ids)).all():
+            answers_by_sub.setdefault(ans.submission_id, []).append(_row_dict(ans))
+
+        partitions = {}
+        for s in submissions:
+            key = (s.quiz_id, partition_key(s.created_at))
+            partitions.setdefault(key, []).append(s)
+
+        for (quiz_id, partition), subs in partitions.items():
+            partition_dir = _partition_dir(quiz_id, partition)
+            part = min(s.id for s in subs)
+            _write_rows(
+                partition_dir, f"submissions-{part}", Submission, [_row_dict(s) for s in subs]
+            )
+            _write_rows(
+                partition_dir,
+                f"answers-{part}",
+                Answer,
+                [a for s in subs for a in answers_by_sub.get(s.id, [])],
+            )
+            for s in subs:
+                db.session.add(ArchivedSubmission(
+                    id=s.id,
+                    user_id=s.user_id,
+                    quiz_id=s.quiz_id,
+                    partition=partition,
+                    created_at=s.created_at,
+                ))
+
+        Answer.query.filter(Answer.submission_id.in_(ids)).delete(synchronize_session=False)
+        Submission.query.filter(Submission.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        total += len(ids)
+
+
+def _rewrite_parts(partition_dir, table, model, keep):
+    """Ghi lại các part có dòng bị loại (keep(row) False), part rỗng thì xóa."""
+    removed = 0
+    for path in _part_files(partition_dir, table):
+        rows = _read_rows_cached(path, os.stat(path).st_mtime_ns, model.__tablename__)
+        kept = [r for r in rows if keep(r)]
+        if len(kept) == len(rows):
+            continue
+
+        removed += len(rows) - len(kept)
+        if kept:
+            name = os.path.basename(path).split(".", 1)[0]
+            _write_rows(partition_dir, name, model, kept)
+        else:
+            os.remove(path)
+    return removed
+
+
+def remove_user_rows(user_id):
+    """
+    Xóa submissions / answers của user khỏi file archive (ghi lại các part
+    liên quan) rồi xóa index. File ghi lại trước khi xóa index nên chạy lại
+    sau khi lỗi giữa chừng vẫn tìm được partition. Trả về số dòng submission
+    đã xóa khỏi file.
+    """
+    partitions = {
+        (quiz_id, partition)
+        for quiz_id, partition in db.session.query(
+            ArchivedSubmission.quiz_id, ArchivedSubmission.partition
+        ).filter(ArchivedSubmission.user_id == user_id).distinct()
+    }
+
+    removed = 0
+    for quiz_id, partition in sorted(partitions):
+        partition_dir = _partition_dir(quiz_id, partition)
+        submission_ids = {
+            r["id"]
+            for r in _partition_rows(partition_dir, "submissions", Submission)
+            if r["user_id"] == user_id
+        }
+        removed += _rewrite_parts(
+            partition_dir, "submissions", Submission, lambda r: r["user_id"] != user_id
+        )
+        _rewrite_parts(
+            partition_dir, "answers", Answer, lambda r: r["submission_id"] not in submission_ids
+        )
+
+    ArchivedSubmission.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
+
+# =============================
+#          READ PATH
+# =============================
+class ArchivedAnswerRecord:
+    def __init__(self, row):
+        self.__dict__.update(row)
+        if row.get("choice_id") is None:
+            # dòng archive cũ (trước cột choice_id): choice id nằm trong user_answer
+            answer = row.get("user_answer") or ""
+            self.choice_id = int(answer) if answer.isdigit() else None
+
+    @property
+    def response(self):
+        if self.choice_id is not None:
+            return str(self.choice_id)
+        return self.user_answer
+
+
+class ArchivedSubmissionRecord:
+    """
+    Submission đọc từ archive, có cùng thuộc tính với model Submission
+    để template/route dùng chung (history, result, review).
+    """
+    archived = True
+
+    def __init__(self, row, partition_dir):
+        self.__dict__.update(row)
+        self._partition_dir = partition_dir
+
+    @property
+    def quiz(self):
+        return Quiz.query.get(self.quiz_id)
+
+    @property
+    def user(self):
+        return User.query.get(self.user_id)
+
+    @property
+    def answers(self):
+        return [
+            ArchivedAnswerRecord(r)
+            for r in _partition_rows(self._partition_dir, "answers", Answer)
+            if r["submission_id"] == self.id
+        ]
+
+
+def _load_records(index_rows):
+    by_partition = {}
+    for row in index_rows:
+        by_partition.setdefault((row.quiz_id, row.partition), set()).add(row.id)
+
+    records = []
+    for (quiz_id, partition), ids in by_partition.items():
+        partition_dir = _partition_dir(quiz_id, partition)
+        records.extend(
+            ArchivedSubmissionRecord(r, partition_dir)
+            for r in _partition_rows(partition_dir, "submissions", Submission)
+            if r["id"] in ids
+        )
+    return records
+
+
+def iter_submissions(quiz_ids=None):
+    """Duyệt toàn bộ submission trong archive (tùy chọn lọc theo quiz)."""
+    root = _archive_root()
+    if not os.path.isdir(root):
+        return
+    for quiz_dir in sorted(os.listdir(root)):
+        if not quiz_dir.startswith("quiz_"):
+            continue
+        if quiz_ids is not None and int(quiz_dir[len("quiz_"):]) not in quiz_ids:
+            continue
+        for partition in sorted(os.listdir(os.path.join(root, quiz_dir))):
+            partition_dir = os.path.join(root, quiz_dir, partition)
+            for r in _partition_rows(partition_dir, "submissions", Submission):
+                yield ArchivedSubmissionRecord(r, partition_dir)
+
+
+def get_submission(submission_id):
+    row = ArchivedSubmission.query.get(submission_id)
+    if row is None:
+        return None
+    records = _load_records([row])
+    return records[0] if records else None
+
+
+def user_submissions(user_id, quiz_id=None):
+    query = ArchivedSubmission.query.filter_by(user_id=user_id)
+    if quiz_id is not None:
+        query = query.filter_by(quiz_id=quiz_id)
+    return _load_records(query.all())
@@ -0,0 +1,373 @@
+"""
+Nhật ký sự kiện khi làm bài (thời gian từng câu, rời tab / mất focus).
+
+Trình duyệt (do_quiz.html) gom sự kiện rồi gửi theo lô bằng
+navigator.sendBeacon. Mỗi lô là một dòng JSON:
+
+    {"u": user_id, "a": attempt_key, "q": quiz_id, "r": unix nhận,
+     "e": [[t_ms, loại, question_id], ...]}
+
+loại: "v" xem câu, "c" đổi đáp án, "b" rời tab / mất focus, "f" quay lại,
+"s" nộp bài. t_ms tính từ lúc mở đề (đồng hồ của trình duyệt).
+
+Ghi: mỗi process giữ một buffer trong RAM, gom nhiều lô rồi ghi một lần
+(O_APPEND) vào segment của riêng nó:
+
+    instance/<ATTEMPT_EVENTS_FOLDER>/events-<start_ms>-<pid>.jsonl
+
+Request beacon không chạm DB (ngoài load user của Flask-Login). Segment chỉ
+nhận ghi trong ATTEMPT_EVENTS_SEGMENT_SECONDS đầu, sau đó process mở segment
+mới; segment cũ hơn mức đó (+ ATTEMPT_EVENTS_FLUSH_SECONDS) là đã đóng.
+
+Compaction (`flask compact-attempt-events`, chạy định kỳ): đọc các segment đã
+đóng, gom sự kiện theo lượt làm (Submission.attempt_key), tính thời gian và
+số lần rời tab theo từng câu → Answer.time_spent / Answer.blur_count,
+Submission.blur_count. Mỗi bài chỉ compact một lần (blur_count IS NULL) khi
+đã nộp đủ lâu để mọi beacon của nó nằm trong segment đã đóng; sự kiện của
+lượt làm chưa nộp được ghi sang file carry-*.jsonl cho lần sau.
+"""
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from app.models import Answer, Submission
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+EVENT_TYPES = frozenset("vcbfs")
+ATTEMPT_KEY_RE = re.compile(r"^[0-9a-f]{32}$")
+MAX_EVENT_MS = 24 * 3600 * 1000
+_SEGMENT_RE = re.compile(r"^(events|carry)-(\d+)-(\d+)\.jsonl$")
+_BEACON_SLACK_SECONDS = 60  # beacon cuối (pagehide) có thể tới sau form nộp bài
+_LOCK_NAME = ".compact.lock"
+
+
+def _lock_exclusive(fh):
+    """Khóa file độc quyền giữa các process, tự nhả khi đóng file."""
+    if fcntl is not None:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue  # LK_LOCK chỉ thử lại trong ~10 s rồi báo lỗi
+
+
+def events_folder():
+    folder = current_app.config.get("ATTEMPT_EVENTS_FOLDER", "attempt_events")
+    return os.path.join(current_app.instance_path, folder)
+
+
+def parse_attempt_key(raw):
+    raw = (raw or "").strip()
+    return raw if ATTEMPT_KEY_RE.match(raw) else None
+
+
+def clean_events(raw, limit):
+    """Lọc lô sự kiện từ client: [[t_ms, loại, question_id | None], ...]."""
+    if not isinstance(raw, list):
+        return []
+    events = []
+    for item in raw[:limit]:
+        if not isinstance(item, list) or len(item) != 3:
+            continue
+        t, kind, question_id = item
+        if type(t) is not int or not 0 <= t <= MAX_EVENT_MS or kind not in EVENT_TYPES:
+            continue
+        if question_id is not None and type(question_id) is not int:
+            continue
+        events.append([t, kind, question_id])
+    return events
+
+
+# =============================
+#            WRITER
+# =============================
+class EventLog:
+    """
+    Buffer ghi theo lô của một process. append() chỉ nối chuỗi vào list;
+    ghi xuống file khi đủ flush_lines dòng hoặc sau flush_seconds (thread nền).
+    """
+
+    def __init__(self, folder, flush_lines, flush_seconds, segment_seconds):
+        self.folder = folder
+        self.flush_lines = flush_lines
+        self.flush_seconds = flush_seconds
+        self.segment_seconds = segment_seconds
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._pid = None
+        self._fd = None
+        self._segment_started = 0.0
+        self._flusher = None
+
+    def append(self, line):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._after_fork()
+            self._buffer.append(line)
+            if len(self._buffer) >= self.flush_lines:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                self._flush_locked()
+
+    def _after_fork(self):
+        # buffer / fd / thread kế thừa từ master (gunicorn preload) không dùng được
+        self._pid = os.getpid()
+        self._buffer = []
+        self._fd = None
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        now = time.time()
+        if self._fd is None or now - self._segment_started >= self.segment_seconds:
+            self._open_segment(now)
+        data = "".join(self._buffer).encode("utf-8")
+        self._buffer = []
+        os.write(self._fd, data)
+
+    def _open_segment(self, now):
+        if self._fd is not None:
+            os.close(self._fd)
+        os.makedirs(self.folder, exist_ok=True)
+        path = os.path.join(self.folder, f"events-{int(now * 1000)}-{self._pid}.jsonl")
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._segment_started = now
+
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def _get_log():
+    config = current_app.config
+    folder = events_folder()
+    log = _logs.get(folder)
+    if log is None:
+        with _logs_lock:
+            log = _logs.get(folder)
+            if log is None:
+                log = _logs[folder] = EventLog(
+                    folder,
+                    config.get("ATTEMPT_EVENTS_FLUSH_LINES", 500),
+                    config.get("ATTEMPT_EVENTS_FLUSH_SECONDS", 1.0),
+                    config.get("ATTEMPT_EVENTS_SEGMENT_SECONDS", 300),
+                )
+    return log
+
+
+@atexit.register
+def _flush_all():
+    for log in list(_logs.values()):
+        log.flush()
+
+
+def record(user_id, attempt_key, quiz_id, events):
+    """Thêm một lô sự kiện (đã clean_events) vào buffer của process."""
+    line = json.dumps(
+        {"u": user_id, "a": attempt_key, "q": quiz_id, "r": int(time.time()), "e": events},
+        separators=(",", ":"),
+    )
+    _get_log().append(line + "\n")
+
+
+# =============================
+#          COMPACTION
+# =============================
+def summarize(events):
+    """
+    Sự kiện của một lượt làm → ({question_id: ms}, {question_id: số lần rời tab}).
+
+    Thời gian giữa hai sự kiện tính cho câu đang xem, trừ lúc trang đang ẩn
+    (giữa "b" và "f"). Rời tab tính cho câu đang xem lúc đó.
+    """
+    spent, blurs = {}, {}
+    active, hidden, last_t = None, False, None
+    for t, kind, question_id in sorted(events, key=lambda e: e[0]):
+        if active is not None and not hidden and last_t is not None:
+            spent[active] = spent.get(active, 0) + t - last_t
+        last_t = t
+        if kind in "vc" and question_id is not None:
+            active, hidden = question_id, False
+        elif kind == "b":
+            if not hidden and active is not None:
+                blurs[active] = blurs.get(active, 0) + 1
+            hidden = True
+        elif kind == "f":
+            hidden = False
+        elif kind == "s":
+            active = None
+    return spent, blurs
+
+
+def _ready_files(folder, now):
+    """Segment đã đóng (theo tên file) + carry, cũ trước."""
+    closed_before = now - (
+        current_app.config.get("ATTEMPT_EVENTS_SEGMENT_SECONDS", 300)
+        + current_app.config.get("ATTEMPT_EVENTS_FLUSH_SECONDS", 1.0)
+        + 5
+    )
+    ready = []
+    for name in os.listdir(folder):
+        match = _SEGMENT_RE.match(name)
+        if not match:
+            continue
+        kind, started_ms = match.group(1), int(match.group(2))
+        if kind == "carry" or started_ms / 1000 < closed_before:
+            ready.append((started_ms, name))
+    return [os.path.join(folder, name) for _, name in sorted(ready)]
+
+
+def _read_lines(paths):
+    """{(user_id, attempt_key): [dòng JSON, ...]} từ các file."""
+    attempts = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                    key = (int(item["u"]), item["a"])
+                except (ValueError, KeyError, TypeError):
+                    continue  # dòng ghi dở (process bị kill giữa chừng)
+                attempts.setdefault(key, []).append(item)
+    return attempts
+
+
+def _load_submissions(attempt_keys):
+    """attempt_key → [(id, user_id, finished_at, blur_count)]"""
+    found = {}
+    keys = list(attempt_keys)
+    for i in range(0, len(keys), 500):
+        rows = db.session.execute(
+            db.select(Submission.attempt_key, Submission.id, Submission.user_id,
+                      Submission.finished_at, Submission.blur_count)
+            .where(Submission.attempt_key.in_(keys[i:i + 500]))
+        )
+        for key, *row in rows:
+            found.setdefault(key, []).append(tuple(row))
+    return found
+
+
+def _apply(summaries):
+    """summaries: [(submission_id, spent, blurs)] → ghi bằng executemany."""
+    answer_rows, submission_rows = [], []
+    for submission_id, spent, blurs in summaries:
+        for question_id in spent.keys() | blurs.keys():
+            answer_rows.append({
+                "s_id": submission_id,
+                "q_id": question_id,
+                "spent": round(spent.get(question_id, 0) / 1000),
+                "blurs": blurs.get(question_id, 0),
+            })
+        submission_rows.append({"s_id": submission_id, "blurs": sum(blurs.values())})
+
+    answers, submissions = Answer.__table__, Submission.__table__
+    if answer_rows:
+        db.session.execute(
+            answers.update()
+            .where(answers.c.submission_id == db.bindparam("s_id"),
+                   answers.c.question_id == db.bindparam("q_id"))
+            .values(time_spent=db.bindparam("spent"), blur_count=db.bindparam("blurs")),
+            answer_rows,
+        )
+    if submission_rows:
+        submission_ids = [row["s_id"] for row in submission_rows]
+        # câu không mở lần nào: 0 giây (khác NULL = không có dữ liệu)
+        db.session.execute(
+            answers.update()
+            .where(answers.c.submission_id.in_(submission_ids),
+                   answers.c.time_spent.is_(None))
+            .values(time_spent=0, blur_count=0)
+        )
+        db.session.execute(
+            submissions.update()
+            .where(submissions.c.id == db.bindparam("s_id"))
+            .values(blur_count=db.bindparam("blurs")),
+            submission_rows,
+        )
+    db.session.commit()
+
+
+def _write_carry(folder, lines):
+    path = os.path.join(folder, f"carry-{int(time.time() * 1000)}-{os.getpid()}.jsonl")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for item in lines:
+            f.write(json.dumps(item, separators=(",", ":")) + "\n")
+    os.replace(tmp_path, path)
+
+
+def compact(now=None):
+    """
+    Compact các segment đã đóng. Trả về dict đếm:
+    compacted (bài đã ghi), carried (lượt làm để lần sau), dropped (bỏ).
+    """
+    counts = {"compacted": 0, "carried": 0, "dropped": 0}
+    folder = events_folder()
+    if not os.path.isdir(folder):
+        return counts
+
+    config = current_app.config
+    now = time.time() if now is None else now
+    settle = timedelta(seconds=config.get("ATTEMPT_EVENTS_SEGMENT_SECONDS", 300)
+                       + config.get("ATTEMPT_EVENTS_FLUSH_SECONDS", 1.0)
+                       + 5 + _BEACON_SLACK_SECONDS)
+    pending_until = now - config.get("ATTEMPT_EVENTS_PENDING_SECONDS", 24 * 3600)
+    finished_before = datetime.utcfromtimestamp(now) - settle
+
+    with open(os.path.join(folder, _LOCK_NAME), "w") as lock:
+        # hai lần compact chạy chồng nhau sẽ đếm trùng sự kiện
+        _lock_exclusive(lock)
+
+        paths = _ready_files(folder, now)
+        attempts = _read_lines(paths)
+        submissions = _load_submissions({key for _, key in attempts})
+
+        summaries, carry = [], []
+        for (user_id, attempt_key), lines in attempts.items():
+            matches = [s for s in submissions.get(attempt_key, ()) if s[1] == user_id]
+            if matches and all(s[3] is not None for s in matches):
+                counts["dropped"] += 1  # beacon tới muộn, bài đã compact
+                continue
+            if any(s[2] is not None and s[2] <= finished_before for s in matches):
+                spent, blurs = summarize([e for item in lines for e in item["e"]])
+                for submission_id, _, _, blur_count in matches:
+                    if blur_count is None:
+                        summaries.append((submission_id, spent, blurs))
+                        counts["compacted"] += 1
+            elif max(item["r"] for item in lines) >= pending_until:
+                carry.extend(lines)
+                counts["carried"] += 1
+            else:
+                counts["dropped"] += 1  # bỏ dở, không nộp
+
+        _apply(summaries)
+        if carry:
+            _write_carry(folder, carry)
+        for path in paths:
+            os.remove(path)
+    return counts
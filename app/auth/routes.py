@@ -1,12 +1,14 @@
-from flask import render_template, redirect, url_for, flash, request
+from flask import render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_user, logout_user, current_user
 from werkzeug.security import generate_password_hash
 
 from app.auth import auth_bp
 from app import db
-from app.models import User
+from app.models import User, UserQuizStats
 from app.auth.forms import RegisterForm, LoginForm
+from app.tasks import purge_user
 from functools import wraps
+from datetime import datetime
 
 
 # -----------------------
@@ -64,7 +66,9 @@ def login():
 
     form = LoginForm()
     if form.validate_on_submit():
-        user = User.query.filter_by(username=form.username.data).first()
+        user = User.query.filter_by(
+            username=form.username.data, deleted_at=None
+        ).first()
 
         if user is None or not user.check_password(form.password.data):
             flash("Sai username hoặc password", "danger")
@@ -94,8 +98,74 @@ def logout():
 @auth_bp.route("/admin/users")
 @admin_required
 def manage_users():
-    users = User.query.order_by(User.id).all()
-    return render_template("auth/manage_users.html", users=users)
+    q = request.args.get("q", "").strip()
+    role = request.args.get("role") or None
+    after = request.args.get("after", type=int)
+    before = request.args.get("before", type=int)
+    per_page = current_app.config.get("USERS_PER_PAGE", 50)
+
+    query = User.query.filter(User.deleted_at.is_(None))
+    if role:
+        query = query.filter(User.role == role)
+    if q:
+        query = query.filter(
+            _prefix_filter(User.username, q) | _prefix_filter(User.email, q)
+        )
+
+    # keyset theo id: trang sâu cũng chỉ đọc per_page + 1 dòng (không OFFSET)
+    if before is not None:
+        users = (
+            query.filter(User.id < before)
+            .order_by(User.id.desc())
+            .limit(per_page + 1)
+            .all()
+        )
+        has_prev = len(users) > per_page
+        users = users[:per_page][::-1]
+        has_next = True
+    else:
+        if after is not None:
+            query = query.filter(User.id > after)
+        users = query.order_by(User.id).limit(per_page + 1).all()
+        has_next = len(users) > per_page
+        users = users[:per_page]
+        has_prev = after is not None
+
+    return render_template(
+        "auth/manage_users.html",
+        users=users,
+        activity=_user_activity([u.id for u in users]),
+        q=q,
+        role=role,
+        has_prev=has_prev and bool(users),
+        has_next=has_next and bool(users),
+    )
+
+
+def _prefix_filter(column, prefix):
+    """
+    lower(column) bắt đầu bằng prefix, viết dạng range để dùng index
+    lower(...) (LIKE 'x%' của SQLite không dùng được index biểu thức).
+    """
+    prefix = prefix.lower()
+    expr = db.func.lower(column)
+    return (expr >= prefix) & (expr < prefix + "\U0010ffff")
+
+
+def _user_activity(user_ids):
+    """user_id → (số lượt làm, lần nộp gần nhất), một query gộp từ rollup."""
+    if not user_ids:
+        return {}
+    rows = (
+        db.session.query(
+            UserQuizStats.user_id,
+            db.func.sum(UserQuizStats.attempts),
+            db.func.max(UserQuizStats.last_finished_at),
+        )
+        .filter(UserQuizStats.user_id.in_(user_ids))
+        .group_by(UserQuizStats.user_id)
+    )
+    return {user_id: (attempts or 0, last) for user_id, attempts, last in rows}
 
 
 # -----------------------
@@ -129,7 +199,7 @@ def create_user():
 @auth_bp.route("/admin/users/<int:user_id>/edit", methods=["GET", "POST"])
 @admin_required
 def edit_user(user_id):
-    user = User.query.get_or_404(user_id)
+    user = User.query.filter_by(id=user_id, deleted_at=None).first_or_404()
 
     if request.method == "POST":
         user.username = request.form["username"]
@@ -152,8 +222,10 @@ def edit_user(user_id):
 @auth_bp.route("/admin/users/<int:user_id>/delete", methods=["POST"])
 @admin_required
 def delete_user(user_id):
-    user = User.query.get_or_404(user_id)
+    user = User.query.filter_by(id=user_id, deleted_at=None).first_or_404()
 
-    db.session.delete(user)
+    # soft delete ngay, submissions/answers/certificates dọn ở background
+    user.deleted_at = datetime.utcnow()
     db.session.commit()
+    purge_user(user.id)
     return redirect(url_for("auth.manage_users"))
@@ -1,17 +1,19 @@
-try:
-    from celery import Celery
-except ImportError:
-    Celery = None
+"""
+Celery (tùy chọn), chỉ import + cấu hình khi có task đầu tiên cần gửi.
 
-celery_app = None
+Web worker không gửi task nào thì không phải trả chi phí import Celery/kombu.
+Worker Celery: celery -A app.celery_app:worker worker
+"""
+from flask import current_app
 
+_MISSING = object()
 
-def make_celery(app):
-    global celery_app
 
-    if Celery is None:
+def make_celery(app):
+    try:
+        from celery import Celery
+    except ImportError:
         print("⚠ Celery chưa cài, background task sẽ chạy sync.")
-        celery_app = None
         return None
 
     celery = Celery(
@@ -27,5 +29,27 @@ def make_celery(app):
                 return super().__call__(*args, **kwargs)
 
     celery.Task = ContextTask
-    celery_app = celery
+    return celery
+
+
+def get_celery(app=None):
+    """Celery của app (tạo lần đầu gọi), None nếu tắt hoặc chưa cài."""
+    app = app or current_app._get_current_object()
+    celery = app.extensions.get("celery", _MISSING)
+    if celery is _MISSING:
+        celery = make_celery(app) if app.config.get("CELERY_ENABLED", True) else None
+        app.extensions["celery"] = celery
+    return celery
+
+
+def worker():
+    """Entry point cho `celery -A app.celery_app:worker worker`."""
+    from app import create_app
+    from app.tasks import register_celery_tasks
+
+    app = create_app()
+    celery = get_celery(app)
+    if celery is None:
+        raise RuntimeError("Celery chưa cài hoặc CELERY_ENABLED = False.")
+    register_celery_tasks(celery)
     return celery
@@ -0,0 +1,220 @@
+import click
+from flask.cli import ScriptInfo, with_appcontext
+
+
+class LazyMigrateGroup(click.Group):
+    """
+    `flask db ...` của Flask-Migrate, nhưng chỉ import Flask-Migrate/Alembic
+    khi lệnh thực sự được gọi (web worker không cần).
+    """
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as db_cli_group
+        from app import db
+
+        app = parent.ensure_object(ScriptInfo).load_app()
+        if "migrate" not in app.extensions:
+            Migrate(app, db)
+        # context của group thật → click gọi đúng callback / subcommand của nó
+        return db_cli_group.make_context(info_name, args, parent=parent, **extra)
+
+
+@click.command("archive-submissions")
+@click.option("--days", type=int, default=None,
+              help="Chuyển bài làm cũ hơn N ngày (mặc định ARCHIVE_RETENTION_DAYS).")
+@click.option("--inactive/--no-inactive", default=True,
+              help="Chuyển luôn bài làm thuộc quiz đã ẩn.")
+@with_appcontext
+def archive_submissions_command(days, inactive):
+    """Chuyển submissions/answers cũ sang cold storage."""
+    from app.archive import archive_submissions
+
+    total = archive_submissions(retention_days=days, include_inactive=inactive)
+    click.echo(f"Archived {total} submissions.")
+
+
+@click.command("regrade-fill-in")
+@click.option("--quiz", "quiz_id", type=int, default=None, help="Chỉ chấm lại quiz này.")
+@with_appcontext
+def regrade_fill_in_command(quiz_id):
+    """Chấm lại các câu fill_in đã nộp bằng engine hiện tại."""
+    from app.grading import regrade_fill_in_answers
+
+    answers, submissions = regrade_fill_in_answers(quiz_id)
+    click.echo(f"Changed {answers} answers in {submissions} submissions.")
+
+
+@click.command("regrade-questions")
+@click.argument("question_ids", nargs=-1, type=int, required=True)
+@with_appcontext
+def regrade_questions_command(question_ids):
+    """Chấm lại các câu hỏi theo đáp án hiện tại (chạy ngay, không qua job)."""
+    from app.regrade import regrade_questions
+
+    result = regrade_questions(list(question_ids))
+    click.echo(f"Changed {result.answers} answers in {result.submissions} submissions.")
+    for cert in result.invalid_certificates:
+        click.echo(
+            f"  invalid certificate #{cert['id']} user={cert['user_id']} "
+            f"quiz={cert['quiz_id']} best={cert['best_score']}"
+        )
+
+
+@click.command("purge-deleted")
+@with_appcontext
+def purge_deleted_command():
+    """Purge lại các question / quiz / user đã xóa mềm mà purge nền chưa xong."""
+    from app.tasks import purge_deleted
+
+    questions, quizzes, users = purge_deleted()
+    click.echo(f"Purged {questions} questions, {quizzes} quizzes, {users} users.")
+
+
+@click.command("run-regrade-jobs")
+@with_appcontext
+def run_regrade_jobs_command():
+    """Chạy các job chấm lại còn pending hoặc running đã quá REGRADE_STALE_SECONDS."""
+    from app.regrade import resumable_job_ids, run_job
+
+    job_ids = resumable_job_ids()
+    for job_id in job_ids:
+        result = run_job(job_id)
+        if result is not None:
+            click.echo(
+                f"Job #{job_id}: changed {result.answers} answers "
+                f"in {result.submissions} submissions."
+            )
+    click.echo(f"Ran {len(job_ids)} regrade jobs.")
+
+
+@click.command("rebuild-stats")
+@with_appcontext
+def rebuild_stats_command():
+    """Dựng lại bảng user_quiz_stats từ submissions (gồm archive)."""
+    from app.stats import rebuild_stats
+
+    total = rebuild_stats()
+    click.echo(f"Rebuilt {total} user/quiz stats rows.")
+
+
+@click.command("rebuild-histograms")
+@click.option("--quiz", "quiz_id", type=int, default=None, help="Chỉ dựng lại quiz này.")
+@with_appcontext
+def rebuild_histograms_command(quiz_id):
+    """Dựng lại histogram điểm theo quiz từ submissions (gồm archive)."""
+    from app.histograms import rebuild_histograms
+
+    total = rebuild_histograms(None if quiz_id is None else [quiz_id])
+    click.echo(f"Rebuilt score histograms for {total} quizzes.")
+
+
+@click.command("rebuild-review-states")
+@click.option("--quiz", "quiz_id", type=int, default=None, help="Chỉ dựng lại quiz này.")
+@with_appcontext
+def rebuild_review_states_command(quiz_id):
+    """Dựng lại lịch ôn tập (SM-2) của quiz practice từ answers đã chấm."""
+    from app.practice import rebuild_review_states
+
+    total = rebuild_review_states(None if quiz_id is None else [quiz_id])
+    click.echo(f"Rebuilt {total} review states.")
+
+
+@click.command("export-gradebook")
+@click.argument("quiz_id", type=int)
+@click.option("--format", "fmt", type=click.Choice(["csv", "xlsx"]), default="csv")
+@click.option("--attempt", type=click.Choice(["best", "last", "all"]), default="best",
+              help="Bài lấy cho mỗi học sinh: điểm cao nhất, lần cuối hoặc mọi lần.")
+@click.option("-o", "--output", type=click.Path(dir_okay=False), default=None,
+              help="File ghi ra (mặc định gradebook_quiz_<id>.<format>).")
+@with_appcontext
+def export_gradebook_command(quiz_id, fmt, attempt, output):
+    """Xuất bảng điểm học sinh × câu hỏi của một quiz (ghi dần từng lô)."""
+    from app.gradebook import export
+    from app.models import Quiz
+
+    quiz = Quiz.query.filter_by(id=quiz_id, deleted_at=None).first()
+    if quiz is None:
+        raise click.ClickException(f"Không tìm thấy quiz {quiz_id}.")
+
+    body, _, filename = export(quiz, fmt, attempt)
+    output = output or filename
+    with open(output, "wb") as f:
+        for chunk in body:
+            f.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+    click.echo(f"Wrote {output}.")
+
+
+@click.command("compact-attempt-events")
+@with_appcontext
+def compact_attempt_events_command():
+    """Gộp nhật ký sự kiện làm bài vào thời gian / số lần rời tab từng câu."""
+    from app.attempt_events import compact
+
+    counts = compact()
+    click.echo(
+        f"Compacted {counts['compacted']} submissions, carried {counts['carried']} "
+        f"attempts, dropped {counts['dropped']}."
+    )
+
+
+@click.command("rebuild-search-index")
+@with_appcontext
+def rebuild_search_index_command():
+    """Dựng lại index FTS5 cho ngân hàng câu hỏi."""
+    from app.search import rebuild_index
+
+    total = rebuild_index()
+    click.echo(f"Indexed {total} questions.")
+
+
+@click.command("build-dedupe-index")
+@with_appcontext
+def build_dedupe_index_command():
+    """Tính lại chữ ký MinHash/LSH cho toàn bộ câu hỏi."""
+    from app.dedupe import build_index
+
+    total = build_index()
+    click.echo(f"Indexed {total} question signatures.")
+
+
+@click.command("sync-replica")
+@click.option("--interval", type=float, default=None,
+              help="Lặp lại sau mỗi N giây (mặc định chạy 1 lần).")
+@with_appcontext
+def sync_replica_command(interval):
+    """Ghi heartbeat và copy DB primary sang replica SQLite (backup API)."""
+    import time
+    from app import db
+    from app.db_routing import REPLICA_BIND, sync_sqlite_replica, write_heartbeat
+
+    if REPLICA_BIND not in db.engines:
+        raise click.ClickException("Chưa cấu hình REPLICA_DATABASE_URI.")
+
+    while True:
+        if db.engines[REPLICA_BIND].dialect.name == "sqlite":
+            ts = sync_sqlite_replica(db)
+        else:
+            # replica thật (streaming replication): chỉ cần ghi heartbeat
+            ts = write_heartbeat(db)
+        click.echo(f"Replica heartbeat {ts:.3f}")
+        if not interval:
+            return
+        time.sleep(interval)
+
+
+def register_commands(app):
+    app.cli.add_command(LazyMigrateGroup("db", help="Migration database (Flask-Migrate)."))
+    app.cli.add_command(archive_submissions_command)
+    app.cli.add_command(regrade_fill_in_command)
+    app.cli.add_command(regrade_questions_command)
+    app.cli.add_command(purge_deleted_command)
+    app.cli.add_command(run_regrade_jobs_command)
+    app.cli.add_command(rebuild_stats_command)
+    app.cli.add_command(rebuild_histograms_command)
+    app.cli.add_command(rebuild_review_states_command)
+    app.cli.add_command(export_gradebook_command)
+    app.cli.add_command(compact_attempt_events_command)
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(build_dedupe_index_command)
+    app.cli.add_command(sync_replica_command)
@@ -0,0 +1,161 @@
+"""
+Định tuyến đọc/ghi giữa primary và read-replica.
+
+- Bật bằng REPLICA_DATABASE_URI (create_app thêm bind "replica").
+- Route gắn @read_only: SELECT đi sang replica nếu replica đủ mới:
+    * độ trễ (theo heartbeat) ≤ REPLICA_MAX_LAG_SECONDS
+    * replica đã có lần ghi gần nhất của chính user (read-your-writes,
+      mốc thời gian lưu trong session cookie)
+  ngược lại dùng primary.
+- Flush / INSERT / UPDATE / DELETE luôn đi primary.
+
+Độ trễ đo kiểu heartbeat: `flask sync-replica` ghi thời điểm hiện tại vào
+bảng replication_heartbeat trên primary rồi mới copy, nên giá trị đọc được
+trên replica chính là thời điểm của bản sao.
+"""
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+
+REPLICA_BIND = "replica"
+SESSION_KEY = "db_last_write_at"
+
+_heartbeat = {"checked_at": 0.0, "ts": None}
+
+
+def read_only(f):
+    """Route chỉ đọc: cho phép SELECT đi sang replica."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        g.db_read_only = True
+        return f(*args, **kwargs)
+    return decorated
+
+
+def replica_heartbeat(engine):
+    """Heartbeat đọc trên replica (cache REPLICA_LAG_CHECK_SECONDS trong worker)."""
+    now = time.monotonic()
+    ttl = current_app.config.get("REPLICA_LAG_CHECK_SECONDS", 1)
+    if now - _heartbeat["checked_at"] < ttl:
+        return _heartbeat["ts"]
+
+    try:
+        with engine.connect() as conn:
+            ts = conn.execute(
+                text("SELECT ts FROM replication_heartbeat WHERE id = 1")
+            ).scalar()
+    except Exception as e:  # replica chưa sync lần nào / mất kết nối
+        current_app.logger.warning("Không đọc được heartbeat replica: %s", e)
+        ts = None
+
+    _heartbeat.update(checked_at=now, ts=ts)
+    return ts
+
+
+def _replica_for_request(engines):
+    """Engine replica nếu request hiện tại được phép đọc từ replica, ngược lại None."""
+    if not has_request_context() or not g.get("db_read_only"):
+        return None
+    if "db_replica" in g:
+        return g.db_replica
+
+    engine = engines.get(REPLICA_BIND)
+    if engine is not None:
+        heartbeat = replica_heartbeat(engine)
+        max_lag = current_app.config.get("REPLICA_MAX_LAG_SECONDS", 30)
+        if heartbeat is None or time.time() - heartbeat > max_lag:
+            engine = None
+        elif heartbeat < session.get(SESSION_KEY, 0):
+            # replica chưa có lần ghi gần nhất của user → đọc primary
+            engine = None
+
+    # quyết định một lần cho cả request để không đọc lẫn 2 nguồn
+    g.db_replica = engine
+    return engine
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not getattr(clause, "is_dml", False):
+            replica = _replica_for_request(self._db.engines)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+# =============================
+#     READ-YOUR-WRITES MARKER
+# =============================
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_flush(db_session, flush_context):
+    db_session.info["db_wrote"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _mark_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["db_wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _remember_write(db_session):
+    if db_session.info.pop("db_wrote", False) and has_request_context():
+        g.db_wrote_at = time.time()
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_write(db_session):
+    db_session.info.pop("db_wrote", None)
+
+
+def init_routing(app):
+    """Đăng ký hook lưu mốc ghi gần nhất của user vào session cookie."""
+
+    @app.after_request
+    def store_last_write(response):
+        wrote_at = g.get("db_wrote_at")
+        if wrote_at is not None and REPLICA_BIND in app.config.get("SQLALCHEMY_BINDS", {}):
+            session[SESSION_KEY] = wrote_at
+        return response
+
+
+# =============================
+#        SQLITE REPLICA
+# =============================
+def write_heartbeat(db):
+    from app.models import ReplicationHeartbeat
+
+    row = db.session.get(ReplicationHeartbeat, 1)
+    if row is None:
+        row = ReplicationHeartbeat(id=1, ts=time.time())
+        db.session.add(row)
+    else:
+        row.ts = time.time()
+    db.session.commit()
+    return row.ts
+
+
+def sync_sqlite_replica(db):
+    """
+    Ghi heartbeat rồi copy primary → replica bằng SQLite backup API.
+    Backup ghi thẳng vào file replica trong 1 transaction, các connection
+    đang mở trên replica thấy bản mới sau khi backup xong.
+    """
+    primary = db.engines[None]
+    replica = db.engines[REPLICA_BIND]
+    if primary.dialect.name != "sqlite" or replica.dialect.name != "sqlite":
+        raise RuntimeError("sync_sqlite_replica chỉ dùng cho SQLite.")
+
+    ts = write_heartbeat(db)
+    _heartbeat["checked_at"] = 0.0
+    src = primary.raw_connection()
+    dst = replica.raw_connection()
+    try:
+        src.driver_connection.backup(dst.driver_connection)
+    finally:
+        dst.close()
+        src.close()
+    return ts
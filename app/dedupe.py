@@ -0,0 +1,322 @@
+"""
+Phát hiện câu hỏi gần trùng bằng MinHash + LSH.
+
+- Nội dung câu hỏi được chuẩn hóa (casefold, bỏ dấu tiếng Việt, bỏ dấu câu)
+  rồi cắt thành shingle 2 từ liên tiếp.
+- Chữ ký MinHash NUM_PERM giá trị uint32 lưu ở bảng question_signatures;
+  tỉ lệ vị trí trùng nhau giữa 2 chữ ký ≈ độ tương đồng Jaccard.
+- Chữ ký chia thành BANDS band × ROWS dòng, mỗi band băm thành 1 bucket
+  (bảng question_lsh_buckets, index (band, bucket)). Hai câu chung ít nhất
+  một bucket mới được so sánh → tra cứu không phải quét toàn bộ ngân hàng.
+
+Với 16 band × 4 dòng, cặp có Jaccard 0.8 bị bỏ sót với xác suất ~0.02%,
+cặp Jaccard 0.3 chỉ thành ứng viên ~12%.
+"""
+import hashlib
+import random
+import re
+import zlib
+from array import array
+
+from flask import current_app
+
+from app import db
+from app.grading import normalize_answer
+from app.models import Question, Quiz, QuestionSignature, QuestionLshBucket
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+_PRIME = (1 << 31) - 1
+_rng = random.Random(20240601)  # seed cố định: chữ ký phải ổn định giữa các lần chạy
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# bucket lớn hơn ngưỡng này chỉ so với phần tử đầu (tránh O(n²) trong report)
+_MAX_PAIRWISE_BUCKET = 50
+
+
+# =============================
+#           MINHASH
+# =============================
+def shingles(text):
+    """Tập shingle 2 từ của nội dung đã chuẩn hóa."""
+    words = _WORD_RE.findall(normalize_answer(text))
+    if len(words) < 2:
+        return set(words)
+    return {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def signature(text):
+    """Chữ ký MinHash (array uint32), None nếu nội dung rỗng."""
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles(text)]
+    if not hashes:
+        return None
+    return array("I", (
+        min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS
+    ))
+
+
+def _load_signature(raw):
+    sig = array("I")
+    sig.frombytes(raw)
+    return sig
+
+
+def similarity(sig_a, sig_b):
+    """Ước lượng Jaccard: tỉ lệ vị trí bằng nhau."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def band_buckets(sig):
+    """[(band, bucket)] — bucket là hash 56 bit của các giá trị trong band."""
+    raw = sig.tobytes()
+    width = ROWS * sig.itemsize
+    return [
+        (band, int.from_bytes(
+            hashlib.blake2b(raw[band * width:(band + 1) * width], digest_size=7).digest(),
+            "big",
+        ))
+        for band in range(BANDS)
+    ]
+
+
+def _threshold(threshold):
+    if threshold is None:
+        threshold = current_app.config.get("DEDUPE_THRESHOLD", 0.7)
+    return threshold
+
+
+# =============================
+#            LOOKUP
+# =============================
+def _candidate_ids(buckets, exclude_id=None):
+    # chỉ đọc bảng bucket (index (band, bucket)); câu đã xóa mềm lọc ở bước sau
+    query = (
+        db.session.query(QuestionLshBucket.question_id)
+        .filter(db.or_(*[
+            (QuestionLshBucket.band == band) & (QuestionLshBucket.bucket == bucket)
+            for band, bucket in buckets
+        ]))
+        .distinct()
+    )
+    if exclude_id is not None:
+        query = query.filter(QuestionLshBucket.question_id != exclude_id)
+    return [row[0] for row in query]
+
+
+def find_near_duplicates(text, exclude_id=None, threshold=None, limit=10):
+    """
+    Các câu hỏi gần trùng với nội dung `text`:
+    [(Question, similarity)] sắp giảm dần theo độ tương đồng.
+    """
+    sig = signature(text)
+    if sig is None:
+        return []
+    return _rank_candidates(sig, band_buckets(sig), exclude_id, _threshold(threshold), limit)
+
+
+def _rank_candidates(sig, buckets, exclude_id, threshold, limit):
+    candidate_ids = _candidate_ids(buckets, exclude_id)
+    if not candidate_ids:
+        return []
+
+    rows = QuestionSignature.query.filter(
+        QuestionSignature.question_id.in_(candidate_ids)
+    ).all()
+    scored = sorted(
+        (
+            (similarity(sig, _load_signature(r.signature)), r.question_id)
+            for r in rows
+        ),
+        reverse=True,
+    )
+    scored = [(score, qid) for score, qid in scored if score >= threshold][:limit * 2]
+    if not scored:
+        return []
+
+    questions = {
+        q.id: q
+        for q in Question.query.filter(
+            Question.id.in_([qid for _, qid in scored]), Question.deleted_at.is_(None)
+        )
+    }
+    return [(questions[qid], score) for score, qid in scored if qid in questions][:limit]
+
+
+# =============================
+#             SYNC
+# =============================
+def update_signature(question, threshold=None):
+    """
+    Tính lại chữ ký + bucket cho câu hỏi (chưa commit), trả về danh sách
+    câu gần trùng để cảnh báo người soạn.
+    """
+    QuestionLshBucket.query.filter_by(question_id=question.id).delete(
+        synchronize_session=False
+    )
+    existing = db.session.get(QuestionSignature, question.id)
+
+    sig = signature(question.content)
+    if sig is None:
+        if existing is not None:
+            db.session.delete(existing)
+        return []
+
+    if existing is None:
+        db.session.add(QuestionSignature(question_id=question.id, signature=sig.tobytes()))
+    else:
+        existing.signature = sig.tobytes()
+
+    buckets = band_buckets(sig)
+    db.session.add_all(
+        QuestionLshBucket(question_id=question.id, band=band, bucket=bucket)
+        for band, bucket in buckets
+    )
+    return _rank_candidates(sig, buckets, question.id, _threshold(threshold), 10)
+
+
+def remove_signatures(question_ids):
+    """Xóa chữ ký + bucket (question_ids: list hoặc subquery id, chưa commit)."""
+    for model in (QuestionLshBucket, QuestionSignature):
+        db.session.query(model).filter(model.question_id.in_(question_ids)).delete(
+            synchronize_session=False
+        )
+
+
+def build_index():
+    """Dựng lại toàn bộ index theo lô. Trả về số câu hỏi đã index."""
+    chunk_size = current_app.config.get("PURGE_CHUNK_SIZE", 500)
+
+    QuestionLshBucket.query.delete(synchronize_session=False)
+    QuestionSignature.query.delete(synchronize_session=False)
+    db.session.commit()
+
+    total = 0
+    last_id = 0
+    while True:
+        # keyset theo id, mỗi lô một transaction
+        rows = (
+            db.session.query(Question.id, Question.content)
+            .filter(Question.deleted_at.is_(None), Question.id > last_id)
+            .order_by(Question.id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not rows:
+            return total
+
+        signatures = []
+        buckets = []
+        for qid, content in rows:
+            sig = signature(content)
+            if sig is None:
+                continue
+            signatures.append({"question_id": qid, "signature": sig.tobytes()})
+            buckets.extend(
+                {"question_id": qid, "band": band, "bucket": bucket}
+                for band, bucket in band_buckets(sig)
+            )
+
+        if signatures:
+            db.session.execute(QuestionSignature.__table__.insert(), signatures)
+            db.session.execute(QuestionLshBucket.__table__.insert(), buckets)
+        db.session.commit()
+        total += len(signatures)
+        last_id = rows[-1][0]
+
+
+# =============================
+#            REPORT
+# =============================
+def _chunks(ids):
+    ids = list(ids)
+    size = current_app.config.get("PURGE_CHUNK_SIZE", 500)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def _find(parent, x):
+    while parent[x] != x:
+        parent[x] = parent[parent[x]]
+        x = parent[x]
+    return x
+
+
+def duplicate_clusters(threshold=None):
+    """
+    Gom các câu gần trùng trên toàn ngân hàng thành cụm.
+    Trả về [[(Question, quiz_title), ...], ...], cụm lớn trước.
+    """
+    threshold = _threshold(threshold)
+
+    shared = (
+        db.session.query(QuestionLshBucket.band, QuestionLshBucket.bucket)
+        .join(Question, Question.id == QuestionLshBucket.question_id)
+        .filter(Question.deleted_at.is_(None))
+        .group_by(QuestionLshBucket.band, QuestionLshBucket.bucket)
+        .having(db.func.count() > 1)
+        .subquery()
+    )
+    rows = (
+        db.session.query(
+            QuestionLshBucket.band, QuestionLshBucket.bucket, QuestionLshBucket.question_id
+        )
+        .join(
+            shared,
+            (shared.c.band == QuestionLshBucket.band)
+            & (shared.c.bucket == QuestionLshBucket.bucket),
+        )
+        .join(Question, Question.id == QuestionLshBucket.question_id)
+        .filter(Question.deleted_at.is_(None))
+        .order_by(QuestionLshBucket.band, QuestionLshBucket.bucket, QuestionLshBucket.question_id)
+        .all()
+    )
+
+    groups = {}
+    for band, bucket, qid in rows:
+        groups.setdefault((band, bucket), []).append(qid)
+    if not groups:
+        return []
+
+    ids = {qid for members in groups.values() for qid in members}
+    signatures = {}
+    for chunk in _chunks(ids):
+        for r in QuestionSignature.query.filter(QuestionSignature.question_id.in_(chunk)):
+            signatures[r.question_id] = _load_signature(r.signature)
+
+    parent = {qid: qid for qid in ids}
+    compared = set()
+    for members in groups.values():
+        if len(members) > _MAX_PAIRWISE_BUCKET:
+            pairs = [(members[0], other) for other in members[1:]]
+        else:
+            pairs = [
+                (a, b) for i, a in enumerate(members) for b in members[i + 1:]
+            ]
+        for a, b in pairs:
+            if (a, b) in compared:
+                continue
+            compared.add((a, b))
+            if similarity(signatures[a], signatures[b]) >= threshold:
+                parent[_find(parent, a)] = _find(parent, b)
+
+    clusters = {}
+    for qid in ids:
+        clusters.setdefault(_find(parent, qid), []).append(qid)
+    clusters = [sorted(c) for c in clusters.values() if len(c) > 1]
+    if not clusters:
+        return []
+
+    lookup = {}
+    for chunk in _chunks(qid for c in clusters for qid in c):
+        for q, title in (
+            db.session.query(Question, Quiz.title)
+            .join(Quiz, Quiz.id == Question.quiz_id)
+            .filter(Question.id.in_(chunk))
+        ):
+            lookup[q.id] = (q, title)
+    clusters.sort(key=lambda c: (-len(c), c[0]))
+    return [[lookup[qid] for qid in c if qid in lookup] for c in clusters]
@@ -0,0 +1,307 @@
+"""
+Bảng điểm (gradebook) của một quiz: mỗi học sinh một dòng, mỗi câu hỏi
+hai cột (điểm, câu trả lời), cộng các cột tổng.
+
+Xuất dạng stream (CSV / XLSX), không dựng cả ma trận trong bộ nhớ:
+    - submissions đọc theo lô (yield_per), mỗi lô lấy answers của đúng các
+      bài đó, sắp theo submission_id → ghép thành dòng và ghi ra ngay
+    - dòng cuối: điểm trung bình từng câu (chỉ giữ tổng theo cột)
+XLSX tự dựng bằng zipfile (sheet inlineStr), ghi thẳng ra stream không seek.
+
+Chỉ gồm bài trong DB; bài đã chuyển sang archive không có trong gradebook.
+"""
+import csv
+import io
+import re
+import zipfile
+from itertools import groupby
+from xml.sax.saxutils import escape
+
+from flask import current_app
+
+from app import db
+from app.models import Answer, Choice, Question, Submission, User
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+ATTEMPTS = ("best", "last", "all")  # bài điểm cao nhất / lần nộp cuối / mọi lần
+
+_FLUSH_ROWS = 200
+
+
+# =============================
+#             ROWS
+# =============================
+def _questions(quiz):
+    return (
+        db.session.query(Question.id, Question.type)
+        .filter(Question.quiz_id == quiz.id, Question.deleted_at.is_(None))
+        .order_by(Question.id)
+        .all()
+    )
+
+
+def _choice_texts(question_ids):
+    """choice id → nội dung, để hiện câu trả lời mcq thay vì id."""
+    return {
+        cid: content
+        for cid, content in db.session.query(Choice.id, Choice.content)
+        .filter(Choice.question_id.in_(question_ids))
+    }
+
+
+def _submissions(quiz, attempt):
+    columns = (
+        Submission.id, Submission.user_id, User.username, User.email,
+        Submission.created_at, Submission.finished_at, Submission.time_spent,
+        Submission.correct_answers, Submission.total_questions, Submission.score,
+    )
+    query = (
+        db.select(*columns)
+        .join(User, User.id == Submission.user_id)
+        .where(
+            Submission.quiz_id == quiz.id,
+            Submission.finished_at.isnot(None),
+            User.deleted_at.is_(None),
+        )
+    )
+    if attempt != "all":
+        # mỗi học sinh 1 bài: window function thay vì query theo từng user
+        order = (
+            (Submission.score.desc(), Submission.finished_at.desc())
+            if attempt == "best"
+            else (Submission.finished_at.desc(),)
+        )
+        ranked = query.add_columns(
+            db.func.row_number()
+            .over(partition_by=Submission.user_id, order_by=order)
+            .label("rn")
+        ).subquery()
+        query = db.select(*[ranked.c[c.key] for c in columns]).where(ranked.c.rn == 1)
+        return query.order_by(ranked.c.username, ranked.c.id)
+    return query.order_by(User.username, Submission.id)
+
+
+def _answers(submission_ids):
+    return (
+        db.session.query(
+            Answer.submission_id, Answer.question_id, Answer.choice_id,
+            Answer.user_answer, Answer.score, Answer.checked,
+        )
+        .filter(Answer.submission_id.in_(submission_ids))
+        .order_by(Answer.submission_id)
+        .all()
+    )
+
+
+def iter_rows(quiz, attempt="best", chunk_size=None):
+    """Dòng header, từng dòng học sinh, dòng trung bình (list giá trị)."""
+    chunk_size = chunk_size or current_app.config.get("GRADEBOOK_CHUNK_SIZE", 500)
+    questions = _questions(quiz)
+    position = {qid: i for i, (qid, _) in enumerate(questions)}
+    choice_questions = [qid for qid, qtype in questions if qtype in ("mcq", "true_false")]
+    choice_texts = _choice_texts(choice_questions) if choice_questions else {}
+
+    header = [
+        "submission_id", "user_id", "username", "email", "started_at",
+        "finished_at", "time_spent", "correct_answers", "total_questions",
+        "score", "passed",
+    ]
+    fixed = len(header)
+    for qid, _ in questions:
+        header += [f"Q{qid} điểm", f"Q{qid} trả lời"]
+    yield header
+
+    sums = [0.0] * len(questions)
+    counts = [0] * len(questions)
+    total_score = 0.0
+    students = 0
+
+    result = db.session.execute(
+        _submissions(quiz, attempt).execution_options(yield_per=chunk_size)
+    )
+    for chunk in result.partitions():
+        answers = {
+            sid: list(rows)
+            for sid, rows in groupby(_answers([s.id for s in chunk]), key=lambda a: a[0])
+        }
+        for sub in chunk:
+            score = sub.score or 0.0
+            row = [
+                sub.id, sub.user_id, sub.username, sub.email,
+                sub.created_at, sub.finished_at, sub.time_spent,
+                sub.correct_answers, sub.total_questions, round(score, 2),
+                "Đạt" if score >= (quiz.pass_score or 0) else "Chưa đạt",
+            ]
+            row.extend([None] * (2 * len(questions)))
+            for _, qid, choice_id, user_answer, ans_score, checked in answers.get(sub.id, ()):
+                i = position.get(qid)
+                if i is None:
+                    continue
+                if choice_id is not None:
+                    user_answer = choice_texts.get(choice_id, choice_id)
+                row[fixed + 2 * i + 1] = user_answer
+                if checked:
+                    row[fixed + 2 * i] = ans_score
+                    sums[i] += ans_score or 0.0
+                    counts[i] += 1
+            total_score += score
+            students += 1
+            yield row
+
+    footer = ["Trung bình", None, None, None, None, None, None, None, None,
+              round(total_score / students, 2) if students else None, None]
+    for i in range(len(questions)):
+        footer += [round(sums[i] / counts[i], 3) if counts[i] else None, None]
+    yield footer
+
+
+# =============================
+#             CSV
+# =============================
+# Excel / Sheets coi ô bắt đầu bằng các ký tự này là công thức (CSV injection)
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_value(value):
+    if hasattr(value, "strftime"):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return value
+
+
+def _csv_cell(value):
+    """Câu trả lời / tên do người dùng nhập: thêm ' trước để không chạy như công thức."""
+    value = _csv_value(value)
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(rows):
+    """CSV UTF-8 có BOM (Excel đọc đúng tiếng Việt), ghi ra theo từng khối dòng."""
+    buf = io.StringIO()
+    buf.write("\ufeff")
+    writer = csv.writer(buf)
+    for n, row in enumerate(rows, 1):
+        writer.writerow([_csv_cell(v) for v in row])
+        if n % _FLUSH_ROWS == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate(0)
+    yield buf.getvalue()
+
+
+# =============================
+#             XLSX
+# =============================
+_XML_HEAD = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_NS_PKG = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+_XLSX_PARTS = (
+    ("[Content_Types].xml", _XML_HEAD + (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    )),
+    ("_rels/.rels", _XML_HEAD + (
+        f'<Relationships xmlns="{_NS_PKG}">'
+        f'<Relationship Id="rId1" Type="{_NS_REL}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    )),
+    ("xl/workbook.xml", _XML_HEAD + (
+        f'<workbook xmlns="{_NS_MAIN}" xmlns:r="{_NS_REL}">'
+        '<sheets><sheet name="Gradebook" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )),
+    ("xl/_rels/workbook.xml.rels", _XML_HEAD + (
+        f'<Relationships xmlns="{_NS_PKG}">'
+        f'<Relationship Id="rId1" Type="{_NS_REL}/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    )),
+)
+
+_SHEET_HEAD = _XML_HEAD + (
+    f'<worksheet xmlns="{_NS_MAIN}">'
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+    '</sheetView></sheetViews><sheetData>'
+)
+_SHEET_TAIL = "</sheetData></worksheet>"
+
+# ký tự điều khiển không hợp lệ trong XML 1.0 (câu trả lời tự do có thể chứa)
+_INVALID_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _column_name(index):
+    name = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        name = chr(65 + rem) + name
+    return name
+
+
+def _cell(ref, value):
+    if value is None:
+        return ""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c r="{ref}"><v>{value!r}</v></c>'
+    value = _csv_value(value)
+    text = escape(_INVALID_XML.sub("", str(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class _Sink:
+    """File-like chỉ ghi: gom byte zipfile ghi ra để generator yield dần."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def stream_xlsx(rows):
+    sink = _Sink()
+    columns = []
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, xml in _XLSX_PARTS:
+            zf.writestr(name, xml)
+
+        with zf.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write(_SHEET_HEAD.encode("utf-8"))
+            for n, row in enumerate(rows, 1):
+                while len(columns) < len(row):
+                    columns.append(_column_name(len(columns)))
+                cells = "".join(_cell(f"{columns[i]}{n}", v) for i, v in enumerate(row))
+                sheet.write(f'<row r="{n}">{cells}</row>'.encode("utf-8"))
+                if n % _FLUSH_ROWS == 0:
+                    yield sink.drain()
+            sheet.write(_SHEET_TAIL.encode("utf-8"))
+    yield sink.drain()
+
+
+# =============================
+#            EXPORT
+# =============================
+def export(quiz, fmt="csv", attempt="best"):
+    """(generator nội dung, mimetype, tên file)."""
+    rows = iter_rows(quiz, attempt)
+    body = stream_csv(rows) if fmt == "csv" else stream_xlsx(rows)
+    return body, FORMATS[fmt], f"gradebook_quiz_{quiz.id}.{fmt}"
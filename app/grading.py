@@ -0,0 +1,443 @@
+"""
+Chấm điểm bài làm.
+
+- mcq / true_false: so choice id với tập đáp án đúng của câu hỏi.
+- fill_in: các Choice is_correct=True của câu hỏi là tập đáp án chấp nhận.
+  Đáp án được chuẩn hóa (hoa/thường, khoảng trắng, dấu tiếng Việt, số)
+  và biên dịch một lần thành AnswerKey → so khớp O(1) mỗi câu trả lời.
+- essay: để checked=False, chấm sau (app.tasks).
+
+Quiz practice: kết quả từng câu cập nhật lịch ôn tập (app/practice.py).
+
+Lưu trữ: câu chọn đáp án ghi Answer.choice_id (integer), chỉ fill_in / essay
+ghi text vào user_answer. Submission.correctness_bitmap (tùy chọn,
+ANSWER_CORRECTNESS_BITMAP) gói đúng/sai của cả bài vào vài byte.
+"""
+import math
+import re
+import unicodedata
+from datetime import datetime
+from functools import lru_cache
+
+from flask import current_app
+
+from app import db
+from app.models import Answer, Choice, Question, Submission
+from app.histograms import record_score
+from app.monitor import track_finished
+from app.practice import record_submission_reviews
+from app.snapshots import get_snapshot
+from app.stats import record_submission
+
+_EDGE_WRAP = " \t\r\n\"'`()[]{}"   # bỏ ở cả hai đầu
+_TRAILING_PUNCT = ",;:!?"              # dấu câu cuối câu, "." xử lý riêng
+# dấu phẩy phân cách hàng nghìn: 1,000 / 12,345,678.9 (không bắt 0,125)
+_GROUPED_NUMBER = re.compile(r"^[+-]?[1-9]\d{0,2}(,\d{3})+(\.\d*)?$")
+# đọc được hai kiểu: 1,250 = 1250 hay 1,25 → theo định dạng của đáp án / config
+_AMBIGUOUS_NUMBER = re.compile(r"^[+-]?[1-9]\d{0,2},\d{3}$")
+
+
+# =============================
+#        NORMALIZATION
+# =============================
+def normalize_answer(text, strip_diacritics=True):
+    """Chuẩn hóa câu trả lời tự do để so khớp."""
+    text = unicodedata.normalize("NFC", text or "").casefold()
+    if strip_diacritics:
+        # đ không phải dấu kết hợp nên NFD không tách được
+        text = text.replace("đ", "d")
+        text = "".join(
+            ch for ch in unicodedata.normalize("NFD", text)
+            if not unicodedata.combining(ch)
+        )
+    return _strip_edges(" ".join(text.split()))
+
+
+def _strip_edges(text):
+    """
+    Bỏ ngoặc / nháy ở hai đầu và dấu câu ở cuối. Không bỏ "." sát chữ số:
+    ".5" là 0.5 (không phải 5), "5." vẫn là số 5.
+    """
+    while True:
+        before = text
+        text = text.strip(_EDGE_WRAP).rstrip(_TRAILING_PUNCT)
+        if text.endswith(".") and not text[-2:-1].isdigit():
+            text = text[:-1]
+        if text == before:
+            return text
+
+
+def _to_float(text):
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    if math.isnan(value) or math.isinf(value):
+        return None
+    return value
+
+
+def _number_text(text):
+    text = text.replace(" ", "")
+    if text.endswith("."):
+        text = text[:-1]  # dấu chấm hết câu: "3,5." → "3,5"
+    return text
+
+
+def parse_number(text, decimal_comma=False):
+    """
+    '3,5' / '3.5' / ' 1e3 ' / '1,000' → float, không phải số → None.
+    Chỉ một cách đọc: dạng mơ hồ '1,250' theo decimal_comma
+    (False → 1250, True → 1.25).
+    """
+    text = _number_text(text)
+    if _AMBIGUOUS_NUMBER.match(text):
+        text = text.replace(",", "." if decimal_comma else "")
+    elif _GROUPED_NUMBER.match(text):
+        text = text.replace(",", "")
+    elif text.count(",") == 1 and "." not in text:
+        text = text.replace(",", ".")
+    return _to_float(text)
+
+
+def comma_style(texts):
+    """
+    Dấu phẩy trong các đáp án dùng làm gì: True = thập phân ('3,5'),
+    False = phân cách nghìn ('1,000,000' / '1,000.5'), None = không rõ.
+    """
+    for text in texts:
+        text = _number_text(text)
+        if "," not in text or _AMBIGUOUS_NUMBER.match(text) or parse_number(text) is None:
+            continue
+        return not _GROUPED_NUMBER.match(text)
+    return None
+
+
+def bounded_levenshtein(a, b, max_distance):
+    """
+    Khoảng cách Levenshtein giới hạn: chỉ tính trong dải |i - j| <= max_distance,
+    dừng sớm khi vượt ngưỡng. Trả về max_distance + 1 nếu xa hơn.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if a == b:
+        return 0
+    if not a or not b:
+        return max(len(a), len(b))
+
+    too_far = max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [too_far] * (len(b) + 1)
+        if i <= max_distance:
+            current[0] = i
+        lo = max(1, i - max_distance)
+        hi = min(len(b), i + max_distance)
+        for j in range(lo, hi + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + cost,
+            )
+        if min(current[lo - 1:hi + 1]) > max_distance:
+            return too_far
+        previous = current
+    return min(previous[len(b)], too_far)
+
+
+# =============================
+#         ANSWER KEY
+# =============================
+class AnswerKey:
+    """Tập đáp án fill_in đã chuẩn hóa + index số theo bucket dung sai."""
+
+    __slots__ = ("texts", "numbers", "tolerance", "strip_diacritics", "decimal_comma")
+
+    def __init__(self, accepted, tolerance=0.0, strip_diacritics=True, decimal_comma=False):
+        self.tolerance = tolerance
+        self.strip_diacritics = strip_diacritics
+
+        texts = set()
+        for raw in accepted:
+            norm = normalize_answer(raw, strip_diacritics)
+            if norm:
+                texts.add(norm)
+
+        # '1,250' mơ hồ: đọc theo cách đáp án tự viết dấu phẩy, không rõ thì theo config
+        style = comma_style(texts)
+        self.decimal_comma = decimal_comma if style is None else style
+
+        numbers = {}
+        for norm in texts:
+            value = parse_number(norm, self.decimal_comma)
+            if value is not None:
+                numbers.setdefault(self._bucket(value), []).append(value)
+
+        self.texts = frozenset(texts)
+        self.numbers = numbers
+
+    def _bucket(self, value):
+        if self.tolerance > 0:
+            return math.floor(value / self.tolerance)
+        return value
+
+    def _match_number(self, value):
+        if self.tolerance <= 0:
+            return value in self.numbers
+
+        # đáp án trong dung sai chỉ có thể nằm ở bucket kề bên
+        bucket = self._bucket(value)
+        for b in (bucket - 1, bucket, bucket + 1):
+            for accepted in self.numbers.get(b, ()):
+                if abs(accepted - value) <= self.tolerance:
+                    return True
+        return False
+
+    def match(self, user_answer, fuzzy_distance=0):
+        norm = normalize_answer(user_answer, self.strip_diacritics)
+        if not norm:
+            return False
+        if norm in self.texts:
+            return True
+
+        if self.numbers:
+            value = parse_number(norm, self.decimal_comma)
+            if value is not None:
+                return self._match_number(value)
+
+        if fuzzy_distance > 0:
+            return any(
+                bounded_levenshtein(norm, accepted, fuzzy_distance) <= fuzzy_distance
+                for accepted in self.texts
+            )
+        return False
+
+
+@lru_cache(maxsize=4096)
+def compile_answer_key(accepted, tolerance, strip_diacritics, decimal_comma=False):
+    """Cache theo nội dung đáp án → sửa đáp án tự tạo key mới."""
+    return AnswerKey(accepted, tolerance, strip_diacritics, decimal_comma)
+
+
+def _compile_keys(accepted):
+    config = current_app.config
+    tolerance = config.get("FILL_IN_NUMERIC_TOLERANCE", 0.0)
+    strip_diacritics = config.get("FILL_IN_IGNORE_DIACRITICS", True)
+    decimal_comma = config.get("FILL_IN_DECIMAL_COMMA", False)
+    return {
+        qid: compile_answer_key(tuple(sorted(texts)), tolerance, strip_diacritics, decimal_comma)
+        for qid, texts in accepted.items()
+    }
+
+
+def load_answer_keys(question_ids, snapshot=None):
+    """question_id → AnswerKey cho các câu fill_in (snapshot hoặc một query)."""
+    if not question_ids:
+        return {}
+
+    if snapshot is not None:
+        return _compile_keys({qid: snapshot.accepted_answers(qid) for qid in question_ids})
+
+    accepted = {qid: [] for qid in question_ids}
+    rows = (
+        db.session.query(Choice.question_id, Choice.content)
+        .filter(Choice.question_id.in_(question_ids), Choice.is_correct.is_(True))
+        .all()
+    )
+    for qid, content in rows:
+        accepted[qid].append(content)
+
+    return _compile_keys(accepted)
+
+
+def load_choice_keys(question_ids, snapshot=None):
+    """question_id → set id các choice đúng (mcq / true_false)."""
+    if snapshot is not None:
+        return {qid: snapshot.correct_choice_ids(qid) for qid in question_ids}
+
+    keys = {qid: set() for qid in question_ids}
+    if not question_ids:
+        return keys
+
+    rows = (
+        db.session.query(Choice.question_id, Choice.id)
+        .filter(Choice.question_id.in_(question_ids), Choice.is_correct.is_(True))
+        .all()
+    )
+    for qid, choice_id in rows:
+        keys[qid].add(choice_id)
+    return keys
+
+
+def _fuzzy_distance():
+    return current_app.config.get("FILL_IN_FUZZY_DISTANCE", 0)
+
+
+def parse_choice_id(user_answer):
+    """Câu trả lời thô của câu chọn đáp án → choice id (int) hoặc None."""
+    if not user_answer:
+        return None
+    try:
+        return int(user_answer)
+    except (TypeError, ValueError):
+        return None
+
+
+# =============================
+#      CORRECTNESS BITMAP
+# =============================
+def pack_correctness(flags):
+    """[đúng/sai theo question_id tăng dần] → bytes, bit i ở byte i // 8."""
+    bits = 0
+    for i, flag in enumerate(flags):
+        if flag:
+            bits |= 1 << i
+    return bits.to_bytes((len(flags) + 7) // 8, "little")
+
+
+def unpack_correctness(bitmap, count):
+    bits = int.from_bytes(bitmap or b"", "little")
+    return [bool(bits >> i & 1) for i in range(count)]
+
+
+def _bitmap_enabled():
+    return current_app.config.get("ANSWER_CORRECTNESS_BITMAP", True)
+
+
+def refresh_correctness_bitmaps(submission_ids):
+    """Gói lại bitmap của các submission từ bảng answers (chưa commit)."""
+    if not submission_ids or not _bitmap_enabled():
+        return
+
+    rows = db.session.execute(
+        db.select(Answer.submission_id, Answer.is_correct)
+        .where(Answer.submission_id.in_(submission_ids))
+        .order_by(Answer.submission_id, Answer.question_id)
+    )
+    flags = {}
+    for submission_id, is_correct in rows:
+        flags.setdefault(submission_id, []).append(bool(is_correct))
+    if flags:
+        table = Submission.__table__
+        db.session.execute(
+            table.update()
+            .where(table.c.id == db.bindparam("sid"))
+            .values(correctness_bitmap=db.bindparam("bitmap")),
+            [{"sid": sid, "bitmap": pack_correctness(f)} for sid, f in flags.items()],
+        )
+
+
+# =============================
+#           GRADING
+# =============================
+def grade_submission(submission, questions, user_answers):
+    """
+    Tạo Answer cho từng câu và tính điểm submission (thang 10).
+    user_answers: question_id → câu trả lời thô (str / None).
+    Trả về True nếu có câu essay cần chấm sau.
+    """
+    # đáp án đọc từ snapshot (không query) nếu mọi câu đều có trong đó
+    snapshot = get_snapshot(submission.quiz)
+    if snapshot is not None and not all(q.id in snapshot for q in questions):
+        snapshot = None
+
+    choice_keys = load_choice_keys(
+        [q.id for q in questions if q.type in ("mcq", "true_false")], snapshot
+    )
+    fill_in_keys = load_answer_keys(
+        [q.id for q in questions if q.type == "fill_in"], snapshot
+    )
+    fuzzy_distance = _fuzzy_distance()
+
+    total = len(questions)
+    correct = 0
+    flags = {}
+
+    for q in questions:
+        user_answer = user_answers.get(q.id)
+        choice_id = None
+
+        is_correct = False
+        if q.type in ("mcq", "true_false"):
+            choice_id = parse_choice_id(user_answer)
+            is_correct = choice_id in choice_keys[q.id]
+            user_answer = None
+        elif q.type == "fill_in":
+            is_correct = fill_in_keys[q.id].match(user_answer, fuzzy_distance)
+
+        ans = Answer(
+            submission_id=submission.id,
+            question_id=q.id,
+            choice_id=choice_id,
+            user_answer=user_answer or None,
+            is_correct=is_correct,
+            score=1.0 if is_correct else 0.0,
+            checked=q.type != "essay",
+        )
+        db.session.add(ans)
+        flags[q.id] = is_correct
+
+        if is_correct:
+            correct += 1
+
+    if _bitmap_enabled():
+        submission.correctness_bitmap = pack_correctness([flags[qid] for qid in sorted(flags)])
+
+    submission.total_questions = total
+    submission.correct_answers = correct
+    submission.score = (correct / total) * 10 if total > 0 else 0
+    submission.finished_at = datetime.utcnow()
+
+    # rollup + histogram cập nhật trong cùng transaction với bài nộp
+    record_submission(submission)
+    record_score(submission.quiz_id, submission.score)
+    track_finished(submission)
+    record_submission_reviews(submission, questions, flags, user_answers)
+
+    return any(q.type == "essay" for q in questions)
+
+
+def recompute_submission_totals(submission_ids):
+    """
+    Tính lại correct_answers / score (một UPDATE) và bitmap đúng/sai cho các
+    submission từ bảng answers (chưa commit).
+    """
+    if not submission_ids:
+        return
+
+    correct = (
+        db.select(db.func.count(Answer.id))
+        .where(Answer.submission_id == Submission.id, Answer.is_correct.is_(True))
+        .scalar_subquery()
+    )
+    db.session.execute(
+        db.update(Submission)
+        .where(Submission.id.in_(submission_ids))
+        .values(
+            correct_answers=correct,
+            # cùng thứ tự phép tính với grade_submission: (đúng / tổng) * 10
+            score=db.case(
+                (Submission.total_questions > 0,
+                 db.cast(correct, db.Float) / Submission.total_questions * 10),
+                else_=0.0,
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    refresh_correctness_bitmaps(submission_ids)
+
+
+def regrade_fill_in_answers(quiz_id=None, chunk_size=None):
+    """
+    Chấm lại toàn bộ câu fill_in đã nộp bằng engine hiện tại (app/regrade.py).
+    Trả về (số answer thay đổi, số submission thay đổi).
+    """
+    from app.regrade import regrade_questions
+
+    query = db.session.query(Question.id).filter(Question.type == "fill_in")
+    if quiz_id is not None:
+        query = query.filter(Question.quiz_id == quiz_id)
+
+    result = regrade_questions([row[0] for row in query], chunk_size=chunk_size)
+    return result.answers, result.submissions
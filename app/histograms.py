@@ -0,0 +1,133 @@
+"""
+Histogram điểm theo quiz (bảng quiz_score_histograms) cho thứ hạng phần trăm.
+
+Mỗi quiz có tối đa 101 bucket 0.1 điểm (bucket = điểm * 10). Lúc chấm bài,
+record_score() cộng 1 vào bucket trong cùng transaction (UPSERT atomic,
+không đọc trước). Trang kết quả đọc histogram đã cộng dồn từ cache trong
+worker nên percentile() là O(1), không COUNT trên submissions.
+
+Đếm theo lượt làm: mọi submission đã nộp, gồm cả archive.
+rebuild_histograms() dựng lại từ dữ liệu gốc (flask rebuild-histograms,
+sau khi chấm lại / xóa hẳn user).
+"""
+from flask import current_app
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db, archive
+from app.http_cache import MicroCache
+from app.models import QuizScoreHistogram, Submission
+
+BUCKETS_PER_POINT = 10
+MAX_BUCKET = 10 * BUCKETS_PER_POINT
+_EPSILON = 1e-6  # 7.3 * 10 = 72.99999... vẫn vào bucket 73
+
+_cache = MicroCache()
+
+
+def bucket_of(score):
+    return min(MAX_BUCKET, max(0, int((score or 0.0) * BUCKETS_PER_POINT + _EPSILON)))
+
+
+# =============================
+#            WRITE
+# =============================
+def _upsert(rows):
+    """Cộng count vào (quiz_id, bucket), tạo dòng nếu chưa có (chưa commit)."""
+    table = QuizScoreHistogram.__table__
+    dialect = db.engine.dialect.name
+
+    if dialect in ("sqlite", "postgresql"):
+        insert = (sqlite.insert if dialect == "sqlite" else postgresql.insert)(table)
+        db.session.execute(
+            insert.on_conflict_do_update(
+                index_elements=[table.c.quiz_id, table.c.bucket],
+                set_={"count": table.c.count + insert.excluded["count"]},
+            ),
+            rows,
+        )
+        return
+
+    for row in rows:
+        updated = db.session.execute(
+            table.update()
+            .where(table.c.quiz_id == row["quiz_id"], table.c.bucket == row["bucket"])
+            .values(count=table.c.count + row["count"])
+        ).rowcount
+        if not updated:
+            db.session.execute(table.insert(), row)
+
+
+def record_score(quiz_id, score):
+    """Cộng lượt vừa chấm vào histogram (gọi trong grade_submission)."""
+    _upsert([{"quiz_id": quiz_id, "bucket": bucket_of(score), "count": 1}])
+    _cache.delete(quiz_id)
+
+
+def rebuild_histograms(quiz_ids=None):
+    """Dựng lại histogram từ submissions (DB + archive). Trả về số quiz."""
+    counts = {}
+
+    # điểm chỉ có ít giá trị khác nhau (đúng / tổng * 10) → group theo điểm,
+    # chia bucket bằng Python để giống hệt record_score
+    query = (
+        db.session.query(Submission.quiz_id, Submission.score, db.func.count())
+        .filter(Submission.finished_at.isnot(None))
+        .group_by(Submission.quiz_id, Submission.score)
+    )
+    if quiz_ids is not None:
+        quiz_ids = set(quiz_ids)
+        query = query.filter(Submission.quiz_id.in_(quiz_ids))
+    for quiz_id, score, n in query:
+        key = (quiz_id, bucket_of(score))
+        counts[key] = counts.get(key, 0) + n
+
+    for sub in archive.iter_submissions(quiz_ids):
+        key = (sub.quiz_id, bucket_of(sub.score))
+        counts[key] = counts.get(key, 0) + 1
+
+    delete = QuizScoreHistogram.query
+    if quiz_ids is not None:
+        delete = delete.filter(QuizScoreHistogram.quiz_id.in_(quiz_ids))
+    delete.delete(synchronize_session=False)
+
+    rows = [
+        {"quiz_id": quiz_id, "bucket": bucket, "count": n}
+        for (quiz_id, bucket), n in sorted(counts.items())
+    ]
+    if rows:
+        db.session.execute(QuizScoreHistogram.__table__.insert(), rows)
+    db.session.commit()
+    _cache.clear()
+    return len({quiz_id for quiz_id, _ in counts})
+
+
+# =============================
+#            READ
+# =============================
+def _load(quiz_id):
+    """(below, total): below[b] = số lượt có bucket < b, cache trong worker."""
+    cached = _cache.get(quiz_id)
+    if cached is not None:
+        return cached
+
+    counts = [0] * (MAX_BUCKET + 1)
+    for bucket, n in db.session.query(
+        QuizScoreHistogram.bucket, QuizScoreHistogram.count
+    ).filter(QuizScoreHistogram.quiz_id == quiz_id):
+        counts[bucket] = n
+
+    below = [0] * (MAX_BUCKET + 1)
+    for b in range(1, MAX_BUCKET + 1):
+        below[b] = below[b - 1] + counts[b - 1]
+    hist = (below, below[MAX_BUCKET] + counts[MAX_BUCKET])
+
+    _cache.set(quiz_id, hist, current_app.config.get("SCORE_HISTOGRAM_CACHE_SECONDS", 5))
+    return hist
+
+
+def percentile(quiz_id, score):
+    """% lượt làm của quiz có điểm thấp hơn score, None nếu chưa đủ 2 lượt."""
+    below, total = _load(quiz_id)
+    if total < 2:
+        return None
+    return below[bucket_of(score)] * 100 // total
@@ -0,0 +1,102 @@
+"""
+HTTP conditional GET (ETag / Last-Modified) và micro-cache trong process.
+
+View tính "version" rẻ của dữ liệu trước, nếu client gửi If-None-Match /
+If-Modified-Since khớp thì trả 304 luôn, không chạy các query nặng
+và không render template.
+"""
+import hashlib
+import os
+import threading
+import time
+from datetime import timezone
+
+from flask import request, make_response
+
+DEFAULT_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts):
+    raw = "|".join("" if p is None else str(p) for p in parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _http_date(dt):
+    """datetime UTC naive (DB) → aware, bỏ microsecond (HTTP date tính theo giây)."""
+    if dt is None:
+        return None
+    return dt.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def not_modified(etag, last_modified=None, cache_control=DEFAULT_CACHE_CONTROL):
+    """Response 304 nếu request khớp version hiện tại, ngược lại None."""
+    last_modified = _http_date(last_modified)
+
+    if request.if_none_match:
+        matched = request.if_none_match.contains(etag)
+    elif request.if_modified_since and last_modified:
+        matched = last_modified <= request.if_modified_since
+    else:
+        matched = False
+
+    if not matched:
+        return None
+
+    response = make_response("", 304)
+    return with_validators(response, etag, last_modified, cache_control)
+
+
+def with_validators(response, etag, last_modified=None, cache_control=DEFAULT_CACHE_CONTROL):
+    response = make_response(response)
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = _http_date(last_modified)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+class MicroCache:
+    """Cache key → value sống vài giây, dùng chung trong một worker."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, key, value, ttl):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_file_hashes = {}
+
+
+def file_hash(path):
+    """sha256 của file, cache theo (mtime, size) để không đọc lại mỗi request."""
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _file_hashes.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            digest.update(block)
+    _file_hashes[path] = (key, digest.hexdigest())
+    return digest.hexdigest()
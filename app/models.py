@@ -8,12 +8,27 @@ from app import db, login
 
 class User(UserMixin, db.Model):
     __tablename__ = "users"
+    __table_args__ = (
+        # trang quản lý user: lọc role + keyset theo id,
+        # tìm theo tiền tố không phân biệt hoa thường (range trên lower(...))
+        db.Index("ix_users_role_id", "role", "id"),
+        db.Index("ix_users_username_lower", db.text("lower(username)")),
+        db.Index("ix_users_email_lower", db.text("lower(email)")),
+        # chỉ index user đã xóa: "deleted_at IS NULL" khớp gần hết bảng, index
+        # đầy đủ chỉ làm planner chọn nhầm thay vì keyset / index tìm kiếm
+        db.Index(
+            "ix_users_deleted_at", "deleted_at",
+            sqlite_where=db.text("deleted_at IS NOT NULL"),
+            postgresql_where=db.text("deleted_at IS NOT NULL"),
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), unique=True, index=True, nullable=False)
     email = db.Column(db.String(120), unique=True, index=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
     role = db.Column(db.String(20), default="student")  # student / admin
+    deleted_at = db.Column(db.DateTime)  # soft delete, dọn dẹp ở background
 
     submissions = db.relationship("Submission", backref="user", lazy="dynamic")
     certificates = db.relationship("Certificate", backref="user", lazy="dynamic")
@@ -34,7 +49,10 @@ class User(UserMixin, db.Model):
 
 @login.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user = User.query.get(int(user_id))
+    if user is None or user.deleted_at is not None:
+        return None
+    return user
 
 
 class Quiz(db.Model):
@@ -46,6 +64,7 @@ class Quiz(db.Model):
     time_limit = db.Column(db.Integer)  # phút, None = không giới hạn
     mode = db.Column(db.String(20), default="exam")  # exam / practice
     is_active = db.Column(db.Boolean, default=True)
+    deleted_at = db.Column(db.DateTime, index=True)  # soft delete
 
     created_by = db.Column(db.Integer, db.ForeignKey("users.id"))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -55,6 +74,14 @@ class Quiz(db.Model):
     pass_score = db.Column(db.Float, default=5)  # thang 10
     enable_certificate = db.Column(db.Boolean, default=False)
     show_explanation = db.Column(db.Boolean, default=True)
+    difficulty_blueprint = db.Column(db.JSON)  # {"easy": 40, "medium": 40, "hard": 20}
+    bank_version = db.Column(db.Integer, default=0)  # tăng mỗi khi ngân hàng câu hỏi đổi
+
+    # phòng chờ khi mở đề: số học sinh được vào mỗi giây + số vào dồn tối đa
+    admission_rate = db.Column(db.Float)  # None = không giới hạn
+    admission_burst = db.Column(db.Integer)
+
+    results_version = db.Column(db.Integer, default=0)  # tăng khi chấm lại làm điểm đổi
 
     questions = db.relationship("Question", backref="quiz", lazy="dynamic")
     submissions = db.relationship("Submission", backref="quiz", lazy="dynamic")
@@ -75,6 +102,7 @@ class Question(db.Model):
 
     difficulty = db.Column(db.String(20))  # easy / medium / hard
     time_limit = db.Column(db.Integer)  # giây, optional
+    deleted_at = db.Column(db.DateTime, index=True)  # soft delete
 
     choices = db.relationship("Choice", backref="question", lazy="dynamic")
     answers = db.relationship("Answer", backref="question", lazy="dynamic")
@@ -97,6 +125,12 @@ class Choice(db.Model):
 
 class Submission(db.Model):
     __tablename__ = "submissions"
+    __table_args__ = (
+        # version leaderboard / result: max(finished_at) theo quiz
+        db.Index("ix_submissions_quiz_id_finished_at", "quiz_id", "finished_at"),
+        # id không được dùng lại sau khi archive xóa dòng (archived_submissions giữ id cũ)
+        {"sqlite_autoincrement": True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -110,6 +144,18 @@ class Submission(db.Model):
     score = db.Column(db.Float, default=0.0)  # thang 10
     time_spent = db.Column(db.Integer, default=0)  # giây
 
+    # lượt làm qua API: bộ câu đã rút + đáp án lưu tạm trước khi nộp
+    question_ids = db.Column(db.JSON)
+    draft_answers = db.Column(db.JSON)
+
+    # bit i = câu trả lời thứ i (theo question_id tăng dần) đúng, xem grading.pack_correctness
+    correctness_bitmap = db.Column(db.LargeBinary)
+
+    # nhật ký sự kiện làm bài (app/attempt_events.py): khóa lượt làm của trang làm bài,
+    # số lần rời tab — NULL = chưa compact / không có sự kiện
+    attempt_key = db.Column(db.String(32), index=True)
+    blur_count = db.Column(db.Integer)
+
     answers = db.relationship("Answer", backref="submission", lazy="dynamic")
 
     def __repr__(self):
@@ -118,16 +164,34 @@ class Submission(db.Model):
 
 class Answer(db.Model):
     __tablename__ = "answers"
+    __table_args__ = (
+        # chấm lại theo câu hỏi / tính lại tổng điểm theo submission
+        db.Index("ix_answers_question_id", "question_id"),
+        db.Index("ix_answers_submission_id", "submission_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     submission_id = db.Column(db.Integer, db.ForeignKey("submissions.id"), nullable=False)
     question_id = db.Column(db.Integer, db.ForeignKey("questions.id"), nullable=False)
 
+    # mcq / true_false: id choice đã chọn; fill_in / essay: nội dung tự do
+    choice_id = db.Column(db.Integer)
     user_answer = db.Column(db.Text)
     is_correct = db.Column(db.Boolean, default=False)
     score = db.Column(db.Float, default=0.0)
     checked = db.Column(db.Boolean, default=False)  # essay chấm tay / celery
 
+    # từ nhật ký sự kiện (compact): giây xem câu này, số lần rời tab khi đang ở câu này
+    time_spent = db.Column(db.Integer)
+    blur_count = db.Column(db.Integer)
+
+    @property
+    def response(self):
+        """Câu trả lời thô như lúc nộp (choice id dạng chuỗi hoặc text)."""
+        if self.choice_id is not None:
+            return str(self.choice_id)
+        return self.user_answer
+
     def __repr__(self):
         return f"<Answer sub={self.submission_id} q={self.question_id}>"
 
@@ -146,3 +210,146 @@ class Certificate(db.Model):
 
     def __repr__(self):
         return f"<Certificate user={self.user_id} quiz={self.quiz_id}>"
+
+
+class RegradeJob(db.Model):
+    """Một lần chấm lại sau khi đổi đáp án (xem app/regrade.py)."""
+    __tablename__ = "regrade_jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey("quizzes.id"), nullable=False, index=True)
+    question_ids = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(20), default="pending")  # pending / running / done / failed
+
+    created_by = db.Column(db.Integer, db.ForeignKey("users.id"))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    answers_changed = db.Column(db.Integer, default=0)
+    submissions_changed = db.Column(db.Integer, default=0)
+    # chứng chỉ không còn đạt: [{"id", "user_id", "best_score"}, ...]
+    invalid_certificates = db.Column(db.JSON)
+    error = db.Column(db.Text)
+
+    quiz = db.relationship("Quiz")
+
+    def __repr__(self):
+        return f"<RegradeJob {self.id} {self.status}>"
+
+
+class ArchivedSubmission(db.Model):
+    """Index của submission đã chuyển sang cold storage (xem app/archive.py)."""
+    __tablename__ = "archived_submissions"
+
+    id = db.Column(db.Integer, primary_key=True)  # = id submission gốc
+    user_id = db.Column(db.Integer, index=True, nullable=False)
+    quiz_id = db.Column(db.Integer, index=True, nullable=False)
+    partition = db.Column(db.String(7), nullable=False)  # YYYY-MM
+    created_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<ArchivedSubmission {self.id} {self.partition}>"
+
+
+class UserQuizStats(db.Model):
+    """Rollup kết quả của một user cho một quiz, cập nhật khi nộp bài."""
+    __tablename__ = "user_quiz_stats"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey("quizzes.id"), primary_key=True)
+
+    attempts = db.Column(db.Integer, default=0)
+    best_score = db.Column(db.Float, default=0.0)
+    total_score = db.Column(db.Float, default=0.0)  # mean = total_score / attempts
+    last_score = db.Column(db.Float)
+    last_submission_id = db.Column(db.Integer)
+    last_finished_at = db.Column(db.DateTime)
+    total_time_spent = db.Column(db.Integer, default=0)  # giây
+    passed = db.Column(db.Boolean, default=False)  # đã từng đạt pass_score
+    recent_scores = db.Column(db.JSON)  # [[created_at iso, score], ...] cho chart
+
+    quiz = db.relationship("Quiz")
+
+    @property
+    def mean_score(self):
+        return self.total_score / self.attempts if self.attempts else 0.0
+
+    def __repr__(self):
+        return f"<UserQuizStats user={self.user_id} quiz={self.quiz_id}>"
+
+
+class QuizScoreHistogram(db.Model):
+    """Số lượt làm theo bucket 0.1 điểm của mỗi quiz (xem app/histograms.py)."""
+    __tablename__ = "quiz_score_histograms"
+
+    quiz_id = db.Column(db.Integer, db.ForeignKey("quizzes.id"), primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True, autoincrement=False)  # điểm * 10: 0..100
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<QuizScoreHistogram quiz={self.quiz_id} bucket={self.bucket}>"
+
+
+class ReviewState(db.Model):
+    """Trạng thái nhớ SM-2 của một user với một câu hỏi practice (xem app/practice.py)."""
+    __tablename__ = "review_states"
+    __table_args__ = (
+        # hàng đợi ôn tập: câu đến hạn của user trong một quiz
+        db.Index("ix_review_states_due", "user_id", "quiz_id", "due_at"),
+        {"sqlite_with_rowid": False},
+    )
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey("questions.id"), primary_key=True)
+    quiz_id = db.Column(db.Integer, nullable=False)
+
+    repetitions = db.Column(db.SmallInteger, nullable=False, default=0)  # đúng liên tiếp
+    interval_days = db.Column(db.SmallInteger, nullable=False, default=0)
+    ease = db.Column(db.SmallInteger, nullable=False, default=250)  # hệ số dễ × 100
+    lapses = db.Column(db.SmallInteger, nullable=False, default=0)  # số lần quên
+    due_at = db.Column(db.DateTime, nullable=False)
+    reviewed_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<ReviewState user={self.user_id} question={self.question_id}>"
+
+
+class QuestionSignature(db.Model):
+    """Chữ ký MinHash của nội dung câu hỏi (xem app/dedupe.py)."""
+    __tablename__ = "question_signatures"
+
+    question_id = db.Column(db.Integer, db.ForeignKey("questions.id"), primary_key=True)
+    signature = db.Column(db.LargeBinary, nullable=False)  # NUM_PERM x uint32
+
+    def __repr__(self):
+        return f"<QuestionSignature {self.question_id}>"
+
+
+class QuestionLshBucket(db.Model):
+    """Bucket LSH: mỗi câu hỏi có 1 dòng cho mỗi band của chữ ký."""
+    __tablename__ = "question_lsh_buckets"
+    __table_args__ = (
+        db.Index("ix_question_lsh_buckets_band_bucket", "band", "bucket"),
+    )
+
+    question_id = db.Column(db.Integer, db.ForeignKey("questions.id"), primary_key=True)
+    band = db.Column(db.SmallInteger, primary_key=True)
+    bucket = db.Column(db.BigInteger, nullable=False)
+
+    def __repr__(self):
+        return f"<QuestionLshBucket q={self.question_id} band={self.band}>"
+
+
+class ReplicationHeartbeat(db.Model):
+    """
+    Một dòng duy nhất, ghi trên primary mỗi lần sync (flask sync-replica).
+    Đọc giá trị này trên replica → biết replica trễ bao lâu (xem app/db_routing.py).
+    """
+    __tablename__ = "replication_heartbeat"
+
+    id = db.Column(db.Integer, primary_key=True)
+    ts = db.Column(db.Float, nullable=False)  # epoch giây
+
+    def __repr__(self):
+        return f"<ReplicationHeartbeat {self.ts}>"
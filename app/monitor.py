@@ -0,0 +1,350 @@
+"""
+Theo dõi quiz đang thi theo thời gian thực cho admin (Server-Sent Events).
+
+Mỗi worker giữ một QuizMonitor cho mỗi quiz:
+    - grade_submission báo bài vừa nộp, cộng vào aggregator ngay sau khi
+      transaction commit: số bài nộp, số đạt, histogram điểm (0..10),
+      tổng điểm / tổng thời gian làm → trung bình
+    - start_quiz / API tạo lượt làm báo học sinh "đang làm"
+Mọi admin xem cùng quiz dùng chung aggregator: mỗi thay đổi serialize JSON
+một lần rồi đẩy vào hàng đợi riêng của từng kết nối, giới hạn
+MONITOR_BUFFER_SIZE sự kiện, đầy thì bỏ sự kiện cũ nhất (sự kiện stats là
+ảnh chụp toàn bộ nên client chậm chỉ mất bản cũ, không chặn người nộp bài).
+
+Trạng thái nằm trong process: bài nộp ở worker khác không đi qua aggregator
+này, nên khi có người xem, cứ MONITOR_RESYNC_SECONDS lại dựng lại từ DB
+(một query gộp theo quiz, dùng chung cho mọi người xem — không phải mỗi
+kết nối tự poll). "Đang làm" qua form chỉ thấy được trong worker đã mở đề;
+lượt làm qua API lấy từ DB lúc resync.
+"""
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event
+
+from app import db
+from app.db_routing import RoutingSession
+from app.models import Quiz, Submission, User
+
+MAX_BUCKET = 10  # histogram theo điểm nguyên 0..10
+_RECENT = 20     # số bài nộp gần nhất gửi cho người mới vào xem
+_PENDING_KEY = "monitor_finished"
+
+
+def _bucket(score):
+    return min(MAX_BUCKET, max(0, int(score or 0)))
+
+
+def _event(kind, payload):
+    return f"event: {kind}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+class _Subscriber:
+    __slots__ = ("events", "ready")
+
+    def __init__(self, size):
+        self.events = deque(maxlen=size)  # đầy → append tự bỏ sự kiện cũ nhất
+        self.ready = threading.Event()
+
+    def push(self, data):
+        self.events.append(data)
+        self.ready.set()
+
+    def drain(self):
+        items = []
+        while self.events:
+            items.append(self.events.popleft())
+        return items
+
+
+class QuizMonitor:
+    def __init__(self, quiz_id):
+        self.quiz_id = quiz_id
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._syncing = False
+        self.synced_at = None  # time.monotonic() lần resync cuối
+
+        self.finished = 0
+        self.passed = 0
+        self.score_sum = 0.0
+        self.time_sum = 0
+        self.histogram = [0] * (MAX_BUCKET + 1)
+        self.started = {}          # user_id → hết hạn (monotonic), vào đề ở worker này
+        self.remote_started = set()  # user_id lượt làm API chưa nộp (DB)
+        self.recent = deque(maxlen=_RECENT)
+
+    # ---------- trạng thái ----------
+    def _in_progress(self, now):
+        for user_id in [u for u, expires in self.started.items() if expires <= now]:
+            del self.started[user_id]
+        return len(self.started.keys() | self.remote_started)
+
+    def _snapshot(self, now):
+        n = self.finished
+        return {
+            "finished": n,
+            "in_progress": self._in_progress(now),
+            "passed": self.passed,
+            "avg_score": round(self.score_sum / n, 2) if n else None,
+            "avg_time": round(self.time_sum / n) if n else None,
+            "histogram": list(self.histogram),
+            "viewers": len(self._subscribers),
+        }
+
+    def _publish(self, *events):
+        for sub in self._subscribers:
+            for data in events:
+                sub.push(data)
+
+    def _publish_stats(self):
+        if self._subscribers:
+            self._publish(_event("stats", self._snapshot(time.monotonic())))
+
+    # ---------- nguồn sự kiện ----------
+    def start(self, user_id, ttl):
+        with self._lock:
+            self.started[user_id] = time.monotonic() + ttl
+            self._publish_stats()
+
+    def finish(self, user_id, username, score, time_spent, passed, finished_at):
+        item = {
+            "username": username,
+            "score": round(score, 2),
+            "time_spent": time_spent,
+            "passed": passed,
+            "finished_at": finished_at,
+        }
+        with self._lock:
+            self.finished += 1
+            self.passed += passed
+            self.score_sum += score
+            self.time_sum += time_spent
+            self.histogram[_bucket(score)] += 1
+            self.started.pop(user_id, None)
+            self.remote_started.discard(user_id)
+            self.recent.appendleft(item)
+            if self._subscribers:
+                self._publish(
+                    _event("submission", item),
+                    _event("stats", self._snapshot(time.monotonic())),
+                )
+
+    # ---------- người xem ----------
+    def subscribe(self, size):
+        sub = _Subscriber(size)
+        with self._lock:
+            self._subscribers.add(sub)
+            sub.push(_event("recent", list(self.recent)))
+            self._publish_stats()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+            self._publish_stats()
+
+    # ---------- đồng bộ DB ----------
+    def needs_sync(self, interval):
+        return self.synced_at is None or time.monotonic() - self.synced_at >= interval
+
+    def resync(self, window, in_progress_ttl):
+        """Dựng lại số liệu từ DB; nhiều người xem cùng lúc thì chỉ một người chạy."""
+        with self._lock:
+            if self._syncing:
+                return
+            self._syncing = True
+        try:
+            data = _load_from_db(self.quiz_id, window, in_progress_ttl)
+            with self._lock:
+                self.finished, self.passed, self.score_sum, self.time_sum = data["totals"]
+                self.histogram = data["histogram"]
+                self.remote_started = data["in_progress"]
+                self.recent = deque(data["recent"], maxlen=_RECENT)
+                self.synced_at = time.monotonic()
+                self._publish_stats()
+        finally:
+            self._syncing = False
+
+    def invalidate(self):
+        self.synced_at = None
+
+
+def _load_from_db(quiz_id, window, in_progress_ttl):
+    """Bài nộp trong `window` giây gần nhất + lượt làm API chưa nộp."""
+    now = datetime.utcnow()
+    since = now - timedelta(seconds=window)
+    with db.engine.connect() as conn:
+        pass_score = conn.execute(
+            db.select(Quiz.pass_score).where(Quiz.id == quiz_id)
+        ).scalar() or 0
+
+        # điểm chỉ có ít giá trị khác nhau → group theo điểm, chia bucket bằng Python
+        histogram = [0] * (MAX_BUCKET + 1)
+        finished = passed = time_sum = 0
+        score_sum = 0.0
+        rows = conn.execute(
+            db.select(Submission.score, db.func.count(), db.func.sum(Submission.time_spent))
+            .where(Submission.quiz_id == quiz_id, Submission.finished_at >= since)
+            .group_by(Submission.score)
+        )
+        for score, n, spent in rows:
+            score = score or 0.0
+            histogram[_bucket(score)] += n
+            finished += n
+            passed += n if score >= pass_score else 0
+            score_sum += score * n
+            time_sum += spent or 0
+
+        in_progress = {
+            row[0]
+            for row in conn.execute(
+                db.select(Submission.user_id).distinct().where(
+                    Submission.quiz_id == quiz_id,
+                    Submission.finished_at.is_(None),
+                    Submission.created_at >= now - timedelta(seconds=in_progress_ttl),
+                )
+            )
+        }
+
+        recent = [
+            {
+                "username": username,
+                "score": round(score or 0.0, 2),
+                "time_spent": spent or 0,
+                "passed": (score or 0.0) >= pass_score,
+                "finished_at": finished_at.isoformat(),
+            }
+            for username, score, spent, finished_at in conn.execute(
+                db.select(User.username, Submission.score, Submission.time_spent,
+                          Submission.finished_at)
+                .join(User, User.id == Submission.user_id)
+                .where(Submission.quiz_id == quiz_id, Submission.finished_at >= since)
+                .order_by(Submission.finished_at.desc())
+                .limit(_RECENT)
+            )
+        ]
+
+    return {
+        "totals": (finished, passed, score_sum, time_sum),
+        "histogram": histogram,
+        "in_progress": in_progress,
+        "recent": recent,
+    }
+
+
+# =============================
+#          REGISTRY
+# =============================
+_monitors = {}
+_monitors_lock = threading.Lock()
+_streams = [0]  # số kết nối SSE đang mở trong process
+
+
+def get_monitor(quiz_id):
+    monitor = _monitors.get(quiz_id)
+    if monitor is None:
+        with _monitors_lock:
+            monitor = _monitors.setdefault(quiz_id, QuizMonitor(quiz_id))
+    return monitor
+
+
+def invalidate(quiz_ids):
+    """Điểm đã đổi ngoài luồng nộp bài (chấm lại): resync ở lần xem tới."""
+    for quiz_id in quiz_ids:
+        monitor = _monitors.get(quiz_id)
+        if monitor is not None:
+            monitor.invalidate()
+
+
+def track_started(quiz, user_id):
+    """Học sinh vừa vào đề (form hoặc API)."""
+    ttl = quiz.time_limit * 60 if quiz.time_limit else current_app.config.get(
+        "MONITOR_IN_PROGRESS_SECONDS", 3 * 3600
+    )
+    get_monitor(quiz.id).start(user_id, ttl)
+
+
+def track_finished(submission):
+    """Gọi trong grade_submission: cộng vào aggregator sau khi transaction commit."""
+    quiz = submission.quiz
+    score = submission.score or 0.0
+    db.session.info.setdefault(_PENDING_KEY, []).append((
+        submission.quiz_id,
+        submission.user_id,
+        submission.user.username,
+        score,
+        submission.time_spent or 0,
+        score >= (quiz.pass_score or 0),
+        submission.finished_at.isoformat(),
+    ))
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _flush_finished(db_session):
+    for quiz_id, *args in db_session.info.pop(_PENDING_KEY, ()):
+        get_monitor(quiz_id).finish(*args)
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _drop_finished(db_session):
+    db_session.info.pop(_PENDING_KEY, None)
+
+
+# =============================
+#            STREAM
+# =============================
+def open_stream():
+    """
+    Giữ chỗ một kết nối SSE (mỗi kết nối chiếm một thread worker),
+    False nếu process đã đủ MONITOR_MAX_STREAMS. Nhả bằng close_stream().
+    """
+    limit = current_app.config.get("MONITOR_MAX_STREAMS", 2)
+    with _monitors_lock:
+        if _streams[0] >= limit:
+            return False
+        _streams[0] += 1
+        return True
+
+
+def close_stream():
+    with _monitors_lock:
+        _streams[0] -= 1
+
+
+def stream(quiz_id):
+    """
+    Generator SSE cho một kết nối (đã open_stream). Đóng sau
+    MONITOR_STREAM_SECONDS để nhả thread worker, EventSource tự nối lại.
+    """
+    config = current_app.config
+    heartbeat = config.get("MONITOR_HEARTBEAT_SECONDS", 15)
+    resync = config.get("MONITOR_RESYNC_SECONDS", 10)
+    window = config.get("MONITOR_WINDOW_SECONDS", 6 * 3600)
+    in_progress_ttl = config.get("MONITOR_IN_PROGRESS_SECONDS", 3 * 3600)
+    deadline = time.monotonic() + config.get("MONITOR_STREAM_SECONDS", 300)
+
+    monitor = get_monitor(quiz_id)
+    sub = monitor.subscribe(config.get("MONITOR_BUFFER_SIZE", 16))
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            if monitor.needs_sync(resync):
+                monitor.resync(window, in_progress_ttl)
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if sub.ready.wait(min(heartbeat, resync, remaining)):
+                sub.ready.clear()
+                events = sub.drain()
+                if events:
+                    yield "".join(events)
+            else:
+                yield ": ping\n\n"
+    finally:
+        monitor.unsubscribe(sub)
@@ -0,0 +1,321 @@
+"""
+Lịch ôn tập (spaced repetition) cho quiz chế độ practice.
+
+Mỗi cặp user × câu hỏi có một trạng thái nhớ nhỏ (bảng review_states,
+WITHOUT ROWID trên SQLite) theo SM-2:
+    repetitions    số lần đúng liên tiếp
+    interval_days  số ngày tới lần ôn sau
+    ease           hệ số dễ × 100 (SM-2: >= 130), sai nhiều → thấp
+    due_at         thời điểm đến hạn ôn
+
+record_reviews() cập nhật trạng thái từ kết quả Answer ngay trong transaction
+chấm bài (một SELECT theo khóa chính + một UPSERT). Câu sai được đưa lại sau
+PRACTICE_RELEARN_MINUTES, nên câu yếu luôn đứng đầu hàng đợi.
+
+Rút đề (draw_practice_ids) chỉ đọc index (user_id, quiz_id, due_at):
+    1. câu đến hạn, quá hạn lâu nhất trước
+    2. câu chưa làm bao giờ (lấy mẫu từ bank, kiểm tra theo khóa chính)
+    3. câu sắp đến hạn nhất
+Không quét lịch sử answers của user, nên thời gian rút không phụ thuộc số
+bài đã làm.
+
+rebuild_review_states() dựng lại từ answers trong DB (không gồm archive) —
+dùng một lần khi bật tính năng cho dữ liệu cũ (flask rebuild-review-states).
+"""
+import random
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from app.models import Answer, Question, Quiz, ReviewState, Submission
+from app.question_pool import draw_question_ids, get_bank_ids, question_count
+
+MIN_EASE = 130
+START_EASE = 250
+MAX_INTERVAL_DAYS = 3650  # interval_days là SMALLINT
+
+# chất lượng câu trả lời (thang SM-2 0..5)
+QUALITY_CORRECT = 4
+QUALITY_WRONG = 1
+QUALITY_BLANK = 0
+
+
+def _enabled(quiz):
+    return quiz.mode == "practice" and current_app.config.get("PRACTICE_SCHEDULER_ENABLED", True)
+
+
+# =============================
+#            SM-2
+# =============================
+def next_state(state, quality, now, relearn_minutes):
+    """
+    (repetitions, interval, ease, lapses) + chất lượng 0..5 → trạng thái mới
+    và due_at. state None = câu lần đầu gặp.
+    """
+    repetitions, interval, ease, lapses = state or (0, 0, START_EASE, 0)
+    if quality >= 3:
+        if repetitions == 0:
+            interval = 1
+        elif repetitions == 1:
+            interval = 6
+        else:
+            interval = min(MAX_INTERVAL_DAYS, max(1, round(interval * ease / 100)))
+        repetitions += 1
+        due_at = now + timedelta(days=interval)
+    else:
+        repetitions, interval = 0, 1
+        lapses += 1
+        due_at = now + timedelta(minutes=relearn_minutes)
+
+    miss = 5 - quality
+    ease = max(MIN_EASE, ease + 10 - miss * (8 + miss * 2))
+    return (repetitions, interval, ease, lapses), due_at
+
+
+def answer_quality(is_correct, answered):
+    if is_correct:
+        return QUALITY_CORRECT
+    return QUALITY_WRONG if answered else QUALITY_BLANK
+
+
+# =============================
+#            WRITE
+# =============================
+def _upsert(rows):
+    table = ReviewState.__table__
+    dialect = db.engine.dialect.name
+
+    if dialect in ("sqlite", "postgresql"):
+        insert = (sqlite.insert if dialect == "sqlite" else postgresql.insert)(table)
+        columns = ("quiz_id", "repetitions", "interval_days", "ease", "lapses",
+                   "due_at", "reviewed_at")
+        db.session.execute(
+            insert.on_conflict_do_update(
+                index_elements=[table.c.user_id, table.c.question_id],
+                set_={name: insert.excluded[name] for name in columns},
+            ),
+            rows,
+        )
+        return
+
+    for row in rows:
+        updated = db.session.execute(
+            table.update()
+            .where(table.c.user_id == row["user_id"], table.c.question_id == row["question_id"])
+            .values(**row)
+        ).rowcount
+        if not updated:
+            db.session.execute(table.insert(), row)
+
+
+def record_reviews(user_id, quiz_id, results, now=None):
+    """
+    Cập nhật trạng thái nhớ sau khi chấm bài (chưa commit).
+    results: [(question_id, quality)].
+    """
+    if not results:
+        return
+    now = now or datetime.utcnow()
+    relearn = current_app.config.get("PRACTICE_RELEARN_MINUTES", 10)
+
+    table = ReviewState.__table__
+    current = {
+        row[0]: tuple(row[1:])
+        for row in db.session.execute(
+            db.select(table.c.question_id, table.c.repetitions, table.c.interval_days,
+                      table.c.ease, table.c.lapses)
+            .where(table.c.user_id == user_id,
+                   table.c.question_id.in_([qid for qid, _ in results]))
+        )
+    }
+
+    rows = []
+    for question_id, quality in results:
+        (repetitions, interval, ease, lapses), due_at = next_state(
+            current.get(question_id), quality, now, relearn
+        )
+        rows.append({
+            "user_id": user_id,
+            "question_id": question_id,
+            "quiz_id": quiz_id,
+            "repetitions": repetitions,
+            "interval_days": interval,
+            "ease": ease,
+            "lapses": lapses,
+            "due_at": due_at,
+            "reviewed_at": now,
+        })
+    _upsert(rows)
+
+
+def record_submission_reviews(submission, questions, flags, user_answers):
+    """Gọi trong grade_submission: chỉ quiz practice, bỏ qua essay (chấm sau)."""
+    if not _enabled(submission.quiz):
+        return
+    results = [
+        (q.id, answer_quality(flags[q.id], bool((user_answers.get(q.id) or "").strip())))
+        for q in questions
+        if q.type != "essay"
+    ]
+    record_reviews(submission.user_id, submission.quiz_id, results, submission.finished_at)
+
+
+# =============================
+#             DRAW
+# =============================
+def _due_ids(user_id, quiz_id, now, bank, k, upcoming=False):
+    """Câu trong hàng đợi theo due_at (đến hạn, hoặc sắp đến hạn nếu upcoming)."""
+    table = ReviewState.__table__
+    due_filter = table.c.due_at > now if upcoming else table.c.due_at <= now
+    picked, offset = [], 0
+    while len(picked) < k:
+        # lấy dư: câu đã xóa khỏi bank vẫn còn trạng thái cho tới khi purge
+        page = [
+            row[0]
+            for row in db.session.execute(
+                db.select(table.c.question_id)
+                .where(table.c.user_id == user_id, table.c.quiz_id == quiz_id, due_filter)
+                .order_by(table.c.due_at)
+                .limit(2 * k)
+                .offset(offset)
+            )
+        ]
+        picked.extend(qid for qid in page if qid in bank)
+        if len(page) < 2 * k:
+            break
+        offset += len(page)
+    return picked[:k]
+
+
+def _new_ids(user_id, bank_ids, taken, k):
+    """Câu user chưa gặp: lấy mẫu từ bank, loại câu đã có trạng thái (tra khóa chính)."""
+    table = ReviewState.__table__
+    candidates = [qid for qid in random.sample(bank_ids, min(len(bank_ids), 4 * k))
+                  if qid not in taken]
+    seen = set()
+    for i in range(0, len(candidates), 500):
+        seen.update(
+            row[0]
+            for row in db.session.execute(
+                db.select(table.c.question_id).where(
+                    table.c.user_id == user_id,
+                    table.c.question_id.in_(candidates[i:i + 500]),
+                )
+            )
+        )
+    return [qid for qid in candidates if qid not in seen][:k]
+
+
+def draw_practice_ids(quiz, user_id, k=None, now=None):
+    """Bộ câu practice cho user: đến hạn → chưa gặp → sắp đến hạn."""
+    bank_ids = get_bank_ids(quiz)
+    bank = set(bank_ids)
+    k = question_count(quiz) if k is None else min(k, len(bank_ids))
+    now = now or datetime.utcnow()
+
+    drawn = _due_ids(user_id, quiz.id, now, bank, k)
+    if len(drawn) < k:
+        taken = set(drawn)
+        drawn.extend(_new_ids(user_id, bank_ids, taken, k - len(drawn)))
+    if len(drawn) < k:
+        taken = set(drawn)
+        drawn.extend(
+            qid for qid in _due_ids(user_id, quiz.id, now, bank, k, upcoming=True)
+            if qid not in taken
+        )
+    if len(drawn) < k:
+        # lấy mẫu chưa trúng câu mới còn sót: bù ngẫu nhiên từ phần còn lại
+        taken = set(drawn)
+        rest = [qid for qid in bank_ids if qid not in taken]
+        drawn.extend(random.sample(rest, min(len(rest), k - len(drawn))))
+
+    drawn = drawn[:k]
+    random.shuffle(drawn)
+    return drawn
+
+
+def draw_for_user(quiz, user_id):
+    """Rút đề cho một lượt làm: quiz practice theo lịch ôn, còn lại như cũ."""
+    if _enabled(quiz):
+        return draw_practice_ids(quiz, user_id)
+    return draw_question_ids(quiz)
+
+
+def due_counts(user_id, quiz_ids, now=None):
+    """{quiz_id: số câu đến hạn ôn} cho trang chủ."""
+    if not quiz_ids:
+        return {}
+    table = ReviewState.__table__
+    now = now or datetime.utcnow()
+    return dict(
+        db.session.execute(
+            db.select(table.c.quiz_id, db.func.count())
+            .where(table.c.user_id == user_id, table.c.quiz_id.in_(quiz_ids),
+                   table.c.due_at <= now)
+            .group_by(table.c.quiz_id)
+        ).all()
+    )
+
+
+# =============================
+#           REBUILD
+# =============================
+def rebuild_review_states(quiz_ids=None):
+    """
+    Phát lại answers đã chấm của các quiz practice theo thứ tự nộp bài.
+    quiz_ids: chỉ dựng lại các quiz này, None = mọi quiz practice.
+    """
+    practice = db.select(Quiz.id).where(Quiz.mode == "practice")
+    if quiz_ids is not None:
+        practice = practice.where(Quiz.id.in_(list(quiz_ids)))
+    practice_ids = [row[0] for row in db.session.execute(practice)]
+    if not practice_ids:
+        return 0
+
+    relearn = current_app.config.get("PRACTICE_RELEARN_MINUTES", 10)
+    chunk_size = current_app.config.get("PURGE_CHUNK_SIZE", 500)
+    rows = (
+        db.session.query(
+            Submission.user_id, Submission.quiz_id, Submission.finished_at,
+            Answer.question_id, Answer.is_correct, Answer.choice_id, Answer.user_answer,
+        )
+        .join(Answer, Answer.submission_id == Submission.id)
+        .join(Question, Question.id == Answer.question_id)
+        .filter(
+            Submission.quiz_id.in_(practice_ids),
+            Submission.finished_at.isnot(None),
+            Question.type != "essay",
+        )
+        .order_by(Submission.finished_at, Submission.id)
+        .yield_per(5000)
+    )
+
+    states = {}
+    for user_id, quiz_id, finished_at, question_id, is_correct, choice_id, text in rows:
+        key = (user_id, question_id)
+        answered = choice_id is not None or bool((text or "").strip())
+        state, due_at = next_state(
+            states.get(key, (None,))[0], answer_quality(is_correct, answered),
+            finished_at, relearn,
+        )
+        states[key] = (state, due_at, quiz_id, finished_at)
+
+    table = ReviewState.__table__
+    db.session.execute(table.delete().where(table.c.quiz_id.in_(practice_ids)))
+    batch = []
+    for (user_id, question_id), (state, due_at, quiz_id, reviewed_at) in states.items():
+        repetitions, interval, ease, lapses = state
+        batch.append({
+            "user_id": user_id, "question_id": question_id, "quiz_id": quiz_id,
+            "repetitions": repetitions, "interval_days": interval, "ease": ease,
+            "lapses": lapses, "due_at": due_at, "reviewed_at": reviewed_at,
+        })
+        if len(batch) >= chunk_size * 10:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+    db.session.commit()
+    return len(states)
@@ -0,0 +1,158 @@
+"""
+Rút câu hỏi cho một lượt làm bài.
+
+Mỗi worker giữ index id câu hỏi theo độ khó cho từng quiz:
+    quiz_id → (bank_version, {"easy": (ids...), "medium": ..., "hard": ..., None: ...}, all_ids)
+Index chỉ được build lại khi Quiz.bank_version đổi (thêm/sửa/xóa câu hỏi),
+nên mỗi lượt rút chỉ tốn O(k) và chỉ load đúng k câu được chọn.
+"""
+import random
+import threading
+
+from app import db
+from app.models import Question
+from app.snapshots import get_snapshot
+
+DIFFICULTIES = ("easy", "medium", "hard")
+
+_index = {}
+_lock = threading.Lock()
+
+
+def bump_bank_version(quiz):
+    """Gọi khi ngân hàng câu hỏi của quiz thay đổi."""
+    quiz.bank_version = (quiz.bank_version or 0) + 1
+
+
+def parse_blueprint(form):
+    """Đọc % easy/medium/hard từ form tạo quiz → dict hoặc None."""
+    blueprint = {}
+    for level in DIFFICULTIES:
+        raw = form.get(f"blueprint_{level}")
+        try:
+            weight = float(raw) if raw else 0
+        except ValueError:
+            weight = 0
+        if weight > 0:
+            blueprint[level] = weight
+    return blueprint or None
+
+
+def _get_index(quiz):
+    version = quiz.bank_version or 0
+    cached = _index.get(quiz.id)
+    if cached and cached[0] == version:
+        return cached
+
+    snapshot = get_snapshot(quiz)
+    if snapshot is not None:
+        rows = [(qid, snapshot.difficulty_of(qid)) for qid in snapshot.question_ids()]
+    else:
+        rows = (
+            db.session.query(Question.id, Question.difficulty)
+            .filter(Question.quiz_id == quiz.id, Question.deleted_at.is_(None))
+            .order_by(Question.id)
+            .all()
+        )
+    buckets = {}
+    for qid, difficulty in rows:
+        key = difficulty if difficulty in DIFFICULTIES else None
+        buckets.setdefault(key, []).append(qid)
+    buckets = {key: tuple(ids) for key, ids in buckets.items()}
+    entry = (version, buckets, tuple(qid for qid, _ in rows))
+
+    with _lock:
+        _index[quiz.id] = entry
+    return entry
+
+
+def get_bucket_index(quiz):
+    """Index id câu hỏi theo độ khó, build lại khi bank_version đổi."""
+    return _get_index(quiz)[1]
+
+
+def get_bank_ids(quiz):
+    """Mọi id câu hỏi (chưa xóa) của quiz, tăng dần."""
+    return _get_index(quiz)[2]
+
+
+def _allocate(blueprint, k, buckets):
+    """
+    Chia k câu theo tỉ lệ blueprint (largest remainder), không vượt quá
+    số câu có trong mỗi bucket.
+    """
+    weights = {level: w for level, w in blueprint.items() if w > 0}
+    total_weight = sum(weights.values())
+    if not total_weight:
+        return {}
+
+    raw = {level: k * w / total_weight for level, w in weights.items()}
+    counts = {level: int(v) for level, v in raw.items()}
+    leftover = k - sum(counts.values())
+    for level in sorted(raw, key=lambda lv: raw[lv] - counts[lv], reverse=True)[:leftover]:
+        counts[level] += 1
+
+    return {
+        level: min(n, len(buckets.get(level, ())))
+        for level, n in counts.items()
+    }
+
+
+def draw_question_ids(quiz, k=None):
+    """Rút k id câu hỏi (mặc định quiz.num_questions) theo blueprint của quiz."""
+    _, buckets, all_ids = _get_index(quiz)
+    k = question_count(quiz) if k is None else min(k, len(all_ids))
+
+    drawn = []
+    if quiz.difficulty_blueprint:
+        for level, n in _allocate(quiz.difficulty_blueprint, k, buckets).items():
+            drawn.extend(random.sample(buckets[level], n))
+
+    if not drawn:
+        drawn = random.sample(all_ids, k)
+    elif len(drawn) < k:
+        # bucket không đủ câu → bù ngẫu nhiên từ phần còn lại của bank
+        _fill_from_bank(drawn, all_ids, k)
+
+    random.shuffle(drawn)
+    return drawn
+
+
+def question_count(quiz):
+    """Số câu một lượt làm bài của quiz."""
+    bank_size = len(_get_index(quiz)[2])
+    return min(quiz.num_questions or bank_size, bank_size)
+
+
+def _fill_from_bank(drawn, all_ids, k):
+    taken = set(drawn)
+    if 2 * k <= len(all_ids):
+        # k nhỏ so với bank: rejection sampling, kỳ vọng O(k)
+        while len(drawn) < k:
+            qid = random.choice(all_ids)
+            if qid not in taken:
+                taken.add(qid)
+                drawn.append(qid)
+    else:
+        rest = [qid for qid in all_ids if qid not in taken]
+        drawn.extend(random.sample(rest, k - len(drawn)))
+
+
+def load_questions(quiz, question_ids):
+    """Load Question của quiz theo danh sách id, giữ nguyên thứ tự, bỏ id trùng."""
+    question_ids = list(dict.fromkeys(question_ids or ()))
+    if not question_ids:
+        return []
+
+    snapshot = get_snapshot(quiz)
+    if snapshot is not None:
+        return snapshot.questions(question_ids)
+    by_id = {
+        q.id: q
+        for q in Question.query.filter(
+            Question.id.in_(question_ids),
+            Question.quiz_id == quiz.id,
+            Question.deleted_at.is_(None),
+        ).all()
+    }
+    return [by_id[qid] for qid in question_ids if qid in by_id]
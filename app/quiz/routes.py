@@ -1,6 +1,8 @@
 from functools import wraps
-import random
 from datetime import datetime
+import os
+import secrets
+import time
 
 from flask import (
     render_template,
@@ -10,15 +12,42 @@ from flask import (
     abort,
     send_from_directory,
     current_app,
+    flash,
+    jsonify,
+    stream_with_context,
 )
 from flask_login import login_required, current_user
+from itsdangerous import BadSignature, URLSafeSerializer
 from sqlalchemy import func
 
-from app import db
+from app import db, archive, attempt_events, dedupe, gradebook, monitor
 from app.quiz import quiz_bp
-from app.models import Quiz, Question, Choice, Submission, Answer, User, Certificate
-from app.certificates import generate_certificate
-from app.tasks import grade_essay_submission
+from app.models import (
+    Quiz,
+    Question,
+    Choice,
+    Submission,
+    User,
+    Certificate,
+    UserQuizStats,
+    RegradeJob,
+)
+from app.grading import grade_submission
+from app.snapshots import get_snapshot, publish_snapshot
+from app.stats import get_stats
+from app.histograms import percentile
+from app.db_routing import read_only
+from app.admission import admit, admit_quiz, release, remaining_seconds
+from app.search import index_question, remove_questions, search_questions
+from app.regrade import answer_key, create_job, has_answers
+from app.http_cache import MicroCache, file_hash, make_etag, not_modified, with_validators
+from app.practice import draw_for_user, due_counts
+from app.question_pool import (
+    bump_bank_version,
+    load_questions,
+    parse_blueprint,
+)
+from app.tasks import grade_essay_submission, purge_question, purge_quiz, regrade_job
 
 
 def admin_required(f):
@@ -31,122 +60,253 @@ def admin_required(f):
     return decorated
 
 
+def _attempt_serializer():
+    return URLSafeSerializer(current_app.secret_key, salt="quiz-attempt")
+
+
+def _sign_attempt(quiz, question_ids, attempt_key):
+    """
+    Bộ câu đã rút lúc GET, ký bằng SECRET_KEY và gửi kèm form: POST chỉ chấm
+    đúng bộ câu này (không tin question_ids do client tự gửi).
+    """
+    return _attempt_serializer().dumps({
+        "u": current_user.id,
+        "q": quiz.id,
+        "ids": list(question_ids),
+        "a": attempt_key,
+        "s": int(time.time()),
+    })
+
+
+def _load_attempt(quiz, token):
+    """Payload của token lượt làm, None nếu sai chữ ký / không thuộc user + quiz này."""
+    try:
+        payload = _attempt_serializer().loads(token or "")
+    except BadSignature:
+        return None
+    if not isinstance(payload, dict) or payload.get("u") != current_user.id \
+            or payload.get("q") != quiz.id:
+        return None
+    ids = payload.get("ids")
+    if not isinstance(ids, list) or not ids or len(set(ids)) != len(ids):
+        return None
+    return payload
+
+
+def _get_own_submission_or_404(submission_id):
+    """
+    Submission đã nộp trong DB, fallback sang cold storage nếu đã archive.
+    Lượt làm qua API đang mở (finished_at None) chưa có kết quả → 404.
+    """
+    submission = Submission.query.get(submission_id) or archive.get_submission(submission_id)
+    if submission is None or submission.finished_at is None:
+        abort(404)
+    if submission.user_id != current_user.id and not current_user.is_admin:
+        abort(403)
+    return submission
+
+
 # =============================
 #           STUDENT
 # =============================
 @quiz_bp.route("/")
 @login_required
 def home():
-    quizzes = Quiz.query.filter_by(is_active=True).all()
-    return render_template("quiz/home.html", quizzes=quizzes)
+    quizzes = Quiz.query.filter_by(is_active=True, deleted_at=None).all()
+    my_stats = UserQuizStats.query.filter_by(user_id=current_user.id).all()
+    due = due_counts(current_user.id, [q.id for q in quizzes if q.mode == "practice"])
+    return render_template("quiz/home.html", quizzes=quizzes, my_stats=my_stats, due=due)
 
 
 @quiz_bp.route("/list")
 @login_required
 def quiz_list():
-    quizzes = Quiz.query.filter_by(is_active=True).all()
+    quizzes = Quiz.query.filter_by(is_active=True, deleted_at=None).all()
     return render_template("quiz/list.html", quizzes=quizzes)
 
 
 @quiz_bp.route("/start/<int:quiz_id>", methods=["GET", "POST"])
 @login_required
 def start_quiz(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
+    quiz = Quiz.query.filter_by(id=quiz_id, deleted_at=None).first_or_404()
 
-    # exam mode: không cho làm lại
+    # exam mode: không cho làm lại, kể cả khi đang có lượt làm dở qua API
     if quiz.mode == "exam":
         existing = Submission.query.filter_by(
             user_id=current_user.id, quiz_id=quiz.id
-        ).first()
+        ).order_by(Submission.finished_at.is_(None)).first()
+        if existing and existing.finished_at is None:
+            abort(409, "Bạn đang có một lượt làm bài thi này chưa nộp.")
         if existing and request.method == "GET":
             return redirect(url_for("quiz.view_result", submission_id=existing.id))
-
-    questions = Question.query.filter_by(quiz_id=quiz.id).all()
-    random.shuffle(questions)
-
-    if quiz.num_questions and len(questions) > quiz.num_questions:
-        questions = questions[: quiz.num_questions]
+        if existing:
+            abort(409, "Bài thi này đã được nộp.")
 
     if request.method == "POST":
-        submission = Submission(user_id=current_user.id, quiz_id=quiz.id)
+        # chấm đúng bộ câu đã rút lúc GET (token ký, không nhận id tùy ý từ form).
+        # Không qua phòng chờ: token chứng minh lượt làm đã được vào, nộp bài
+        # sau khi quyền vào hết hạn vẫn phải nhận (không mất bài)
+        attempt = _load_attempt(quiz, request.form.get("attempt_token"))
+        if attempt is None:
+            abort(400)
+        # câu bị xóa trong lúc làm bài thì bỏ qua, còn lại chấm bình thường
+        questions = load_questions(quiz, attempt["ids"])
+        if not questions:
+            abort(400)
+
+        submission = Submission(
+            user_id=current_user.id,
+            quiz_id=quiz.id,
+            attempt_key=attempt_events.parse_attempt_key(attempt.get("a")),
+        )
         db.session.add(submission)
         db.session.flush()
 
-        total = len(questions)
-        correct = 0
-
         try:
             submission.time_spent = int(request.form.get("time_spent", "0"))
         except ValueError:
             submission.time_spent = 0
 
-        for q in questions:
-            field_name = f"q_{q.id}"
-            user_answer = request.form.get(field_name)
-
-            ans = Answer(
-                submission_id=submission.id,
-                question_id=q.id,
-                user_answer=user_answer or "",
-            )
-
-            is_correct = False
-            if q.type in ("mcq", "true_false"):
-                if user_answer:
-                    choice = Choice.query.get(int(user_answer))
-                    if choice and choice.is_correct:
-                        is_correct = True
-
-            ans.is_correct = is_correct
-            ans.score = 1.0 if is_correct else 0.0
-            ans.checked = q.type != "essay"
-
-            if is_correct:
-                correct += 1
-
-            db.session.add(ans)
-
-        submission.total_questions = total
-        submission.correct_answers = correct
-        submission.score = (correct / total) * 10 if total > 0 else 0
-        submission.finished_at = datetime.utcnow()
-
-        has_essay = any(q.type == "essay" for q in questions)
+        user_answers = {q.id: request.form.get(f"q_{q.id}") for q in questions}
+        has_essay = grade_submission(submission, questions, user_answers)
         db.session.commit()
+        if quiz.admission_rate:
+            release(quiz.id, current_user.id)
 
         if has_essay:
             grade_essay_submission(submission.id)
 
         return redirect(url_for("quiz.view_result", submission_id=submission.id))
 
-    countdown_seconds = quiz.time_limit * 60 if quiz.time_limit else None
+    # phòng chờ: chặn trước khi rút đề
+    admission = admit_quiz(quiz, current_user.id)
+    if not admission.admitted:
+        return _waiting_room(quiz, admission)
+
+    # đếm ngược tính từ lúc được vào, không tính thời gian chờ
+    countdown_seconds = remaining_seconds(quiz.time_limit, admission)
+    monitor.track_started(quiz, current_user.id)
+
+    questions = load_questions(quiz, draw_for_user(quiz, current_user.id))
+
+    # khóa lượt làm: beacon sự kiện gửi kèm, form nộp bài lưu vào Submission
+    attempt_key = None
+    if current_app.config.get("ATTEMPT_EVENTS_ENABLED", True):
+        attempt_key = secrets.token_hex(16)
 
     return render_template(
         "quiz/do_quiz.html",
         quiz=quiz,
         questions=questions,
+        attempt_token=_sign_attempt(quiz, [q.id for q in questions], attempt_key),
         countdown_seconds=countdown_seconds,
+        attempt_key=attempt_key,
+        beacon_seconds=current_app.config.get("ATTEMPT_EVENTS_BEACON_SECONDS", 10),
+    )
+
+
+# =============================
+#        ATTEMPT EVENTS
+# =============================
+_MAX_BEACON_BYTES = 64 * 1024
+
+
+@quiz_bp.route("/events", methods=["POST"])
+@login_required
+def attempt_events_beacon():
+    """Lô sự kiện từ trang làm bài (sendBeacon), chỉ ghi vào buffer — không chạm DB."""
+    if not current_app.config.get("ATTEMPT_EVENTS_ENABLED", True):
+        return "", 204
+    if (request.content_length or 0) > _MAX_BEACON_BYTES:
+        abort(413)
+
+    payload = request.get_json(force=True, silent=True)
+    if not isinstance(payload, dict):
+        abort(400)
+    attempt_key = attempt_events.parse_attempt_key(payload.get("attempt"))
+    quiz_id = payload.get("quiz_id")
+    if attempt_key is None or type(quiz_id) is not int:
+        abort(400)
+
+    events = attempt_events.clean_events(
+        payload.get("events"), current_app.config.get("ATTEMPT_EVENTS_MAX_BATCH", 200)
+    )
+    if events:
+        attempt_events.record(current_user.id, attempt_key, quiz_id, events)
+    return "", 204
+
+
+# =============================
+#         WAITING ROOM
+# =============================
+_admission_limits_cache = MicroCache()
+
+
+def _waiting_room(quiz, admission):
+    html = render_template(
+        "quiz/waiting.html",
+        quiz=quiz,
+        admission=admission,
+        poll_seconds=current_app.config.get("ADMISSION_POLL_SECONDS", 3),
+    )
+    response = current_app.make_response(html)
+    response.headers["Retry-After"] = str(admission.retry_after)
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+def _admission_limits(quiz_id):
+    """(rate, burst, time_limit) của quiz, cache vài giây để poll không chạm DB."""
+    limits = _admission_limits_cache.get(quiz_id)
+    if limits is None:
+        quiz = Quiz.query.filter_by(id=quiz_id, deleted_at=None).first_or_404()
+        limits = (quiz.admission_rate, quiz.admission_burst, quiz.time_limit)
+        _admission_limits_cache.set(quiz_id, limits, 5)
+    return limits
+
+
+@quiz_bp.route("/start/<int:quiz_id>/admission")
+@login_required
+def admission_status(quiz_id):
+    """Trang chờ poll endpoint này; được vào thì chuyển sang start_quiz."""
+    admission = admit(quiz_id, current_user.id, *_admission_limits(quiz_id))
+    response = jsonify(
+        admitted=admission.admitted,
+        position=admission.position,
+        retry_after=admission.retry_after,
+        start_url=url_for("quiz.start_quiz", quiz_id=quiz_id),
     )
+    response.headers["Cache-Control"] = "no-store"
+    return response
 
 
 @quiz_bp.route("/result/<int:submission_id>")
 @login_required
 def view_result(submission_id):
-    submission = Submission.query.get_or_404(submission_id)
-    if submission.user_id != current_user.id and not current_user.is_admin:
-        abort(403)
+    submission = _get_own_submission_or_404(submission_id)
 
     quiz = submission.quiz
 
-    # cá nhân: lịch sử điểm để vẽ chart
-    user_scores = (
-        Submission.query
-        .filter_by(user_id=submission.user_id, quiz_id=submission.quiz_id)
-        .order_by(Submission.created_at.asc())
-        .all()
+    # version: bài này + rollup của user cho quiz (chart, thống kê)
+    stats = get_stats(submission.user_id, submission.quiz_id)
+    latest = stats.last_finished_at if stats else None
+    # tốt hơn bao nhiêu % lượt làm: đổi khi người khác nộp → nằm trong ETag
+    rank = percentile(quiz.id, submission.score)
+    etag = make_etag(
+        "result", submission.id, submission.finished_at, submission.score,
+        latest, stats.attempts if stats else 0, stats.best_score if stats else None,
+        quiz.pass_score, quiz.enable_certificate, quiz.show_explanation,
+        rank, current_user.id,
     )
-    labels = [s.created_at.strftime("%d/%m %H:%M") for s in user_scores]
-    scores = [s.score for s in user_scores]
+    last_modified = max(filter(None, [submission.finished_at, latest]), default=None)
+    cached = not_modified(etag, last_modified)
+    if cached:
+        return cached
+
+    # cá nhân: các lần làm gần nhất để vẽ chart, đọc từ rollup
+    recent = stats.recent_scores if stats else []
+    labels = [datetime.fromisoformat(at).strftime("%d/%m %H:%M") for at, _ in recent]
+    scores = [score for _, score in recent]
 
     cert = None
     if quiz.enable_certificate and submission.score >= quiz.pass_score:
@@ -155,31 +315,38 @@ def view_result(submission_id):
             quiz_id=submission.quiz_id
         ).first()
         if not cert:
+            # ReportLab chỉ import khi thực sự cần sinh chứng chỉ
+            from app.certificates import generate_certificate
             cert = generate_certificate(submission)
 
-    return render_template(
+    html = render_template(
         "quiz/result.html",
         submission=submission,
         quiz=quiz,
         certificate=cert,
+        stats=stats,
+        percentile=rank,
         score_labels=labels,
         score_values=scores,
     )
+    return with_validators(html, etag, last_modified)
 
 
 @quiz_bp.route("/review/<int:submission_id>")
 @login_required
 def review_submission(submission_id):
-    submission = Submission.query.get_or_404(submission_id)
-    if submission.user_id != current_user.id and not current_user.is_admin:
-        abort(403)
+    submission = _get_own_submission_or_404(submission_id)
 
     quiz = submission.quiz
     if not quiz.show_explanation:
         abort(403)
 
     answers_by_q = {a.question_id: a for a in submission.answers}
-    questions = Question.query.filter_by(quiz_id=quiz.id).all()
+    snapshot = get_snapshot(quiz)
+    if snapshot is not None:
+        questions = snapshot.questions()
+    else:
+        questions = Question.query.filter_by(quiz_id=quiz.id, deleted_at=None).all()
 
     return render_template(
         "quiz/review.html",
@@ -192,39 +359,85 @@ def review_submission(submission_id):
 
 @quiz_bp.route("/history")
 @login_required
+@read_only
 def history():
     submissions = (
         Submission.query.filter_by(user_id=current_user.id)
+        .filter(Submission.finished_at.isnot(None))
         .order_by(Submission.created_at.desc())
         .all()
     )
-    return render_template("quiz/history.html", submissions=submissions)
+    archived = archive.user_submissions(current_user.id)
+    if archived:
+        submissions = sorted(
+            submissions + archived, key=lambda s: s.created_at, reverse=True
+        )
+    my_stats = UserQuizStats.query.filter_by(user_id=current_user.id).all()
+    return render_template(
+        "quiz/history.html", submissions=submissions, my_stats=my_stats
+    )
 
 
 @quiz_bp.route("/leaderboard/<int:quiz_id>")
 @login_required
+@read_only
 def leaderboard(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
+    quiz = Quiz.query.filter_by(id=quiz_id, deleted_at=None).first_or_404()
+
+    # micro-cache vài giây: gom refresh dồn dập lúc đang thi
+    # results_version: chấm lại làm điểm đổi mà không có bài nộp mới
+    results_version = quiz.results_version or 0
+    cached = _leaderboard_cache.get(quiz.id)
+    if cached and cached[0][-1] == results_version:
+        version, rows = cached
+    else:
+        version = (
+            *db.session.query(func.max(Submission.finished_at), func.max(Submission.id))
+            .filter(Submission.quiz_id == quiz.id, Submission.finished_at.isnot(None))
+            .one(),
+            results_version,
+        )
+        rows = None
+
+    etag = make_etag("leaderboard", quiz.id, quiz.title, *version, current_user.id)
+    response = not_modified(etag, version[0])
+    if response:
+        return response
 
-    rows = (
+    if rows is None:
+        rows = _leaderboard_rows(quiz)
+        ttl = current_app.config.get("LEADERBOARD_CACHE_SECONDS", 0)
+        _leaderboard_cache.set(quiz.id, (tuple(version), rows), ttl)
+
+    html = render_template(
+        "quiz/leaderboard.html",
+        quiz=quiz,
+        leaderboard=rows,
+    )
+    return with_validators(html, etag, version[0])
+
+
+_leaderboard_cache = MicroCache()
+
+
+def _leaderboard_rows(quiz):
+    return (
         db.session.query(
             User.username,
             func.max(Submission.score).label("best_score"),
         )
         .join(User, User.id == Submission.user_id)
-        .filter(Submission.quiz_id == quiz.id)
+        .filter(
+            Submission.quiz_id == quiz.id,
+            Submission.finished_at.isnot(None),
+            User.deleted_at.is_(None),
+        )
         .group_by(User.id)
         .order_by(func.max(Submission.score).desc())
         .limit(10)
         .all()
     )
 
-    return render_template(
-        "quiz/leaderboard.html",
-        quiz=quiz,
-        leaderboard=rows,
-    )
-
 
 @quiz_bp.route("/certificate/<int:quiz_id>")
 @login_required
@@ -235,12 +448,23 @@ def download_certificate(quiz_id):
     ).first_or_404()
 
     folder = current_app.config.get("CERT_FOLDER", "certificates")
-    import os
-    return send_from_directory(
-        os.path.join(current_app.instance_path, folder),
+    folder_path = os.path.join(current_app.instance_path, folder)
+    full_path = os.path.join(folder_path, cert.file_path)
+    if not os.path.exists(full_path):
+        abort(404)
+
+    etag = file_hash(full_path)
+    cached = not_modified(etag, cert.issued_at)
+    if cached:
+        return cached
+
+    response = send_from_directory(
+        folder_path,
         cert.file_path,
         as_attachment=True,
+        etag=False,
     )
+    return with_validators(response, etag, cert.issued_at)
 
 
 # =============================
@@ -249,7 +473,11 @@ def download_certificate(quiz_id):
 @quiz_bp.route("/admin/quizzes")
 @admin_required
 def manage_quizzes():
-    quizzes = Quiz.query.order_by(Quiz.created_at.desc()).all()
+    quizzes = (
+        Quiz.query.filter_by(deleted_at=None)
+        .order_by(Quiz.created_at.desc())
+        .all()
+    )
     return render_template("quiz/manage_quizzes.html", quizzes=quizzes)
 
 
@@ -265,6 +493,9 @@ def create_quiz():
         pass_score = request.form.get("pass_score") or 5
         enable_certificate = bool(request.form.get("enable_certificate"))
         show_explanation = bool(request.form.get("show_explanation"))
+        difficulty_blueprint = parse_blueprint(request.form)
+        admission_rate = request.form.get("admission_rate") or None
+        admission_burst = request.form.get("admission_burst") or None
 
         quiz = Quiz(
             title=title,
@@ -277,6 +508,9 @@ def create_quiz():
             pass_score=float(pass_score),
             enable_certificate=enable_certificate,
             show_explanation=show_explanation,
+            difficulty_blueprint=difficulty_blueprint,
+            admission_rate=float(admission_rate) if admission_rate else None,
+            admission_burst=int(admission_burst) if admission_burst else None,
         )
         db.session.add(quiz)
         db.session.commit()
@@ -288,7 +522,7 @@ def create_quiz():
 @quiz_bp.route("/admin/quizzes/<int:quiz_id>/questions", methods=["GET", "POST"])
 @admin_required
 def manage_questions(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
+    quiz = Quiz.query.filter_by(id=quiz_id, deleted_at=None).first_or_404()
 
     if request.method == "POST":
         content = request.form.get("content")
@@ -316,46 +550,172 @@ def manage_questions(quiz_id):
             choice = Choice(
                 question_id=q.id,
                 content=text,
-                is_correct=(str(i) == correct_choice),
+                # fill_in: mọi đáp án nhập vào đều được chấp nhận
+                is_correct=(qtype == "fill_in" or str(i) == correct_choice),
             )
             db.session.add(choice)
 
+        index_question(q)
+        duplicates = dedupe.update_signature(q)
+        bump_bank_version(quiz)
         db.session.commit()
+        publish_snapshot(quiz)
+        _flash_duplicates(duplicates)
         return redirect(url_for("quiz.manage_questions", quiz_id=quiz.id))
 
-    questions = Question.query.filter_by(quiz_id=quiz.id).all()
+    questions = Question.query.filter_by(quiz_id=quiz.id, deleted_at=None).all()
     return render_template("quiz/manage_questions.html", quiz=quiz, questions=questions)
 
+# =============================
+#     NEAR-DUPLICATE QUESTIONS
+# =============================
+def _flash_duplicates(duplicates):
+    if not duplicates:
+        return
+    listed = ", ".join(f"#{q.id} ({score:.0%})" for q, score in duplicates[:5])
+    flash(f"Câu hỏi gần trùng với {len(duplicates)} câu đã có: {listed}", "warning")
+
+
+@quiz_bp.route("/admin/questions/similar", methods=["POST"])
+@admin_required
+def similar_questions():
+    """Cảnh báo khi đang soạn: các câu gần trùng với nội dung đang gõ."""
+    content = request.form.get("content", "")
+    exclude_id = request.form.get("exclude_id", type=int)
+    return jsonify([
+        {
+            "id": q.id,
+            "quiz_id": q.quiz_id,
+            "content": q.content,
+            "similarity": round(score, 2),
+            "edit_url": url_for("quiz.edit_question", question_id=q.id),
+        }
+        for q, score in dedupe.find_near_duplicates(content, exclude_id=exclude_id)
+    ])
+
+
+@quiz_bp.route("/admin/questions/duplicates")
+@admin_required
+@read_only
+def duplicate_report():
+    threshold = request.args.get("threshold", type=float)
+    clusters = dedupe.duplicate_clusters(threshold)
+    return render_template(
+        "quiz/duplicate_report.html",
+        clusters=clusters,
+        threshold=threshold or current_app.config.get("DEDUPE_THRESHOLD", 0.7),
+    )
+
+
+# =============================
+#           REGRADE
+# =============================
+@quiz_bp.route("/admin/regrade")
+@admin_required
+def regrade_jobs():
+    jobs = RegradeJob.query.order_by(RegradeJob.id.desc()).limit(50).all()
+    return render_template("quiz/regrade_jobs.html", jobs=jobs)
+
+
+@quiz_bp.route("/admin/regrade/<int:job_id>")
+@admin_required
+def regrade_job_detail(job_id):
+    job = RegradeJob.query.get_or_404(job_id)
+    certificates = job.invalid_certificates or []
+    usernames = dict(
+        db.session.query(User.id, User.username)
+        .filter(User.id.in_([c["user_id"] for c in certificates]))
+        .all()
+    ) if certificates else {}
+    return render_template(
+        "quiz/regrade_job.html",
+        job=job,
+        certificates=certificates,
+        usernames=usernames,
+    )
+
+
+# =============================
+#       SEARCH QUESTIONS
+# =============================
+@quiz_bp.route("/admin/questions/search")
+@admin_required
+def search_questions_view():
+    q = request.args.get("q", "")
+    qtype = request.args.get("type") or None
+    difficulty = request.args.get("difficulty") or None
+    quiz_id = request.args.get("quiz_id", type=int)
+    page = request.args.get("page", 1, type=int)
+
+    results = search_questions(
+        q, qtype=qtype, difficulty=difficulty, quiz_id=quiz_id, page=page
+    )
+    quizzes = (
+        db.session.query(Quiz.id, Quiz.title)
+        .filter(Quiz.deleted_at.is_(None))
+        .order_by(Quiz.title)
+        .all()
+    )
+    return render_template(
+        "quiz/search_questions.html",
+        results=results,
+        quizzes=quizzes,
+        q=q,
+        qtype=qtype,
+        difficulty=difficulty,
+        quiz_id=quiz_id,
+    )
+
+
 # =============================
 #       DELETE QUESTION
 # =============================
 @quiz_bp.route("/admin/questions/<int:question_id>/delete", methods=["POST"])
 @admin_required
 def delete_question(question_id):
-    q = Question.query.get_or_404(question_id)
+    q = Question.query.filter_by(id=question_id, deleted_at=None).first_or_404()
     quiz_id = q.quiz_id
 
-    # delete choices + answers
-    Choice.query.filter_by(question_id=q.id).delete()
-    Answer.query.filter_by(question_id=q.id).delete()
-
-    db.session.delete(q)
+    # soft delete ngay, choices + answers được dọn theo lô ở background
+    q.deleted_at = datetime.utcnow()
+    remove_questions([q.id])
+    bump_bank_version(q.quiz)
     db.session.commit()
+    publish_snapshot(q.quiz)
+    purge_question(q.id)
 
     return redirect(url_for("quiz.manage_questions", quiz_id=quiz_id))
 
 
+# =============================
+#         DELETE QUIZ
+# =============================
+@quiz_bp.route("/admin/quizzes/<int:quiz_id>/delete", methods=["POST"])
+@admin_required
+def delete_quiz(quiz_id):
+    quiz = Quiz.query.filter_by(id=quiz_id, deleted_at=None).first_or_404()
+
+    # soft delete ngay, submissions/answers/certificates dọn ở background
+    quiz.deleted_at = datetime.utcnow()
+    quiz.is_active = False
+    db.session.commit()
+    purge_quiz(quiz.id)
+
+    return redirect(url_for("quiz.manage_quizzes"))
+
+
 # =============================
 #       EDIT QUESTION
 # =============================
 @quiz_bp.route("/admin/questions/<int:question_id>/edit", methods=["GET", "POST"])
 @admin_required
 def edit_question(question_id):
-    q = Question.query.get_or_404(question_id)
+    q = Question.query.filter_by(id=question_id, deleted_at=None).first_or_404()
     quiz = q.quiz
     choices = Choice.query.filter_by(question_id=q.id).all()
 
     if request.method == "POST":
+        old_key = answer_key(q)
         q.content = request.form.get("content")
         q.type = request.form.get("type")
         q.explanation = request.form.get("explanation")
@@ -369,9 +729,31 @@ def edit_question(question_id):
             new_text = request.form.get(f"choice_{i}")
             if new_text:
                 choice.content = new_text
-            choice.is_correct = (str(i) == correct_choice)
+            choice.is_correct = (q.type == "fill_in" or str(i) == correct_choice)
 
+        # thêm lựa chọn / đáp án chấp nhận mới (tối đa 4)
+        for i in range(len(choices) + 1, 5):
+            new_text = request.form.get(f"choice_{i}")
+            if new_text:
+                db.session.add(Choice(
+                    question_id=q.id,
+                    content=new_text,
+                    is_correct=(q.type == "fill_in" or str(i) == correct_choice),
+                ))
+
+        index_question(q)
+        duplicates = dedupe.update_signature(q)
+        bump_bank_version(quiz)
+        key_changed = answer_key(q) != old_key
         db.session.commit()
+        publish_snapshot(quiz)
+        _flash_duplicates(duplicates)
+
+        # đổi đáp án: chấm lại các bài đã nộp ở background
+        if key_changed and has_answers(q.id):
+            job = create_job(q, current_user.id)
+            regrade_job(job.id)
+            flash(f"Đáp án đã đổi, đang chấm lại các bài đã nộp (lần chấm lại #{job.id}).", "info")
 
         return redirect(url_for("quiz.manage_questions", quiz_id=quiz.id))
 
@@ -383,13 +765,71 @@ def edit_question(question_id):
     )
 @quiz_bp.route("/admin/history")
 @admin_required
+@read_only
 def admin_history():
     submissions = (
         db.session.query(Submission, User, Quiz)
         .join(User, Submission.user_id == User.id)
         .join(Quiz, Submission.quiz_id == Quiz.id)
+        .filter(
+            Submission.finished_at.isnot(None),
+            User.deleted_at.is_(None),
+            Quiz.deleted_at.is_(None),
+        )
         .order_by(Submission.created_at.desc())
         .all()
     )
     return render_template("quiz/admin_history.html", submissions=submissions)
 
+
+# =============================
+#         LIVE MONITOR
+# =============================
+@quiz_bp.route("/admin/quizzes/<int:quiz_id>/monitor")
+@admin_required
+def quiz_monitor(quiz_id):
+    quiz = Quiz.query.filter_by(id=quiz_id, deleted_at=None).first_or_404()
+    return render_template(
+        "quiz/monitor.html",
+        quiz=quiz,
+        window_hours=current_app.config.get("MONITOR_WINDOW_SECONDS", 6 * 3600) / 3600,
+    )
+
+
+@quiz_bp.route("/admin/quizzes/<int:quiz_id>/monitor/stream")
+@admin_required
+def quiz_monitor_stream(quiz_id):
+    Quiz.query.filter_by(id=quiz_id, deleted_at=None).first_or_404()
+    if not monitor.open_stream():
+        response = current_app.response_class("Quá nhiều kết nối theo dõi.", status=503)
+        response.headers["Retry-After"] = "10"
+        return response
+
+    response = current_app.response_class(
+        stream_with_context(monitor.stream(quiz_id)), mimetype="text/event-stream"
+    )
+    response.call_on_close(monitor.close_stream)
+    response.headers["Cache-Control"] = "no-store"
+    response.headers["X-Accel-Buffering"] = "no"  # nginx: không buffer SSE
+    return response
+
+
+# =============================
+#          GRADEBOOK
+# =============================
+@quiz_bp.route("/admin/quizzes/<int:quiz_id>/gradebook.<fmt>")
+@admin_required
+@read_only
+def export_gradebook(quiz_id, fmt):
+    if fmt not in gradebook.FORMATS:
+        abort(404)
+    quiz = Quiz.query.filter_by(id=quiz_id, deleted_at=None).first_or_404()
+    attempt = request.args.get("attempt", "best")
+    if attempt not in gradebook.ATTEMPTS:
+        abort(400)
+
+    body, mimetype, filename = gradebook.export(quiz, fmt, attempt)
+    response = current_app.response_class(stream_with_context(body), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    response.headers["Cache-Control"] = "no-store"
+    return response
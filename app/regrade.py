@@ -0,0 +1,354 @@
+"""
+Chấm lại theo tập (set-based) khi đáp án câu hỏi thay đổi.
+
+edit_question đổi đáp án → tạo RegradeJob, task chạy nền (app/tasks.py):
+1. Mỗi câu: mcq / true_false so thẳng Answer.choice_id với tập choice đúng;
+   fill_in lấy các câu trả lời khác nhau (SELECT DISTINCT user_answer —
+   trăm nghìn bài nhưng chỉ vài chục giá trị), chấm từng giá trị bằng đúng
+   hàm của grade_submission → tập giá trị đúng. Quá MAX_IN_VALUES giá trị
+   (giới hạn tham số của SQLite) thì chấm trong Python theo từng lô answer.
+2. Theo lô id answer: một UPDATE answers cho các dòng có kết quả đổi.
+3. Một UPDATE submissions (COUNT answer đúng) cho các bài có answer vừa đổi.
+4. Dựng lại rollup user_quiz_stats của các (user, quiz) bị ảnh hưởng và
+   histogram điểm của quiz, tăng Quiz.results_version (ETag leaderboard),
+   liệt kê chứng chỉ không còn đạt.
+
+Câu essay không chấm lại (chấm tay); bài đã chuyển sang archive giữ điểm cũ.
+
+Job "running" quá REGRADE_STALE_SECONDS (process chết giữa chừng) được chạy
+lại — các bước chấm lại chạy lại an toàn (`flask run-regrade-jobs`).
+"""
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from app.grading import (
+    _fuzzy_distance,
+    load_answer_keys,
+    load_choice_keys,
+    recompute_submission_totals,
+)
+from app.histograms import rebuild_histograms
+from app.monitor import invalidate as invalidate_monitors
+from app.models import (
+    Answer,
+    Certificate,
+    Choice,
+    Question,
+    Quiz,
+    RegradeJob,
+    Submission,
+    UserQuizStats,
+)
+from app.stats import rebuild_stats
+
+# SQLite cũ giới hạn 999 tham số mỗi câu lệnh
+MAX_IN_VALUES = 500
+
+
+class RegradeResult:
+    def __init__(self, answers=0, submissions=0, invalid_certificates=None):
+        self.answers = answers
+        self.submissions = submissions
+        self.invalid_certificates = invalid_certificates or []
+
+
+def answer_key(question):
+    """
+    Đáp án hiện tại của câu (trong session): so trước / sau khi sửa để biết
+    có cần chấm lại không. mcq / true_false so theo id choice, fill_in theo nội dung.
+    """
+    rows = (
+        db.session.query(Choice.id, Choice.content)
+        .filter(Choice.question_id == question.id, Choice.is_correct.is_(True))
+        .all()
+    )
+    if question.type == "fill_in":
+        return question.type, frozenset(content for _, content in rows)
+    return question.type, frozenset(cid for cid, _ in rows)
+
+
+def _judge(question):
+    """Hàm chấm một câu trả lời text, None nếu loại câu không chấm theo text."""
+    if question.type == "fill_in":
+        key = load_answer_keys([question.id])[question.id]
+        fuzzy_distance = _fuzzy_distance()
+        return lambda value: key.match(value, fuzzy_distance)
+    return None
+
+
+def _new_correct(question, judge):
+    """
+    Biểu thức SQL: câu trả lời đúng theo đáp án mới. None nếu không chấm tự
+    động, hoặc quá nhiều giá trị khác nhau để đưa vào IN (chấm theo lô).
+    """
+    if question.type in ("mcq", "true_false"):
+        return Answer.choice_id.in_(load_choice_keys([question.id])[question.id])
+    if judge is None:
+        return None
+
+    answer_text = db.func.coalesce(Answer.user_answer, "")
+    values = (
+        db.session.query(answer_text)
+        .filter(Answer.question_id == question.id)
+        .distinct()
+    )
+    correct, wrong = [], []
+    for (value,) in values:
+        (correct if judge(value) else wrong).append(value)
+    # danh sách ngắn hơn → tham số IN ít hơn
+    if len(correct) <= len(wrong):
+        return answer_text.in_(correct) if len(correct) <= MAX_IN_VALUES else None
+    return answer_text.not_in(wrong) if len(wrong) <= MAX_IN_VALUES else None
+
+
+def _update_by_condition(in_chunk, condition):
+    """Lô answer: một UPDATE theo biểu thức đúng/sai. Trả về (số dòng, submission_ids)."""
+    new_correct = db.case((condition, True), else_=False)
+    changed = new_correct != db.func.coalesce(Answer.is_correct, False)
+
+    submission_ids = [
+        row[0]
+        for row in db.session.query(Answer.submission_id)
+        .filter(*in_chunk, changed)
+        .distinct()
+    ]
+    if not submission_ids:
+        return 0, submission_ids
+    rowcount = db.session.execute(
+        db.update(Answer)
+        .where(*in_chunk, changed)
+        .values(
+            is_correct=new_correct,
+            score=db.case((new_correct, 1.0), else_=0.0),
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    return rowcount, submission_ids
+
+
+def _update_by_value(in_chunk, judge, verdicts):
+    """Lô answer: chấm từng giá trị trong Python (verdicts: cache giá trị → đúng/sai)."""
+    flips = {True: [], False: []}
+    submission_ids = set()
+    for answer_id, submission_id, value, is_correct in (
+        db.session.query(Answer.id, Answer.submission_id, Answer.user_answer, Answer.is_correct)
+        .filter(*in_chunk)
+    ):
+        value = value or ""
+        if value not in verdicts:
+            verdicts[value] = bool(judge(value))
+        if verdicts[value] != bool(is_correct):
+            flips[verdicts[value]].append(answer_id)
+            submission_ids.add(submission_id)
+
+    for is_correct, ids in flips.items():
+        if ids:
+            db.session.execute(
+                db.update(Answer)
+                .where(Answer.id.in_(ids))
+                .values(is_correct=is_correct, score=1.0 if is_correct else 0.0)
+                .execution_options(synchronize_session=False)
+            )
+    return len(flips[True]) + len(flips[False]), list(submission_ids)
+
+
+def _regrade_question(question, chunk_size, on_chunk):
+    judge = _judge(question)
+    condition = _new_correct(question, judge)
+    if condition is None and judge is None:
+        return 0
+    verdicts = {}
+
+    total = 0
+    last_id = 0
+    while True:
+        ids = [
+            row[0]
+            for row in db.session.query(Answer.id)
+            .filter(Answer.question_id == question.id, Answer.id > last_id)
+            .order_by(Answer.id)
+            .limit(chunk_size)
+        ]
+        if not ids:
+            return total
+
+        in_chunk = (
+            Answer.question_id == question.id,
+            Answer.id > last_id,
+            Answer.id <= ids[-1],
+        )
+        last_id = ids[-1]
+
+        if condition is not None:
+            changed_rows, submission_ids = _update_by_condition(in_chunk, condition)
+        else:
+            changed_rows, submission_ids = _update_by_value(in_chunk, judge, verdicts)
+        if submission_ids:
+            recompute_submission_totals(submission_ids)
+        total += changed_rows
+        on_chunk(changed_rows, submission_ids)
+        db.session.commit()
+
+
+def _invalid_certificates(quiz_ids, pairs):
+    """Chứng chỉ của các (user, quiz) bị ảnh hưởng mà điểm cao nhất < pass_score."""
+    rows = (
+        db.session.query(Certificate.id, Certificate.user_id, Certificate.quiz_id,
+                         UserQuizStats.best_score)
+        .join(Quiz, Quiz.id == Certificate.quiz_id)
+        .outerjoin(
+            UserQuizStats,
+            (UserQuizStats.user_id == Certificate.user_id)
+            & (UserQuizStats.quiz_id == Certificate.quiz_id),
+        )
+        .filter(
+            Certificate.quiz_id.in_(quiz_ids),
+            db.func.coalesce(UserQuizStats.best_score, 0) < Quiz.pass_score,
+        )
+        .order_by(Certificate.id)
+        .all()
+    )
+    return [
+        {"id": cid, "user_id": uid, "quiz_id": qid, "best_score": best}
+        for cid, uid, qid, best in rows
+        if (uid, qid) in pairs
+    ]
+
+
+def regrade_questions(question_ids, job=None, chunk_size=None):
+    """
+    Chấm lại mọi answer của các câu hỏi theo đáp án hiện tại.
+    job: RegradeJob để ghi tiến độ sau mỗi lô (commit cùng lô). Job chạy lại
+    sau khi chết giữa chừng (đã có tiến độ) tiếp tục đếm từ tiến độ đã lưu.
+    """
+    chunk_size = chunk_size or current_app.config.get("REGRADE_CHUNK_SIZE", 5000)
+    questions = Question.query.filter(Question.id.in_(question_ids)).all()
+
+    # tiến độ commit cùng các lô đã đổi → > 0 nghĩa là lần chạy trước đã đổi answers
+    resumed = job is not None and (job.answers_changed or 0) > 0
+    previous_submissions = (job.submissions_changed or 0) if resumed else 0
+    result = RegradeResult(answers=job.answers_changed if resumed else 0)
+    changed_submissions = set()
+    pairs = set()
+
+    def on_chunk(answers, submission_ids):
+        result.answers += answers
+        if submission_ids:
+            changed_submissions.update(submission_ids)
+            pairs.update(
+                tuple(p)
+                for p in db.session.query(Submission.user_id, Submission.quiz_id)
+                .filter(Submission.id.in_(submission_ids))
+                .distinct()
+            )
+        if job is not None:
+            job.answers_changed = result.answers
+            job.submissions_changed = previous_submissions + len(changed_submissions)
+
+    for question in questions:
+        _regrade_question(question, chunk_size, on_chunk)
+
+    # số bài của lần chạy trước + lần này (bài bị đổi ở cả hai lần đếm hai lần)
+    result.submissions = previous_submissions + len(changed_submissions)
+    if resumed:
+        # answers đã đổi ở lần chạy trước giờ không còn "khác" → không biết bài
+        # nào bị ảnh hưởng: dựng lại rollup cho mọi bài của các quiz
+        quiz_ids = {q.quiz_id for q in questions}
+        pairs.update(
+            tuple(p)
+            for p in db.session.query(Submission.user_id, Submission.quiz_id)
+            .filter(Submission.quiz_id.in_(quiz_ids))
+            .distinct()
+        )
+    if not pairs:
+        return result
+
+    quiz_ids = {qid for _, qid in pairs}
+    Quiz.query.filter(Quiz.id.in_(quiz_ids)).update(
+        {Quiz.results_version: db.func.coalesce(Quiz.results_version, 0) + 1},
+        synchronize_session=False,
+    )
+    db.session.commit()
+
+    rebuild_stats(pairs)
+    rebuild_histograms(quiz_ids)
+    invalidate_monitors(quiz_ids)
+    result.invalid_certificates = _invalid_certificates(quiz_ids, pairs)
+    return result
+
+
+# =============================
+#             JOBS
+# =============================
+def create_job(question, user_id=None):
+    """Ghi RegradeJob cho câu vừa đổi đáp án (commit), task chạy sau."""
+    job = RegradeJob(quiz_id=question.quiz_id, question_ids=[question.id], created_by=user_id)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def has_answers(question_id):
+    return db.session.query(
+        Answer.query.filter(Answer.question_id == question_id).exists()
+    ).scalar()
+
+
+def _resumable(now):
+    """Job chưa chạy, hoặc running quá REGRADE_STALE_SECONDS (process đã chết)."""
+    stale_before = now - timedelta(
+        seconds=current_app.config.get("REGRADE_STALE_SECONDS", 3600)
+    )
+    return db.or_(
+        RegradeJob.status == "pending",
+        db.and_(RegradeJob.status == "running", RegradeJob.started_at < stale_before),
+    )
+
+
+def _claim_job(job_id):
+    """→ running bằng UPDATE có điều kiện: hai worker không cùng nhận một job."""
+    now = datetime.utcnow()
+    claimed = db.session.execute(
+        db.update(RegradeJob)
+        .where(RegradeJob.id == job_id, _resumable(now))
+        .values(status="running", started_at=now, error=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return claimed
+
+
+def run_job(job_id):
+    if not _claim_job(job_id):
+        return None
+    job = db.session.get(RegradeJob, job_id)
+
+    try:
+        result = regrade_questions(job.question_ids, job=job)
+    except Exception as e:
+        db.session.rollback()
+        job.status = "failed"
+        job.error = str(e)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        raise
+
+    job.status = "done"
+    job.answers_changed = result.answers
+    job.submissions_changed = result.submissions
+    job.invalid_certificates = result.invalid_certificates
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    return result
+
+
+def resumable_job_ids():
+    """Job cần chạy lại: thread nền bị mất trước khi nhận job, hoặc chết giữa chừng."""
+    return [
+        row[0]
+        for row in db.session.query(RegradeJob.id)
+        .filter(_resumable(datetime.utcnow()))
+        .order_by(RegradeJob.id)
+    ]
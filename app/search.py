@@ -0,0 +1,246 @@
+"""
+Tìm kiếm full-text trên ngân hàng câu hỏi (SQLite FTS5).
+
+Bảng ảo `question_fts` (rowid = questions.id) index 3 cột:
+    content, explanation, choices (nội dung các lựa chọn / đáp án chấp nhận)
+Tokenizer `unicode61 remove_diacritics 2` → gõ "ha noi" vẫn khớp "Hà Nội".
+
+Index được cập nhật bởi các route admin (thêm / sửa / xóa câu hỏi) và các
+task purge; `flask rebuild-search-index` dựng lại toàn bộ.
+DB không phải SQLite (hoặc chưa có bảng) → fallback LIKE, không xếp hạng.
+"""
+import re
+
+from flask import current_app
+from markupsafe import Markup, escape
+from sqlalchemy import inspect, or_, text
+
+from app import db
+from app.models import Question, Choice, Quiz
+
+FTS_TABLE = "question_fts"
+TOKENIZER = "unicode61 remove_diacritics 2"
+
+# trọng số bm25 theo cột: content > choices > explanation
+BM25_WEIGHTS = (10.0, 2.0, 4.0)
+
+# snippet() bọc từ khớp bằng ký tự điều khiển, escape xong mới đổi sang <mark>
+_MARK_OPEN = "\x02"
+_MARK_CLOSE = "\x03"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_ready_engines = set()
+
+
+# =============================
+#            SCHEMA
+# =============================
+def create_table_sql():
+    return (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+        f"USING fts5(content, explanation, choices, tokenize='{TOKENIZER}')"
+    )
+
+
+def populate_sql():
+    return (
+        f"INSERT INTO {FTS_TABLE}(rowid, content, explanation, choices) "
+        "SELECT q.id, coalesce(q.content, ''), coalesce(q.explanation, ''), "
+        "coalesce((SELECT group_concat(c.content, ' ') FROM choices c "
+        "WHERE c.question_id = q.id), '') "
+        "FROM questions q WHERE q.deleted_at IS NULL"
+    )
+
+
+def fts_available():
+    """True nếu DB là SQLite và đã có bảng question_fts."""
+    engine = db.engine
+    if engine.dialect.name != "sqlite":
+        return False
+    if engine.url in _ready_engines:
+        return True
+    # chỉ cache kết quả dương: bảng có thể được tạo sau (migrate / rebuild)
+    if inspect(engine).has_table(FTS_TABLE):
+        _ready_engines.add(engine.url)
+        return True
+    return False
+
+
+# =============================
+#             SYNC
+# =============================
+def index_question(question):
+    """Ghi lại 1 câu hỏi vào index (chưa commit, cùng transaction với route)."""
+    if not fts_available():
+        return
+    choices = [
+        c for (c,) in db.session.query(Choice.content)
+        .filter(Choice.question_id == question.id)
+        .order_by(Choice.id)
+    ]
+    db.session.execute(
+        text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": question.id}
+    )
+    db.session.execute(
+        text(
+            f"INSERT INTO {FTS_TABLE}(rowid, content, explanation, choices) "
+            "VALUES (:id, :content, :explanation, :choices)"
+        ),
+        {
+            "id": question.id,
+            "content": question.content or "",
+            "explanation": question.explanation or "",
+            "choices": " ".join(c for c in choices if c),
+        },
+    )
+
+
+def remove_questions(question_ids):
+    """Bỏ các câu hỏi khỏi index (chưa commit)."""
+    question_ids = list(question_ids)
+    if not question_ids or not fts_available():
+        return
+    chunk_size = current_app.config.get("PURGE_CHUNK_SIZE", 500)
+    for i in range(0, len(question_ids), chunk_size):
+        chunk = question_ids[i:i + chunk_size]
+        params = {f"id{n}": qid for n, qid in enumerate(chunk)}
+        placeholders = ", ".join(f":{name}" for name in params)
+        db.session.execute(
+            text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})"), params
+        )
+
+
+def rebuild_index():
+    """Tạo lại toàn bộ index từ bảng questions/choices. Trả về số câu hỏi."""
+    if db.engine.dialect.name != "sqlite":
+        raise RuntimeError("FTS5 chỉ hỗ trợ SQLite, DB khác dùng fallback LIKE.")
+
+    db.session.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+    db.session.execute(text(create_table_sql()))
+    db.session.execute(text(populate_sql()))
+    db.session.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+    db.session.commit()
+    _ready_engines.add(db.engine.url)
+    return db.session.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+
+
+# =============================
+#            SEARCH
+# =============================
+def build_match_query(raw):
+    """
+    Chuỗi người dùng → cú pháp MATCH an toàn: mỗi từ được quote,
+    từ cuối match theo prefix ("pyth" → python). Không có từ nào → None.
+    """
+    tokens = _TOKEN_RE.findall(raw or "")
+    if not tokens:
+        return None
+    terms = [f'"{t}"' for t in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _highlight(snippet):
+    html = str(escape(snippet or ""))
+    return Markup(html.replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>"))
+
+
+class SearchHit:
+    def __init__(self, question, quiz_title, snippet=None, rank=None):
+        self.question = question
+        self.quiz_title = quiz_title
+        self.snippet = snippet
+        self.rank = rank
+
+
+class SearchPage:
+    def __init__(self, hits, page, per_page, has_next, ranked):
+        self.hits = hits
+        self.page = page
+        self.per_page = per_page
+        self.has_prev = page > 1
+        self.has_next = has_next
+        self.ranked = ranked
+
+
+def _filters(qtype, difficulty, quiz_id):
+    criteria = [Question.deleted_at.is_(None), Quiz.deleted_at.is_(None)]
+    if qtype:
+        criteria.append(Question.type == qtype)
+    if difficulty:
+        criteria.append(Question.difficulty == difficulty)
+    if quiz_id:
+        criteria.append(Question.quiz_id == quiz_id)
+    return criteria
+
+
+def _fts_search(match, criteria, page, per_page):
+    fts = db.table(FTS_TABLE, db.column("rowid"))
+    rank = db.func.bm25(db.literal_column(FTS_TABLE), *BM25_WEIGHTS).label("rank")
+    snippet = db.func.snippet(
+        db.literal_column(FTS_TABLE), -1, _MARK_OPEN, _MARK_CLOSE, "…", 16
+    ).label("snippet")
+
+    # lấy dư 1 dòng để biết còn trang sau, không cần COUNT(*) toàn bộ kết quả
+    rows = (
+        db.session.query(Question, Quiz.title, snippet, rank)
+        .select_from(fts)
+        .join(Question, Question.id == fts.c.rowid)
+        .join(Quiz, Quiz.id == Question.quiz_id)
+        .filter(db.literal_column(FTS_TABLE).op("MATCH")(match), *criteria)
+        .order_by(rank)
+        .limit(per_page + 1)
+        .offset((page - 1) * per_page)
+        .all()
+    )
+    hits = [
+        SearchHit(q, title, _highlight(snip), score)
+        for q, title, snip, score in rows[:per_page]
+    ]
+    return hits, len(rows) > per_page
+
+
+def _like_search(raw, criteria, page, per_page):
+    pattern = f"%{raw.strip()}%"
+    choice_match = (
+        db.session.query(Choice.id)
+        .filter(Choice.question_id == Question.id, Choice.content.ilike(pattern))
+        .exists()
+    )
+    rows = (
+        db.session.query(Question, Quiz.title)
+        .join(Quiz, Quiz.id == Question.quiz_id)
+        .filter(
+            or_(
+                Question.content.ilike(pattern),
+                Question.explanation.ilike(pattern),
+                choice_match,
+            ),
+            *criteria,
+        )
+        .order_by(Question.id.desc())
+        .limit(per_page + 1)
+        .offset((page - 1) * per_page)
+        .all()
+    )
+    hits = [SearchHit(q, title) for q, title in rows[:per_page]]
+    return hits, len(rows) > per_page
+
+
+def search_questions(raw, qtype=None, difficulty=None, quiz_id=None, page=1, per_page=None):
+    """Tìm câu hỏi theo từ khóa + bộ lọc, xếp hạng bm25 (FTS5) nếu có."""
+    if per_page is None:
+        per_page = current_app.config.get("SEARCH_PER_PAGE", 20)
+    page = max(1, page)
+    criteria = _filters(qtype, difficulty, quiz_id)
+
+    match = build_match_query(raw)
+    if match is None:
+        return SearchPage([], page, per_page, False, ranked=False)
+
+    if fts_available():
+        hits, has_next = _fts_search(match, criteria, page, per_page)
+        return SearchPage(hits, page, per_page, has_next, ranked=True)
+
+    hits, has_next = _like_search(raw, criteria, page, per_page)
+    return SearchPage(hits, page, per_page, has_next, ranked=False)
@@ -0,0 +1,325 @@
+"""
+Snapshot nhị phân bất biến của ngân hàng câu hỏi một quiz.
+
+Mỗi (quiz, bank_version) được biên dịch một lần thành file:
+
+    instance/<SNAPSHOT_FOLDER>/quiz_<id>/v<bank_version>.qsnap
+
+Các worker mở file read-only bằng mmap → chấm điểm, render đề, review
+đọc câu hỏi / lựa chọn / đáp án / giải thích mà không cần query DB, và
+mọi worker dùng chung một bản vật lý trong page cache.
+
+Layout (little-endian):
+    header   : magic, format, quiz_id, bank_version, n_questions, n_choices
+    questions: n_questions bản ghi QUESTION_STRUCT (sắp theo id)
+    choices  : n_choices bản ghi CHOICE_STRUCT (gom theo câu hỏi)
+    strings  : UTF-8 content / explanation, tham chiếu bằng (offset, length)
+"""
+import glob
+import mmap
+import os
+import re
+import struct
+import threading
+
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import Question, Choice, Quiz
+
+MAGIC = b"QSNP"
+FORMAT_VERSION = 1
+
+HEADER_STRUCT = struct.Struct("<4sHHIIII")
+# id, type, difficulty, time_limit, content(off, len), explanation(off, len),
+# choice_start, choice_count
+QUESTION_STRUCT = struct.Struct("<IBBxxiIIIIII")
+# id, question_id, is_correct, content(off, len)
+CHOICE_STRUCT = struct.Struct("<IIBxxxII")
+
+TYPES = ("mcq", "true_false", "fill_in", "essay")
+DIFFICULTIES = (None, "easy", "medium", "hard")
+NO_VALUE = 0xFFFFFFFF
+
+_VERSION_FILE = re.compile(r"v(\d+)\.qsnap$")
+_READ_RETRIES = 3
+
+_open_snapshots = {}
+_lock = threading.Lock()
+
+
+# =============================
+#           COMPILE
+# =============================
+def _snapshot_dir(quiz_id):
+    folder = current_app.config.get("SNAPSHOT_FOLDER", "snapshots")
+    return os.path.join(current_app.instance_path, folder, f"quiz_{quiz_id}")
+
+
+def snapshot_path(quiz_id, bank_version):
+    return os.path.join(_snapshot_dir(quiz_id), f"v{bank_version}.qsnap")
+
+
+def compile_snapshot(quiz_id, bank_version, questions, choices_by_q):
+    """
+    Biên dịch ngân hàng câu hỏi thành bytes.
+    Loại câu hỏi không có trong TYPES → ValueError (không biểu diễn được).
+    """
+    pool = bytearray()
+
+    def add_string(text):
+        if text is None:
+            return NO_VALUE, 0
+        data = text.encode("utf-8")
+        offset = len(pool)
+        pool.extend(data)
+        return offset, len(data)
+
+    question_records = []
+    choice_records = []
+    for q in questions:
+        qtype = q.type or "mcq"
+        if qtype not in TYPES:
+            raise ValueError(f"Câu hỏi {q.id} có loại không hỗ trợ: {qtype!r}")
+
+        q_choices = choices_by_q.get(q.id, [])
+        question_records.append(QUESTION_STRUCT.pack(
+            q.id,
+            TYPES.index(qtype),
+            DIFFICULTIES.index(q.difficulty if q.difficulty in DIFFICULTIES else None),
+            q.time_limit if q.time_limit is not None else -1,
+            *add_string(q.content),
+            *add_string(q.explanation),
+            len(choice_records),
+            len(q_choices),
+        ))
+        for c in q_choices:
+            choice_records.append(CHOICE_STRUCT.pack(
+                c.id, q.id, 1 if c.is_correct else 0, *add_string(c.content)
+            ))
+
+    header = HEADER_STRUCT.pack(
+        MAGIC, FORMAT_VERSION, 0, quiz_id, bank_version,
+        len(question_records), len(choice_records),
+    )
+    return b"".join([header, *question_records, *choice_records, bytes(pool)])
+
+
+def _bank_version(session, quiz_id):
+    return session.scalar(select(Quiz.bank_version).where(Quiz.id == quiz_id)) or 0
+
+
+def _read_bank(quiz_id):
+    """
+    (bank_version, bytes) đọc trên primary trong một transaction.
+    Không dùng quiz.bank_version của caller: có thể là bản cũ (đọc từ replica),
+    file sẽ mang nhãn version cũ với nội dung mới. Version đổi giữa lúc đọc
+    (SQLite không giữ snapshot cho SELECT) thì đọc lại.
+    """
+    with Session(db.engine) as s:
+        for _ in range(_READ_RETRIES):
+            with s.begin():
+                version = _bank_version(s, quiz_id)
+                questions = s.scalars(
+                    select(Question)
+                    .where(Question.quiz_id == quiz_id, Question.deleted_at.is_(None))
+                    .order_by(Question.id)
+                ).all()
+                choices_by_q = {}
+                if questions:
+                    rows = s.scalars(
+                        select(Choice)
+                        .where(Choice.question_id.in_([q.id for q in questions]))
+                        .order_by(Choice.id)
+                    )
+                    for c in rows:
+                        choices_by_q.setdefault(c.question_id, []).append(c)
+
+                if _bank_version(s, quiz_id) == version:
+                    return version, compile_snapshot(quiz_id, version, questions, choices_by_q)
+    raise OSError(f"bank_version quiz {quiz_id} đổi liên tục, bỏ qua snapshot")
+
+
+def publish_snapshot(quiz):
+    """
+    Ghi snapshot cho bank_version hiện tại trên primary: ghi file tạm rồi
+    os.replace (atomic), reader chỉ thấy file cũ hoặc file mới hoàn chỉnh.
+    Trả về path, hoặc None nếu bank không biên dịch được (dùng ORM).
+    """
+    try:
+        version, data = _read_bank(quiz.id)
+    except ValueError as e:
+        # route admin đã commit: chỉ bỏ snapshot, không làm hỏng request
+        current_app.logger.warning("Không biên dịch được snapshot quiz %s: %s", quiz.id, e)
+        return None
+
+    path = snapshot_path(quiz.id, version)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+    _remove_old_versions(quiz.id, below=version)
+    return path
+
+
+def _remove_old_versions(quiz_id, below):
+    # chỉ xoá version thấp hơn bản vừa ghi: worker khác có thể vừa publish
+    # version mới hơn. Worker đang mmap file cũ vẫn đọc được sau khi unlink (POSIX)
+    for old in glob.glob(os.path.join(_snapshot_dir(quiz_id), "v*.qsnap")):
+        match = _VERSION_FILE.search(old)
+        if match and int(match.group(1)) < below:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+# =============================
+#            READ
+# =============================
+class SnapshotChoice:
+    __slots__ = ("id", "question_id", "is_correct", "content")
+
+    def __init__(self, id, question_id, is_correct, content):
+        self.id = id
+        self.question_id = question_id
+        self.is_correct = is_correct
+        self.content = content
+
+
+class SnapshotQuestion:
+    """Cùng thuộc tính với model Question để template dùng chung."""
+
+    __slots__ = ("_snap", "_record", "id", "quiz_id", "type", "difficulty", "time_limit")
+
+    def __init__(self, snap, record):
+        self._snap = snap
+        self._record = record
+        self.id = record[0]
+        self.quiz_id = snap.quiz_id
+        self.type = TYPES[record[1]]
+        self.difficulty = DIFFICULTIES[record[2]]
+        self.time_limit = record[3] if record[3] >= 0 else None
+
+    @property
+    def content(self):
+        return self._snap._string(self._record[4], self._record[5])
+
+    @property
+    def explanation(self):
+        return self._snap._string(self._record[6], self._record[7])
+
+    @property
+    def choices(self):
+        return self._snap._choices(self._record[8], self._record[9])
+
+
+class QuizSnapshot:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, fmt, _, self.quiz_id, self.bank_version, n_q, n_c = (
+            HEADER_STRUCT.unpack_from(self._mm, 0)
+        )
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ValueError(f"Snapshot không hợp lệ: {path}")
+
+        self._questions_offset = HEADER_STRUCT.size
+        self._choices_offset = self._questions_offset + n_q * QUESTION_STRUCT.size
+        self._strings_offset = self._choices_offset + n_c * CHOICE_STRUCT.size
+
+        # index nhỏ id → record (mỗi worker), nội dung vẫn nằm trong mmap
+        view = memoryview(self._mm)[self._questions_offset:self._choices_offset]
+        self._records = {rec[0]: rec for rec in QUESTION_STRUCT.iter_unpack(view)}
+        view.release()
+
+    def _string(self, offset, length):
+        if offset == NO_VALUE:
+            return None
+        start = self._strings_offset + offset
+        return self._mm[start:start + length].decode("utf-8")
+
+    def _choice_records(self, start, count):
+        base = self._choices_offset + start * CHOICE_STRUCT.size
+        return [
+            CHOICE_STRUCT.unpack_from(self._mm, base + i * CHOICE_STRUCT.size)
+            for i in range(count)
+        ]
+
+    def _choices(self, start, count):
+        return [
+            SnapshotChoice(cid, qid, bool(correct), self._string(off, length))
+            for cid, qid, correct, off, length in self._choice_records(start, count)
+        ]
+
+    def __contains__(self, question_id):
+        return question_id in self._records
+
+    def question_ids(self):
+        return list(self._records)
+
+    def difficulty_of(self, question_id):
+        return DIFFICULTIES[self._records[question_id][2]]
+
+    def question(self, question_id):
+        return SnapshotQuestion(self, self._records[question_id])
+
+    def questions(self, question_ids=None):
+        if question_ids is None:
+            question_ids = self._records
+        return [self.question(qid) for qid in question_ids if qid in self._records]
+
+    def correct_choice_ids(self, question_id):
+        rec = self._records[question_id]
+        return {
+            cid
+            for cid, _, correct, _, _ in self._choice_records(rec[8], rec[9])
+            if correct
+        }
+
+    def accepted_answers(self, question_id):
+        rec = self._records[question_id]
+        return tuple(sorted(
+            self._string(off, length)
+            for _, _, correct, off, length in self._choice_records(rec[8], rec[9])
+            if correct
+        ))
+
+
+def get_snapshot(quiz):
+    """
+    Snapshot ứng với quiz.bank_version hiện tại (mở sẵn trong worker).
+    Chưa có file thì biên dịch + publish từ primary (có thể ra version mới
+    hơn quiz.bank_version của caller). Tắt / lỗi → None (dùng ORM).
+    """
+    if not current_app.config.get("QUIZ_SNAPSHOTS_ENABLED", True):
+        return None
+
+    version = quiz.bank_version or 0
+    snap = _open_snapshots.get(quiz.id)
+    if snap is not None and snap.bank_version >= version:
+        return snap
+
+    path = snapshot_path(quiz.id, version)
+    try:
+        if not os.path.exists(path):
+            path = publish_snapshot(quiz)
+            if path is None:
+                return None
+        snap = QuizSnapshot(path)
+    except (OSError, ValueError) as e:
+        current_app.logger.warning("Không mở được snapshot quiz %s: %s", quiz.id, e)
+        return None
+
+    # không close mmap cũ: request khác có thể vẫn đang đọc, GC sẽ dọn
+    with _lock:
+        current = _open_snapshots.get(quiz.id)
+        if current is None or current.bank_version <= snap.bank_version:
+            _open_snapshots[quiz.id] = snap
+    return snap
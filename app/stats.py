@@ -0,0 +1,153 @@
+"""
+Rollup thống kê user × quiz (bảng user_quiz_stats).
+
+record_submission() được gọi trong cùng transaction chấm bài, nên các trang
+tiến độ (result, history, home) chỉ cần đọc một dòng thay vì quét lại
+toàn bộ Submission. rebuild_stats() dựng lại từ dữ liệu gốc (gồm archive).
+"""
+import heapq
+
+from flask import current_app
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db, archive
+from app.models import Quiz, Submission, UserQuizStats
+
+RECENT_SCORES = 20
+
+
+def _apply(stats, submission, pass_score):
+    stats.attempts = (stats.attempts or 0) + 1
+    stats.total_score = (stats.total_score or 0.0) + (submission.score or 0.0)
+    stats.best_score = max(stats.best_score or 0.0, submission.score or 0.0)
+    stats.total_time_spent = (stats.total_time_spent or 0) + (submission.time_spent or 0)
+    stats.passed = bool(stats.passed) or (submission.score or 0.0) >= (pass_score or 0)
+
+    if stats.last_finished_at is None or submission.finished_at >= stats.last_finished_at:
+        stats.last_score = submission.score
+        stats.last_submission_id = submission.id
+        stats.last_finished_at = submission.finished_at
+
+    recent = list(stats.recent_scores or [])
+    recent.append([submission.created_at.isoformat(), submission.score])
+    # gán list mới để SQLAlchemy nhận ra cột JSON đã đổi
+    stats.recent_scores = recent[-RECENT_SCORES:]
+
+
+def _ensure_row(user_id, quiz_id):
+    """
+    Tạo dòng rollup rỗng nếu chưa có (INSERT ... ON CONFLICT DO NOTHING):
+    hai bài nộp đầu tiên cùng lúc không đụng khóa chính.
+    """
+    table = UserQuizStats.__table__
+    row = {"user_id": user_id, "quiz_id": quiz_id, "attempts": 0, "best_score": 0.0,
+           "total_score": 0.0, "total_time_spent": 0, "passed": False}
+    dialect = db.engine.dialect.name
+
+    if dialect in ("sqlite", "postgresql"):
+        insert = (sqlite.insert if dialect == "sqlite" else postgresql.insert)(table)
+        db.session.execute(
+            insert.values(row).on_conflict_do_nothing(
+                index_elements=[table.c.user_id, table.c.quiz_id]
+            )
+        )
+        return
+
+    exists = db.session.execute(
+        db.select(table.c.user_id).where(table.c.user_id == user_id, table.c.quiz_id == quiz_id)
+    ).first()
+    if not exists:
+        db.session.execute(table.insert(), row)
+
+
+def record_submission(submission):
+    """Cộng submission vừa chấm vào rollup (chưa commit)."""
+    _ensure_row(submission.user_id, submission.quiz_id)
+    # khóa dòng (Postgres) để hai bài nộp cùng lúc không ghi đè nhau
+    stats = db.session.get(
+        UserQuizStats, (submission.user_id, submission.quiz_id),
+        with_for_update=True, populate_existing=True,
+    )
+    _apply(stats, submission, submission.quiz.pass_score)
+    return stats
+
+
+class _Rollup:
+    """Rollup trong bộ nhớ khi dựng lại, ghi ra bảng bằng một bulk insert."""
+
+    __slots__ = (
+        "user_id", "quiz_id", "attempts", "best_score", "total_score", "last_score",
+        "last_submission_id", "last_finished_at", "total_time_spent", "passed",
+        "recent_scores",
+    )
+
+    def __init__(self, user_id, quiz_id):
+        for name in self.__slots__:
+            setattr(self, name, None)
+        self.user_id = user_id
+        self.quiz_id = quiz_id
+
+    def as_row(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def get_stats(user_id, quiz_id):
+    return db.session.get(UserQuizStats, (user_id, quiz_id))
+
+
+def rebuild_stats(pairs=None):
+    """
+    Dựng lại rollup từ submissions (DB + archive).
+    pairs: tập (user_id, quiz_id) cần dựng lại, None = toàn bộ.
+    """
+    pass_scores = dict(db.session.query(Quiz.id, Quiz.pass_score).all())
+
+    chunk_size = current_app.config.get("PURGE_CHUNK_SIZE", 500)
+    # chỉ các cột _apply cần (tuple, không dựng object ORM)
+    query = db.session.query(
+        Submission.id, Submission.user_id, Submission.quiz_id, Submission.score,
+        Submission.time_spent, Submission.created_at, Submission.finished_at,
+    ).filter(Submission.finished_at.isnot(None))
+    quiz_ids = None
+    if pairs is not None:
+        pairs = set(pairs)
+        if not pairs:
+            return 0
+        quiz_ids = {q for _, q in pairs}
+        if len(pairs) <= chunk_size:
+            query = query.filter(
+                db.tuple_(Submission.user_id, Submission.quiz_id).in_(pairs)
+            )
+        else:
+            # nhiều cặp (chấm lại cả quiz): lọc theo quiz, cặp thừa bỏ ở vòng lặp
+            query = query.filter(Submission.quiz_id.in_(quiz_ids))
+
+    # gộp archive + DB theo thứ tự thời gian, DB đọc theo lô
+    archived = sorted(archive.iter_submissions(quiz_ids), key=lambda s: s.created_at)
+    live = query.order_by(Submission.created_at).yield_per(1000)
+
+    rollup = {}
+    for sub in heapq.merge(archived, live, key=lambda s: s.created_at):
+        key = (sub.user_id, sub.quiz_id)
+        if pairs is not None and key not in pairs:
+            continue
+        if key not in rollup:
+            rollup[key] = _Rollup(sub.user_id, sub.quiz_id)
+        _apply(rollup[key], sub, pass_scores.get(sub.quiz_id))
+
+    # xóa sau khi đọc xong: không giữ lock ghi trong lúc quét submissions
+    if pairs is None:
+        UserQuizStats.query.delete(synchronize_session=False)
+    else:
+        keys = list(pairs)
+        for i in range(0, len(keys), chunk_size):
+            UserQuizStats.query.filter(
+                db.tuple_(UserQuizStats.user_id, UserQuizStats.quiz_id).in_(keys[i:i + chunk_size])
+            ).delete(synchronize_session=False)
+
+    rows = [r.as_row() for r in rollup.values()]
+    for i in range(0, len(rows), chunk_size):
+        db.session.execute(UserQuizStats.__table__.insert(), rows[i:i + chunk_size])
+        db.session.commit()
+    db.session.commit()
+    return len(rows)
@@ -1,5 +1,29 @@
-from app import celery_app, db
-from app.models import Submission
+import os
+import shutil
+import threading
+
+from flask import current_app
+
+from app import db, archive
+from app.search import remove_questions
+from app.dedupe import remove_signatures
+from app.grading import recompute_submission_totals
+from app.histograms import rebuild_histograms
+from app.stats import rebuild_stats
+from app.models import (
+    Submission,
+    Answer,
+    Certificate,
+    Choice,
+    Question,
+    Quiz,
+    User,
+    ArchivedSubmission,
+    RegradeJob,
+    UserQuizStats,
+    QuizScoreHistogram,
+    ReviewState,
+)
 
 
 def _grade_essay_internal(submission_id: int):
@@ -17,14 +41,332 @@ def _grade_essay_internal(submission_id: int):
     return f"Graded essay submission {submission_id}"
 
 
-# Nếu Celery chạy → dùng Celery task
-if celery_app and hasattr(celery_app, "task"):
-    @celery_app.task
-    def grade_essay_submission(submission_id):
-        return _grade_essay_internal(submission_id)
+def _regrade_fill_in_internal(quiz_id=None):
+    from app.grading import regrade_fill_in_answers
+
+    answers, submissions = regrade_fill_in_answers(quiz_id)
+    return f"Regraded fill-in: {answers} answers, {submissions} submissions changed"
+
+
+def _regrade_job_internal(job_id: int):
+    from app.regrade import run_job
+
+    result = run_job(job_id)
+    if result is None:
+        return f"Regrade job {job_id} not pending"
+    return (
+        f"Regrade job {job_id}: {result.answers} answers, {result.submissions} submissions "
+        f"changed, {len(result.invalid_certificates)} certificates invalid"
+    )
+
+
+# =============================
+#     PURGE (SOFT DELETE)
+# =============================
+def _chunk_size():
+    return current_app.config.get("PURGE_CHUNK_SIZE", 500)
+
+
+def _delete_in_chunks(model, *criteria):
+    """
+    Xóa các dòng thỏa điều kiện theo từng lô nhỏ, commit sau mỗi lô
+    để không giữ lock bảng lâu (bài thi đang nộp vẫn ghi được).
+    """
+    chunk_size = _chunk_size()
+    total = 0
+    while True:
+        ids = [
+            row[0]
+            for row in db.session.query(model.id)
+            .filter(*criteria)
+            .order_by(model.id)
+            .limit(chunk_size)
+            .all()
+        ]
+        if not ids:
+            return total
+
+        model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        total += len(ids)
+
+
+def _delete_certificates(*criteria):
+    folder = current_app.config.get("CERT_FOLDER", "certificates")
+    folder_path = os.path.join(current_app.instance_path, folder)
+
+    for cert in Certificate.query.filter(*criteria).all():
+        try:
+            os.remove(os.path.join(folder_path, cert.file_path))
+        except OSError:
+            pass
+
+    return _delete_in_chunks(Certificate, *criteria)
+
+
+def _bump_results_version(quiz_ids):
+    Quiz.query.filter(Quiz.id.in_(quiz_ids)).update(
+        {Quiz.results_version: db.func.coalesce(Quiz.results_version, 0) + 1},
+        synchronize_session=False,
+    )
+
+
+def _purge_question_internal(question_id: int):
+    q = Question.query.get(question_id)
+    if not q or q.deleted_at is None:
+        return f"Question {question_id} not soft-deleted"
+
+    quiz_id = q.quiz_id
+
+    # mỗi lô: xóa answer của câu, bỏ câu khỏi tổng số câu của bài và tính lại
+    # điểm trong cùng transaction → bài không bao giờ lệch với bảng answers
+    chunk_size = _chunk_size()
+    answers = 0
+    user_ids = set()
+    while True:
+        rows = (
+            db.session.query(Answer.id, Answer.submission_id)
+            .filter(Answer.question_id == question_id)
+            .order_by(Answer.id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not rows:
+            break
+
+        submission_ids = list({sid for _, sid in rows})
+        user_ids.update(
+            row[0]
+            for row in db.session.query(Submission.user_id)
+            .filter(Submission.id.in_(submission_ids))
+            .distinct()
+        )
+        Answer.query.filter(Answer.id.in_([aid for aid, _ in rows])).delete(
+            synchronize_session=False
+        )
+        Submission.query.filter(
+            Submission.id.in_(submission_ids), Submission.total_questions > 0
+        ).update(
+            {Submission.total_questions: Submission.total_questions - 1},
+            synchronize_session=False,
+        )
+        recompute_submission_totals(submission_ids)
+        db.session.commit()
+        answers += len(rows)
+
+    _delete_in_chunks(Choice, Choice.question_id == question_id)
+    ReviewState.query.filter_by(question_id=question_id).delete(synchronize_session=False)
+    remove_questions([question_id])
+    remove_signatures([question_id])
+
+    if answers:
+        pairs = {(user_id, quiz_id) for user_id in user_ids}
+    else:
+        # không còn answer: có thể lần chạy trước chết sau khi xóa answer,
+        # không biết bài nào bị ảnh hưởng → dựng lại rollup cả quiz
+        pairs = {
+            tuple(p)
+            for p in db.session.query(Submission.user_id, Submission.quiz_id)
+            .filter(Submission.quiz_id == quiz_id)
+            .distinct()
+        }
+    _bump_results_version([quiz_id])
+    db.session.commit()
+    rebuild_stats(pairs)
+    rebuild_histograms({quiz_id})
+
+    # xóa câu hỏi sau cùng: purge_deleted chạy lại nếu dừng giữa chừng
+    Question.query.filter_by(id=question_id).delete(synchronize_session=False)
+    db.session.commit()
+    return f"Purged question {question_id} ({answers} answers)"
+
+
+def _purge_quiz_internal(quiz_id: int):
+    quiz = Quiz.query.get(quiz_id)
+    if not quiz or quiz.deleted_at is None:
+        return f"Quiz {quiz_id} not soft-deleted"
+
+    submission_ids = db.session.query(Submission.id).filter(Submission.quiz_id == quiz_id)
+    question_ids = db.session.query(Question.id).filter(Question.quiz_id == quiz_id)
+    question_id_list = [row[0] for row in question_ids]
+
+    answers = _delete_in_chunks(Answer, Answer.submission_id.in_(submission_ids))
+    submissions = _delete_in_chunks(Submission, Submission.quiz_id == quiz_id)
+    _delete_certificates(Certificate.quiz_id == quiz_id)
+    _delete_in_chunks(Answer, Answer.question_id.in_(question_ids))
+    _delete_in_chunks(Choice, Choice.question_id.in_(question_ids))
+    remove_questions(question_id_list)
+    remove_signatures(question_id_list)
+    _delete_in_chunks(Question, Question.quiz_id == quiz_id)
+
+    ArchivedSubmission.query.filter_by(quiz_id=quiz_id).delete(synchronize_session=False)
+    UserQuizStats.query.filter_by(quiz_id=quiz_id).delete(synchronize_session=False)
+    QuizScoreHistogram.query.filter_by(quiz_id=quiz_id).delete(synchronize_session=False)
+    ReviewState.query.filter_by(quiz_id=quiz_id).delete(synchronize_session=False)
+    RegradeJob.query.filter_by(quiz_id=quiz_id).delete(synchronize_session=False)
+    archive_folder = current_app.config.get("ARCHIVE_FOLDER", "archive")
+    shutil.rmtree(
+        os.path.join(current_app.instance_path, archive_folder, f"quiz_{quiz_id}"),
+        ignore_errors=True,
+    )
+
+    Quiz.query.filter_by(id=quiz_id).delete(synchronize_session=False)
+    db.session.commit()
+    return f"Purged quiz {quiz_id} ({submissions} submissions, {answers} answers)"
+
+
+def _purge_user_internal(user_id: int):
+    user = User.query.get(user_id)
+    if not user or user.deleted_at is None:
+        return f"User {user_id} not soft-deleted"
+
+    submission_ids = db.session.query(Submission.id).filter(Submission.user_id == user_id)
+    quiz_ids = {
+        row[0]
+        for row in db.session.query(Submission.quiz_id)
+        .filter(Submission.user_id == user_id)
+        .distinct()
+    }
+    quiz_ids.update(
+        row[0]
+        for row in db.session.query(ArchivedSubmission.quiz_id)
+        .filter(ArchivedSubmission.user_id == user_id)
+        .distinct()
+    )
+
+    answers = _delete_in_chunks(Answer, Answer.submission_id.in_(submission_ids))
+    submissions = _delete_in_chunks(Submission, Submission.user_id == user_id)
+    _delete_certificates(Certificate.user_id == user_id)
+    archive.remove_user_rows(user_id)
+    UserQuizStats.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    ReviewState.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+
+    # quiz do user tạo vẫn giữ lại, chỉ bỏ liên kết
+    Quiz.query.filter_by(created_by=user_id).update(
+        {"created_by": None}, synchronize_session=False
+    )
+    RegradeJob.query.filter_by(created_by=user_id).update(
+        {"created_by": None}, synchronize_session=False
+    )
+    if quiz_ids:
+        _bump_results_version(quiz_ids)
+    User.query.filter_by(id=user_id).delete(synchronize_session=False)
+    db.session.commit()
+    if quiz_ids:
+        rebuild_histograms(quiz_ids)
+    return f"Purged user {user_id} ({submissions} submissions, {answers} answers)"
+
+
+def purge_deleted():
+    """
+    Purge lại mọi dòng còn deleted_at (thread purge chết giữa chừng khi
+    process tắt / worker recycle). Các bước purge xóa theo lô, chạy lại an toàn.
+    Trả về (số question, số quiz, số user).
+    """
+    deleted_quizzes = db.session.query(Quiz.id).filter(Quiz.deleted_at.isnot(None))
+    question_ids = [
+        row[0]
+        for row in db.session.query(Question.id).filter(
+            Question.deleted_at.isnot(None),
+            Question.quiz_id.notin_(deleted_quizzes),  # purge quiz xóa luôn câu hỏi
+        )
+    ]
+    quiz_ids = [row[0] for row in deleted_quizzes]
+    user_ids = [row[0] for row in db.session.query(User.id).filter(User.deleted_at.isnot(None))]
+
+    for question_id in question_ids:
+        print(_purge_question_internal(question_id))
+    for quiz_id in quiz_ids:
+        print(_purge_quiz_internal(quiz_id))
+    for user_id in user_ids:
+        print(_purge_user_internal(user_id))
+    return len(question_ids), len(quiz_ids), len(user_ids)
+
+
+def _run_in_background(func, *args):
+    """Chạy func trong thread riêng (có app context) khi không có Celery."""
+    app = current_app._get_current_object()
+
+    def runner():
+        with app.app_context():
+            try:
+                print(func(*args))
+            finally:
+                db.session.remove()
+
+    thread = threading.Thread(target=runner, daemon=True)
+    thread.start()
+    return thread
+
+
+# =============================
+#           DISPATCH
+# =============================
+_TASKS = (
+    _grade_essay_internal,
+    _regrade_fill_in_internal,
+    _regrade_job_internal,
+    _purge_question_internal,
+    _purge_quiz_internal,
+    _purge_user_internal,
+)
+_celery_tasks = {}
+
+
+def register_celery_tasks(celery):
+    """Đăng ký các task với Celery (worker gọi lúc khởi động)."""
+    for func in _TASKS:
+        name = f"app.tasks.{func.__name__}"
+        if name not in _celery_tasks:
+            _celery_tasks[name] = celery.task(name=name)(func)
+    return _celery_tasks
+
+
+def _celery_task(func):
+    """Celery task cho func, None nếu Celery tắt / chưa cài (Celery chỉ load ở đây)."""
+    from app.celery_app import get_celery
+
+    celery = get_celery()
+    if celery is None:
+        return None
+    return register_celery_tasks(celery)[f"app.tasks.{func.__name__}"]
+
+
+def _dispatch(func, *args, background=True):
+    """Gửi sang Celery nếu có, lỗi broker / không có Celery → chạy trong process."""
+    task = _celery_task(func)
+    if task is not None:
+        try:
+            return task.delay(*args)
+        except Exception as e:
+            current_app.logger.warning("Không gửi được task %s: %s", func.__name__, e)
+
+    if not background:
+        print(f"[Celery OFF] {func.__name__} sync:", *args)
+        return func(*args)
+    print(f"[Celery OFF] {func.__name__} in background thread:", *args)
+    return _run_in_background(func, *args)
+
+
+def grade_essay_submission(submission_id):
+    return _dispatch(_grade_essay_internal, submission_id, background=False)
+
+
+def regrade_fill_in(quiz_id=None):
+    return _dispatch(_regrade_fill_in_internal, quiz_id)
+
+
+def regrade_job(job_id):
+    return _dispatch(_regrade_job_internal, job_id)
+
+
+def purge_question(question_id):
+    return _dispatch(_purge_question_internal, question_id)
+
+
+def purge_quiz(quiz_id):
+    return _dispatch(_purge_quiz_internal, quiz_id)
+
 
-# Nếu Celery không chạy → fallback chạy sync
-else:
-    def grade_essay_submission(submission_id):
-        print("[Celery OFF] Grade essay sync:", submission_id)
-        return _grade_essay_internal(submission_id)
+def purge_user(user_id):
+    return _dispatch(_purge_user_internal, user_id)
@@ -0,0 +1,78 @@
+"""
+Làm nóng cache trong process master trước khi fork worker (gunicorn preload_app).
+
+Những gì load ở đây nằm sẵn trong bộ nhớ master, worker fork ra dùng chung
+các trang đó (copy-on-write) thay vì mỗi worker tự load lại ở request đầu:
+    - danh sách quiz đang mở + snapshot mmap của từng quiz
+    - index câu hỏi theo độ khó (question_pool)
+    - đáp án đúng: choice id + AnswerKey đã biên dịch của câu fill_in
+    - template Jinja đã biên dịch
+
+Xong thì đóng connection DB của master: worker không được dùng chung
+socket / file handle SQLite với master.
+"""
+import time
+
+from app import db
+from app.grading import load_answer_keys, load_choice_keys
+from app.models import Question, Quiz
+from app.question_pool import get_bucket_index
+from app.snapshots import get_snapshot
+
+
+def _question_types(quiz, snapshot):
+    if snapshot is not None:
+        return {qid: snapshot.question(qid).type for qid in snapshot.question_ids()}
+    return dict(
+        db.session.query(Question.id, Question.type)
+        .filter(Question.quiz_id == quiz.id, Question.deleted_at.is_(None))
+        .all()
+    )
+
+
+def warm_quiz(quiz):
+    """Snapshot + index + đáp án của một quiz. Trả về số câu hỏi."""
+    snapshot = get_snapshot(quiz)
+    get_bucket_index(quiz)
+
+    types = _question_types(quiz, snapshot)
+    load_choice_keys([qid for qid, t in types.items() if t in ("mcq", "true_false")], snapshot)
+    load_answer_keys([qid for qid, t in types.items() if t == "fill_in"], snapshot)
+    return len(types)
+
+
+def warm_templates(app):
+    names = app.jinja_env.list_templates(extensions=("html",))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def warm_up(app):
+    """
+    Làm nóng cache của app, gọi một lần trong master (wsgi.py).
+    Lỗi DB (chưa migrate, ...) chỉ log: worker vẫn chạy, cache load lười như cũ.
+    """
+    start = time.perf_counter()
+    stats = {"quizzes": 0, "questions": 0, "templates": 0}
+
+    with app.app_context():
+        try:
+            quizzes = Quiz.query.filter_by(is_active=True, deleted_at=None).all()
+            for quiz in quizzes:
+                stats["questions"] += warm_quiz(quiz)
+            stats["quizzes"] = len(quizzes)
+        except Exception as e:
+            app.logger.warning("Warmup cache lỗi: %s", e)
+        finally:
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+
+        stats["templates"] = warm_templates(app)
+
+    stats["ms"] = round((time.perf_counter() - start) * 1000)
+    print(
+        "Warmup: {quizzes} quiz, {questions} câu hỏi, {templates} template ({ms} ms)".format(**stats)
+    )
+    return stats
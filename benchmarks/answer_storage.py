@@ -0,0 +1,244 @@
+"""
+Benchmark lưu trữ câu trả lời: user_answer text (cũ) vs choice_id + bitmap (mới).
+
+Dựng hai DB SQLite cùng dữ liệu (mỗi bài nộp trả lời đủ bộ câu, đa số là
+mcq / true_false), rồi đo:
+    - dung lượng bảng answers, các index của nó, file DB (dbstat, sau VACUUM)
+    - phân bố lựa chọn của từng câu (GROUP BY câu trả lời, dùng index phủ)
+    - quét kiểu chấm lại: đếm câu đúng theo tập choice đúng
+    - tỉ lệ đúng theo câu của cả quiz: quét answers vs đọc bitmap submissions
+
+    python benchmarks/answer_storage.py
+    python benchmarks/answer_storage.py --submissions 50000 --questions 40
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.grading import pack_correctness, unpack_correctness  # noqa: E402
+
+CHOICE_ID_BASE = 1_000_000  # id choice của DB đã chạy lâu: 7 chữ số
+
+LAYOUTS = {
+    "text": """
+        CREATE TABLE submissions (
+            id INTEGER PRIMARY KEY, user_id INTEGER, quiz_id INTEGER, score FLOAT
+        );
+        CREATE TABLE answers (
+            id INTEGER PRIMARY KEY, submission_id INTEGER, question_id INTEGER,
+            user_answer TEXT, is_correct BOOLEAN, score FLOAT, checked BOOLEAN
+        );
+    """,
+    "typed": """
+        CREATE TABLE submissions (
+            id INTEGER PRIMARY KEY, user_id INTEGER, quiz_id INTEGER, score FLOAT,
+            correctness_bitmap BLOB
+        );
+        CREATE TABLE answers (
+            id INTEGER PRIMARY KEY, submission_id INTEGER, question_id INTEGER,
+            choice_id INTEGER, user_answer TEXT, is_correct BOOLEAN, score FLOAT,
+            checked BOOLEAN
+        );
+    """,
+}
+INDEXES = """
+    CREATE INDEX ix_answers_question_id ON answers (question_id);
+    CREATE INDEX ix_answers_submission_id ON answers (submission_id);
+    CREATE INDEX ix_answers_question_response ON answers (question_id, {column});
+"""
+
+
+# =============================
+#             DATA
+# =============================
+def make_questions(count, rng):
+    """[(question_id, type, [choice id], {choice id đúng})]"""
+    questions = []
+    next_choice = CHOICE_ID_BASE
+    for qid in range(1, count + 1):
+        qtype = rng.choices(("mcq", "true_false", "fill_in"), weights=(6, 3, 1))[0]
+        n = {"mcq": 4, "true_false": 2, "fill_in": 0}[qtype]
+        choices = list(range(next_choice, next_choice + n))
+        next_choice += max(n, 1)
+        questions.append((qid, qtype, choices, set(choices[:1])))
+    return questions
+
+
+def generate(questions, submissions, seed):
+    """Mỗi submission: [(question_id, choice id | None, text | None, đúng?)]"""
+    rng = random.Random(seed)
+    for sid in range(1, submissions + 1):
+        rows = []
+        for qid, qtype, choices, correct in questions:
+            if qtype == "fill_in":
+                text = rng.choice(("Hà Nội", "ha noi", "Huế", "Đà Nẵng", ""))
+                rows.append((qid, None, text or None, text in ("Hà Nội", "ha noi")))
+            else:
+                cid = rng.choice(choices + [None])  # đôi khi bỏ trống
+                rows.append((qid, cid, None, cid in correct))
+        yield sid, rows
+
+
+def build(layout, path, questions, opts):
+    conn = sqlite3.connect(path)
+    conn.executescript(LAYOUTS[layout])
+    answer_id = 0
+    sub_rows, ans_rows = [], []
+
+    def flush():
+        if layout == "text":
+            conn.executemany("INSERT INTO submissions VALUES (?, ?, ?, ?)", sub_rows)
+            conn.executemany("INSERT INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)", ans_rows)
+        else:
+            conn.executemany("INSERT INTO submissions VALUES (?, ?, ?, ?, ?)", sub_rows)
+            conn.executemany("INSERT INTO answers VALUES (?, ?, ?, ?, ?, ?, ?, ?)", ans_rows)
+        sub_rows.clear()
+        ans_rows.clear()
+
+    for sid, rows in generate(questions, opts.submissions, opts.seed):
+        correct = sum(1 for *_, ok in rows if ok)
+        score = correct / len(rows) * 10
+        if layout == "text":
+            sub_rows.append((sid, sid, 1, score))
+        else:
+            flags = [ok for *_, ok in sorted(rows)]
+            sub_rows.append((sid, sid, 1, score, pack_correctness(flags)))
+
+        for qid, cid, text, ok in rows:
+            answer_id += 1
+            if layout == "text":
+                # cách lưu cũ: choice id thành chuỗi, bỏ trống = ''
+                raw = str(cid) if cid is not None else (text or "")
+                ans_rows.append((answer_id, sid, qid, raw, ok, float(ok), True))
+            else:
+                ans_rows.append((answer_id, sid, qid, cid, text, ok, float(ok), True))
+        if len(sub_rows) >= 1000:
+            flush()
+    flush()
+
+    column = "user_answer" if layout == "text" else "choice_id"
+    conn.executescript(INDEXES.format(column=column))
+    conn.commit()
+    conn.execute("VACUUM")
+    return conn
+
+
+# =============================
+#           MEASURE
+# =============================
+def storage(conn, path):
+    sizes = dict(conn.execute("SELECT name, sum(pgsize) FROM dbstat GROUP BY name"))
+    index_names = [
+        row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'answers'"
+        )
+    ]
+    return {
+        "file_mb": os.path.getsize(path) / 1e6,
+        "answers_mb": sizes.get("answers", 0) / 1e6,
+        "answer_indexes_mb": sum(sizes.get(n, 0) for n in index_names) / 1e6,
+        "submissions_mb": sizes.get("submissions", 0) / 1e6,
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def scans(layout, conn, questions, repeat):
+    column = "user_answer" if layout == "text" else "choice_id"
+    choice_questions = [q for q in questions if q[1] != "fill_in"]
+
+    def distribution():
+        for qid, *_ in choice_questions:
+            conn.execute(
+                f"SELECT {column}, count(*) FROM answers WHERE question_id = ? GROUP BY {column}",
+                (qid,),
+            ).fetchall()
+
+    def regrade_scan():
+        for qid, _, _, correct in choice_questions:
+            values = [str(c) for c in correct] if layout == "text" else list(correct)
+            marks = ",".join("?" * len(values))
+            conn.execute(
+                f"SELECT count(*) FROM answers WHERE question_id = ? AND {column} IN ({marks})",
+                (qid, *values),
+            ).fetchone()
+
+    def correct_rate():
+        if layout == "text":
+            return conn.execute(
+                "SELECT question_id, sum(is_correct) FROM answers GROUP BY question_id"
+            ).fetchall()
+        totals = [0] * len(questions)
+        for (bitmap,) in conn.execute("SELECT correctness_bitmap FROM submissions"):
+            for i, ok in enumerate(unpack_correctness(bitmap, len(questions))):
+                totals[i] += ok
+        return totals
+
+    return {
+        "distribution_ms": timed(distribution, repeat),
+        "regrade_scan_ms": timed(regrade_scan, repeat),
+        "correct_rate_ms": timed(correct_rate, repeat),
+    }
+
+
+# =============================
+#             MAIN
+# =============================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--submissions", type=int, default=20000)
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("-n", "--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="In kết quả dạng JSON.")
+    opts = parser.parse_args()
+
+    questions = make_questions(opts.questions, random.Random(opts.seed))
+    workdir = tempfile.mkdtemp(prefix="quiz-bench-answers-")
+    results = {}
+    try:
+        for layout in LAYOUTS:
+            path = os.path.join(workdir, f"{layout}.db")
+            start = time.perf_counter()
+            conn = build(layout, path, questions, opts)
+            results[layout] = {
+                "build_s": time.perf_counter() - start,
+                **storage(conn, path),
+                **scans(layout, conn, questions, opts.repeat),
+            }
+            conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if opts.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    answers = opts.submissions * opts.questions
+    print(f"{opts.submissions} submissions × {opts.questions} câu = {answers} answers")
+    print(f"{'':<20}{'text':>12}{'typed':>12}{'typed/text':>12}")
+    for key in results["text"]:
+        before, after = results["text"][key], results["typed"][key]
+        ratio = f"{after / before:.2f}" if before else "-"
+        print(f"{key:<20}{before:>12.2f}{after:>12.2f}{ratio:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Benchmark nhật ký sự kiện làm bài (app/attempt_events.py).
+
+Chạy trên DB + instance/ tạm, đo trong một process:
+    - writer: EventLog.append (buffer + ghi theo lô), dòng/s và sự kiện/s
+    - endpoint: POST /quiz/events qua test client nhiều thread
+      (gồm load user của Flask-Login, parse JSON, lọc sự kiện)
+    - compaction: N bài đã nộp × M câu, mỗi lượt làm vài beacon
+
+    python benchmarks/attempt_events.py
+    python benchmarks/attempt_events.py --beacons 20000 --threads 8 --attempts 5000
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config  # noqa: E402
+
+
+def make_events(rng, question_ids, count):
+    events, t = [], 0
+    for _ in range(count):
+        t += rng.randint(200, 5000)
+        kind = rng.choices("vcbf", weights=(5, 3, 1, 1))[0]
+        events.append([t, kind, rng.choice(question_ids)])
+    return events
+
+
+def bench_writer(folder, lines, batch):
+    from app.attempt_events import EventLog
+
+    log = EventLog(folder, flush_lines=500, flush_seconds=1.0, segment_seconds=300)
+    payload = make_events(random.Random(1), list(range(1, 31)), batch)
+    line = json.dumps({"u": 1, "a": "0" * 32, "q": 1, "r": 0, "e": payload},
+                      separators=(",", ":")) + "\n"
+    start = time.perf_counter()
+    for _ in range(lines):
+        log.append(line)
+    log.flush()
+    elapsed = time.perf_counter() - start
+    return {"writer_lines_s": lines / elapsed, "writer_events_s": lines * batch / elapsed}
+
+
+def bench_endpoint(app, quiz_id, question_ids, beacons, threads, batch):
+    from app.attempt_events import _logs
+
+    per_thread = beacons // threads
+    bodies = [
+        json.dumps({"attempt": f"{i:032x}", "quiz_id": quiz_id,
+                    "events": make_events(random.Random(i), question_ids, batch)})
+        for i in range(64)
+    ]
+    clients = []
+    for _ in range(threads):
+        client = app.test_client()
+        client.post("/auth/login", data={"username": "stu", "password": "stu123"})
+        clients.append(client)
+
+    latencies = []
+
+    def run(client):
+        local = []
+        for i in range(per_thread):
+            t0 = time.perf_counter()
+            r = client.post("/quiz/events", data=bodies[i % len(bodies)],
+                            content_type="application/json")
+            local.append(time.perf_counter() - t0)
+            assert r.status_code == 204, r.status_code
+        latencies.extend(local)
+
+    workers = [threading.Thread(target=run, args=(c,)) for c in clients]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    for log in _logs.values():
+        log.flush()
+
+    latencies.sort()
+    total = per_thread * threads
+    return {
+        "endpoint_req_s": total / elapsed,
+        "endpoint_events_s": total * batch / elapsed,
+        "endpoint_p50_ms": latencies[len(latencies) // 2] * 1000,
+        "endpoint_p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def bench_compaction(app, db, quiz_id, question_ids, user_id, attempts, batch):
+    from app import attempt_events
+    from app.models import Answer, Submission
+
+    rng = random.Random(2)
+    finished = datetime.utcnow() - timedelta(hours=1)
+    with app.app_context():
+        for i in range(attempts):
+            key = f"c{i:031x}"  # khác khóa của bench_endpoint (những lượt đó → carry)
+            sub = Submission(user_id=user_id, quiz_id=quiz_id, attempt_key=key,
+                             finished_at=finished)
+            db.session.add(sub)
+            db.session.flush()
+            db.session.add_all(Answer(submission_id=sub.id, question_id=q) for q in question_ids)
+            events = make_events(rng, question_ids, batch * 3)
+            for j in range(0, len(events), batch):
+                attempt_events.record(user_id, key, quiz_id, events[j:j + batch])
+        db.session.commit()
+        for log in attempt_events._logs.values():
+            log.flush()
+
+        start = time.perf_counter()
+        counts = attempt_events.compact(now=time.time() + 3600)
+        elapsed = time.perf_counter() - start
+    assert counts["compacted"] == attempts, counts
+    return {"compact_s": elapsed, "compact_attempts_s": attempts / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=200000, help="Số lô cho writer.")
+    parser.add_argument("--beacons", type=int, default=8000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=20, help="Sự kiện mỗi beacon.")
+    parser.add_argument("--attempts", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--json", action="store_true", help="In kết quả dạng JSON.")
+    opts = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="quiz-bench-events-")
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(workdir, "bench.db")
+        CELERY_ENABLED = False
+        WTF_CSRF_ENABLED = False
+        QUIZ_SNAPSHOTS_ENABLED = False
+
+    try:
+        from app import create_app, db
+        from app.models import Question, Quiz, User
+
+        app = create_app(BenchConfig)
+        app.instance_path = workdir
+        with app.app_context():
+            db.create_all()
+            user = User(username="stu", email="s@x.com", role="student")
+            user.set_password("stu123")
+            db.session.add(user)
+            quiz = Quiz(title="bench", num_questions=opts.questions)
+            db.session.add(quiz)
+            db.session.flush()
+            db.session.add_all(
+                Question(quiz_id=quiz.id, content=f"q{i}") for i in range(opts.questions)
+            )
+            db.session.commit()
+            quiz_id, user_id = quiz.id, user.id
+            question_ids = [q.id for q in Question.query.filter_by(quiz_id=quiz_id)]
+
+        results = {}
+        results.update(bench_writer(os.path.join(workdir, "writer"), opts.lines, opts.batch))
+        results.update(bench_endpoint(app, quiz_id, question_ids, opts.beacons,
+                                      opts.threads, opts.batch))
+        results.update(bench_compaction(app, db, quiz_id, question_ids, user_id,
+                                        opts.attempts, opts.batch))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if opts.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"batch             : {opts.batch} sự kiện / beacon")
+    print(f"writer            : {results['writer_lines_s']:,.0f} lô/s "
+          f"({results['writer_events_s']:,.0f} sự kiện/s)")
+    print(f"endpoint          : {results['endpoint_req_s']:,.0f} req/s "
+          f"({results['endpoint_events_s']:,.0f} sự kiện/s), {opts.threads} thread")
+    print(f"endpoint latency  : p50 {results['endpoint_p50_ms']:.2f} ms, "
+          f"p99 {results['endpoint_p99_ms']:.2f} ms")
+    print(f"compaction        : {opts.attempts} bài × {opts.questions} câu trong "
+          f"{results['compact_s']:.2f} s ({results['compact_attempts_s']:,.0f} bài/s)")
+
+
+if __name__ == "__main__":
+    main()
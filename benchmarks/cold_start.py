@@ -0,0 +1,95 @@
+"""
+Benchmark khởi động lạnh: thời gian import + create_app() và bộ nhớ RSS.
+
+Mỗi lần đo chạy trong một process Python mới (giống worker vừa fork /
+lệnh CLI vừa chạy), lấy median của nhiều lần.
+
+    python benchmarks/cold_start.py            # 7 lần
+    python benchmarks/cold_start.py -n 20 --cli
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# các module nặng / tùy chọn: không nên bị import khi chỉ khởi động app
+HEAVY_MODULES = ("reportlab", "celery", "kombu", "flask_migrate", "alembic", "pyarrow", "redis")
+
+PROBE = r"""
+import json, resource, sys, time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+app = create_app()
+t2 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "create_app_ms": (t2 - t1) * 1000,
+    "total_ms": (t2 - t0) * 1000,
+    "maxrss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": len(sys.modules),
+    "heavy": [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def run_probe():
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    # create_app có thể in cảnh báo, kết quả là dòng JSON cuối
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run_cli(args):
+    env = dict(os.environ, FLASK_APP="run.py")
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "flask", *args],
+        cwd=ROOT, env=env, capture_output=True, check=True,
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", "--runs", type=int, default=7)
+    parser.add_argument("--cli", action="store_true", help="Đo thêm `flask --help`, `flask db current`.")
+    parser.add_argument("--json", action="store_true", help="In kết quả dạng JSON.")
+    opts = parser.parse_args()
+
+    samples = [run_probe() for _ in range(opts.runs)]
+    result = {
+        key: statistics.median(s[key] for s in samples)
+        for key in ("import_ms", "create_app_ms", "total_ms", "maxrss_mb", "modules")
+    }
+    result["heavy_loaded"] = sorted({m for s in samples for m in s["heavy"]})
+
+    if opts.cli:
+        for name, args in (("flask_help_ms", ["--help"]), ("flask_db_current_ms", ["db", "current"])):
+            result[name] = statistics.median(run_cli(args) for _ in range(opts.runs))
+
+    if opts.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"runs              : {opts.runs} (median)")
+    print(f"import app        : {result['import_ms']:.1f} ms")
+    print(f"create_app()      : {result['create_app_ms']:.1f} ms")
+    print(f"total             : {result['total_ms']:.1f} ms")
+    print(f"max RSS           : {result['maxrss_mb']:.1f} MB")
+    print(f"sys.modules       : {result['modules']:.0f}")
+    print(f"heavy modules     : {', '.join(result['heavy_loaded']) or '-'}")
+    if opts.cli:
+        print(f"flask --help      : {result['flask_help_ms']:.1f} ms")
+        print(f"flask db current  : {result['flask_db_current_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Benchmark rút đề practice: hàng đợi ôn tập (review_states) vs quét lịch sử answers.
+
+Dựng DB SQLite tạm: một quiz practice với bank N câu, vài học sinh có số
+answers khác nhau (mặc định 1k / 10k / 100k), dựng review_states bằng
+rebuild_review_states(), rồi đo cho từng học sinh:
+    - history_scan: cách làm ngây thơ — GROUP BY toàn bộ answers của user
+      theo câu để tìm câu yếu / lâu chưa ôn
+    - draw_now / draw_+1d / draw_+30d: practice.draw_practice_ids ở các thời
+      điểm khác nhau (ít / vừa / nhiều câu đến hạn)
+    - record: cập nhật trạng thái sau một bài nộp (SELECT + UPSERT)
+
+    python benchmarks/practice_selection.py
+    python benchmarks/practice_selection.py --bank 20000 --answers 1000,100000,300000
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config  # noqa: E402
+
+HISTORY_SCAN = """
+    SELECT a.question_id, count(*), sum(a.is_correct), max(s.finished_at)
+    FROM answers a JOIN submissions s ON s.id = a.submission_id
+    WHERE s.user_id = :user_id AND s.quiz_id = :quiz_id
+    GROUP BY a.question_id
+"""
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def seed(db, quiz_id, user_id, question_ids, answers, per_submission, rng):
+    """answers câu trả lời, chia thành các bài nộp per_submission câu trong 1 năm qua."""
+    start = datetime.utcnow() - timedelta(days=365)
+    count = max(1, answers // per_submission)
+    step = timedelta(days=365) / count
+    # mỗi câu có độ khó riêng → vài câu học sinh hay sai
+    hardness = {qid: rng.random() for qid in question_ids}
+    conn = db.session.connection()
+    sub_id = conn.exec_driver_sql("SELECT coalesce(max(id), 0) FROM submissions").scalar()
+    answer_id = conn.exec_driver_sql("SELECT coalesce(max(id), 0) FROM answers").scalar()
+
+    subs, rows = [], []
+    for i in range(count):
+        sub_id += 1
+        finished = start + step * i
+        subs.append((sub_id, user_id, quiz_id, finished, finished))
+        for qid in rng.sample(question_ids, per_submission):
+            answer_id += 1
+            ok = rng.random() > hardness[qid]
+            rows.append((answer_id, sub_id, qid, 1 if ok else 2, ok, float(ok), True))
+        if len(rows) >= 50000:
+            _flush(conn, subs, rows)
+    _flush(conn, subs, rows)
+    db.session.commit()
+
+
+def _flush(conn, subs, rows):
+    if not subs:
+        return
+    conn.exec_driver_sql(
+        "INSERT INTO submissions (id, user_id, quiz_id, created_at, finished_at) "
+        "VALUES (?, ?, ?, ?, ?)", subs,
+    )
+    conn.exec_driver_sql(
+        "INSERT INTO answers (id, submission_id, question_id, choice_id, is_correct, score, "
+        "checked) VALUES (?, ?, ?, ?, ?, ?, ?)", rows,
+    )
+    subs.clear()
+    rows.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bank", type=int, default=5000, help="Số câu trong bank.")
+    parser.add_argument("--answers", default="1000,10000,100000",
+                        help="Số answers của từng học sinh, phân cách bằng dấu phẩy.")
+    parser.add_argument("-k", type=int, default=20, help="Số câu mỗi lượt practice.")
+    parser.add_argument("-n", "--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="In kết quả dạng JSON.")
+    opts = parser.parse_args()
+    sizes = [int(x) for x in opts.answers.split(",")]
+
+    workdir = tempfile.mkdtemp(prefix="quiz-bench-practice-")
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(workdir, "bench.db")
+        CELERY_ENABLED = False
+        QUIZ_SNAPSHOTS_ENABLED = False
+
+    results = {}
+    try:
+        from app import create_app, db
+        from app import practice
+        from app.models import Question, Quiz, User
+
+        app = create_app(BenchConfig)
+        app.instance_path = workdir
+        rng = random.Random(opts.seed)
+        with app.app_context():
+            db.create_all()
+            quiz = Quiz(title="practice", mode="practice", num_questions=opts.k)
+            db.session.add(quiz)
+            db.session.flush()
+            db.session.execute(
+                Question.__table__.insert(),
+                [{"quiz_id": quiz.id, "content": f"q{i}", "type": "mcq"}
+                 for i in range(opts.bank)],
+            )
+            users = []
+            for n in sizes:
+                user = User(username=f"u{n}", email=f"u{n}@x.com")
+                user.set_password("x")
+                db.session.add(user)
+                users.append(user)
+            db.session.commit()
+            quiz_id = quiz.id
+            question_ids = [row[0] for row in db.session.query(Question.id)]
+
+            start = time.perf_counter()
+            for user, n in zip(users, sizes):
+                seed(db, quiz_id, user.id, question_ids, n, min(opts.k, opts.bank), rng)
+            seed_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            states = practice.rebuild_review_states([quiz_id])
+            rebuild_s = time.perf_counter() - start
+
+            quiz = db.session.get(Quiz, quiz_id)
+            practice.draw_practice_ids(quiz, users[0].id)  # build index bank trong worker
+            now = datetime.utcnow()
+            for user, n in zip(users, sizes):
+                scan = db.text(HISTORY_SCAN).bindparams(user_id=user.id, quiz_id=quiz_id)
+                row = {
+                    "history_scan_ms": timed(
+                        lambda: db.session.execute(scan).all(), max(3, opts.repeat // 4)
+                    ),
+                }
+                for label, offset in (("now", 0), ("+1d", 1), ("+30d", 30)):
+                    at = now + timedelta(days=offset)
+                    row[f"draw_{label}_ms"] = timed(
+                        lambda: practice.draw_practice_ids(quiz, user.id, now=at), opts.repeat
+                    )
+
+                sample = rng.sample(question_ids, min(opts.k, opts.bank))
+
+                def record():
+                    practice.record_reviews(
+                        user.id, quiz_id, [(qid, rng.choice((0, 1, 4))) for qid in sample]
+                    )
+                    db.session.commit()
+
+                row["record_ms"] = timed(record, opts.repeat)
+                results[n] = row
+
+            plan = db.session.execute(db.text(
+                "EXPLAIN QUERY PLAN SELECT question_id FROM review_states "
+                "WHERE user_id = 1 AND quiz_id = 1 AND due_at <= '2100-01-01' "
+                "ORDER BY due_at LIMIT 40"
+            )).all()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if opts.json:
+        print(json.dumps({"seed_s": seed_s, "rebuild_s": rebuild_s, "states": states,
+                          "users": results}, indent=2))
+        return
+
+    print(f"bank {opts.bank} câu, k = {opts.k}, seed {seed_s:.1f} s, "
+          f"rebuild_review_states {rebuild_s:.1f} s ({states} trạng thái)")
+    print("due query plan: " + "; ".join(row[-1] for row in plan))
+    columns = list(next(iter(results.values())))
+    print(f"{'answers':>10}" + "".join(f"{c:>18}" for c in columns))
+    for n, row in results.items():
+        print(f"{n:>10}" + "".join(f"{row[c]:>18.2f}" for c in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+Benchmark server: dev server (`flask run`) vs gunicorn (gunicorn.conf.py).
+
+Mỗi server chạy trên một DB + instance/ tạm (seed sẵn 1 quiz, 1 học sinh),
+client đăng nhập rồi bắn request song song vào các trang đọc nhiều nhất
+(home, danh sách quiz, mở đề, API câu hỏi). Đo:
+    - request đầu tiên sau khi server sẵn sàng (cache nguội / đã warmup)
+    - req/s, latency p50 / p99
+    - RSS / PSS / private của từng process (Linux, đọc /proc)
+PSS chia đều trang dùng chung cho các process → thấy được phần copy-on-write
+mà preload + warmup tiết kiệm.
+
+    python benchmarks/server_throughput.py
+    python benchmarks/server_throughput.py -d 20 -c 32 -w 4 --questions 2000
+"""
+import argparse
+import http.client
+import json
+import os
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEED = r"""
+import random
+from app import create_app, db
+from app.models import User, Quiz, Question, Choice
+
+app = create_app()
+rng = random.Random(1)
+with app.app_context():
+    db.create_all()
+    admin = User(username="bench_admin", email="admin@bench.local", role="admin")
+    admin.set_password("bench123")
+    student = User(username="bench", email="bench@bench.local", role="student")
+    student.set_password("bench123")
+    db.session.add_all([admin, student])
+    db.session.flush()
+
+    quiz = Quiz(title="Benchmark", created_by=admin.id, mode="practice",
+                num_questions=20, is_active=True, bank_version=1)
+    db.session.add(quiz)
+    db.session.flush()
+    for i in range(%d):
+        qtype = ("mcq", "mcq", "true_false", "fill_in")[i %% 4]
+        q = Question(quiz_id=quiz.id, type=qtype, content=f"Câu hỏi số {i}: " + "nội dung " * 10,
+                     difficulty=rng.choice(("easy", "medium", "hard")))
+        db.session.add(q)
+        db.session.flush()
+        if qtype == "mcq":
+            db.session.add_all(Choice(question_id=q.id, content=f"Đáp án {k}", is_correct=k == 0)
+                               for k in range(4))
+        elif qtype == "true_false":
+            db.session.add_all([Choice(question_id=q.id, content="Đúng", is_correct=True),
+                                Choice(question_id=q.id, content="Sai", is_correct=False)])
+        else:
+            db.session.add(Choice(question_id=q.id, content=f"đáp án {i}", is_correct=True))
+    db.session.commit()
+    print(quiz.id)
+"""
+
+
+# =============================
+#            SERVERS
+# =============================
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_env(workdir):
+    return dict(
+        os.environ,
+        QUIZ_INSTANCE_PATH=workdir,
+        DATABASE_URL="sqlite:///" + os.path.join(workdir, "quiz.db"),
+        FLASK_APP="run.py",
+    )
+
+
+def seed(env, questions):
+    out = subprocess.run(
+        [sys.executable, "-c", SEED % questions],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return int(out.strip().splitlines()[-1])
+
+
+def start_server(kind, env, port, workers):
+    if kind == "dev":
+        cmd = [sys.executable, "-m", "flask", "run", "--port", str(port),
+               "--no-reload", "--no-debugger", "--with-threads"]
+    else:
+        cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"]
+        env = dict(env, QUIZ_BIND=f"127.0.0.1:{port}", QUIZ_WORKERS=str(workers))
+    return subprocess.Popen(
+        cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def wait_ready(port, proc, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("Server thoát khi khởi động.")
+        try:
+            request(port, "GET", "/auth/login")
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("Server không sẵn sàng sau %ss." % timeout)
+
+
+# =============================
+#            CLIENT
+# =============================
+def request(port, method, path, body=None, headers=None):
+    # connection mới mỗi request (dev server đóng connection sau mỗi response)
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        resp = conn.getresponse()
+        return resp.status, resp.getheaders(), resp.read()
+    finally:
+        conn.close()
+
+
+def login(port):
+    status, headers, body = request(port, "GET", "/auth/login")
+    cookie = _session_cookie(headers)
+    token = re.search(rb'name="csrf_token"[^>]*value="([^"]+)"', body).group(1).decode()
+    form = urllib.parse.urlencode(
+        {"csrf_token": token, "username": "bench", "password": "bench123"}
+    )
+    status, headers, _ = request(port, "POST", "/auth/login", form, {
+        "Content-Type": "application/x-www-form-urlencoded",
+        "Cookie": cookie,
+    })
+    if status != 302:
+        raise RuntimeError(f"Đăng nhập thất bại (HTTP {status}).")
+    return _session_cookie(headers) or cookie
+
+
+def _session_cookie(headers):
+    for name, value in headers:
+        if name.lower() == "set-cookie" and value.startswith("session="):
+            return value.split(";", 1)[0]
+    return ""
+
+
+def open_attempt(port, cookie, quiz_id):
+    """API câu hỏi chỉ trả câu của lượt làm đang mở → mở một lượt, lấy questions_url."""
+    status, _, body = request(port, "POST", f"/api/quizzes/{quiz_id}/attempts",
+                              headers={"Cookie": cookie})
+    if status not in (200, 201):
+        raise RuntimeError(f"Không mở được lượt làm (HTTP {status}).")
+    return json.loads(body)["questions_url"]
+
+
+def endpoints(quiz_id, questions_url):
+    return [
+        "/quiz/",
+        "/quiz/list",
+        f"/quiz/start/{quiz_id}",
+        questions_url,
+    ]
+
+
+def load(port, cookie, paths, duration, concurrency):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(offset):
+        local, failed, i = [], 0, offset
+        while time.monotonic() < stop_at:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                status, _, _ = request(port, "GET", path, headers={"Cookie": cookie})
+                ok = status == 200
+            except OSError:
+                ok = False
+            if ok:
+                local.append(time.perf_counter() - start)
+            else:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / duration,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else None,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else None,
+    }
+
+
+# =============================
+#            MEMORY
+# =============================
+def _children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(x) for x in f.read().split()]
+    except OSError:
+        return []
+
+
+def _memory(pid):
+    """RSS / PSS / private (MB) từ smaps_rollup, None nếu không đọc được."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[1].isdigit():
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    except OSError:
+        return None
+    return {
+        "rss_mb": fields.get("Rss", 0),
+        "pss_mb": fields.get("Pss", 0),
+        "private_mb": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def memory_report(kind, pid):
+    """[(vai trò, pid, memory)] — gunicorn: master + từng worker."""
+    if kind == "dev":
+        return [("server", pid, _memory(pid))]
+    return [("master", pid, _memory(pid))] + [
+        ("worker", child, _memory(child)) for child in _children(pid)
+    ]
+
+
+# =============================
+#             MAIN
+# =============================
+def run(kind, opts):
+    workdir = tempfile.mkdtemp(prefix=f"quiz-bench-{kind}-")
+    env = make_env(workdir)
+    port = free_port()
+    proc = None
+    try:
+        quiz_id = seed(env, opts.questions)
+        proc = start_server(kind, env, port, opts.workers)
+        wait_ready(port, proc)
+        cookie = login(port)
+        paths = endpoints(quiz_id, open_attempt(port, cookie, quiz_id))
+
+        start = time.perf_counter()
+        request(port, "GET", paths[2], headers={"Cookie": cookie})
+        first_ms = (time.perf_counter() - start) * 1000
+
+        result = load(port, cookie, paths, opts.duration, opts.concurrency)
+        result["first_request_ms"] = first_ms
+        result["memory"] = [
+            {"role": role, "pid": pid, **(mem or {})}
+            for role, pid, mem in memory_report(kind, proc.pid)
+        ]
+        return result
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def print_result(kind, result):
+    print(f"== {kind}")
+    print(f"first request     : {result['first_request_ms']:.1f} ms")
+    print(f"requests          : {result['requests']} ({result['errors']} lỗi)")
+    print(f"throughput        : {result['rps']:.1f} req/s")
+    if result["p50_ms"] is not None:
+        print(f"latency p50 / p99 : {result['p50_ms']:.1f} / {result['p99_ms']:.1f} ms")
+    for mem in result["memory"]:
+        if "rss_mb" not in mem:
+            continue
+        print(
+            f"{mem['role']:<8} {mem['pid']:>7} : RSS {mem['rss_mb']:.1f} MB, "
+            f"PSS {mem['pss_mb']:.1f} MB, private {mem['private_mb']:.1f} MB"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-d", "--duration", type=float, default=10, help="Giây đo mỗi server.")
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("-w", "--workers", type=int, default=4, help="Số worker gunicorn.")
+    parser.add_argument("--questions", type=int, default=500, help="Số câu hỏi seed.")
+    parser.add_argument("--only", choices=("dev", "gunicorn"))
+    parser.add_argument("--json", action="store_true", help="In kết quả dạng JSON.")
+    opts = parser.parse_args()
+
+    kinds = [opts.only] if opts.only else ["dev", "gunicorn"]
+    results = {kind: run(kind, opts) for kind in kinds}
+
+    if opts.json:
+        print(json.dumps(results, indent=2))
+        return
+    for kind in kinds:
+        print_result(kind, results[kind])
+
+
+if __name__ == "__main__":
+    main()
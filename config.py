@@ -4,13 +4,104 @@ BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
 
 class Config:
-    SECRET_KEY = "dev-quiz-secret-key"  # đổi khi lên production
-    SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(BASE_DIR, "instance", "quiz.db")
+    SECRET_KEY = os.environ.get("SECRET_KEY") or "dev-quiz-secret-key"  # đổi khi lên production
+    SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL") or (
+        "sqlite:///" + os.path.join(BASE_DIR, "instance", "quiz.db")
+    )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
     # Celery (demo, không bắt buộc phải chạy Redis)
     CELERY_BROKER_URL = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND = "redis://localhost:6379/0"
+    CELERY_ENABLED = True  # False = luôn chạy task trong process (không import Celery)
 
     # Folder lưu chứng chỉ
     CERT_FOLDER = "certificates"
+
+    # Xóa mềm: số dòng mỗi lô khi dọn answers/submissions ở background
+    PURGE_CHUNK_SIZE = 500
+
+    # Cold storage cho bài làm cũ (flask archive-submissions)
+    ARCHIVE_FOLDER = "archive"
+    ARCHIVE_RETENTION_DAYS = 365
+    ARCHIVE_CHUNK_SIZE = 1000
+
+    # Chấm lại khi đổi đáp án (app/regrade.py): số answer mỗi lô UPDATE
+    REGRADE_CHUNK_SIZE = 5000
+    REGRADE_STALE_SECONDS = 3600  # job "running" lâu hơn → coi như chết, chạy lại
+
+    # Xuất gradebook (app/gradebook.py): số bài làm mỗi lô đọc answers
+    GRADEBOOK_CHUNK_SIZE = 500
+
+    # Bitmap đúng/sai mỗi bài nộp (Submission.correctness_bitmap), False = không ghi
+    ANSWER_CORRECTNESS_BITMAP = True
+
+    # Chấm câu fill_in
+    FILL_IN_IGNORE_DIACRITICS = True   # "Hà Nội" == "ha noi"
+    FILL_IN_NUMERIC_TOLERANCE = 1e-6   # sai số tuyệt đối cho đáp án dạng số
+    FILL_IN_FUZZY_DISTANCE = 0         # > 0: chấp nhận sai chính tả (Levenshtein)
+    FILL_IN_DECIMAL_COMMA = False      # "1,250" khi đáp án không cho biết: 1250 / True → 1,25
+
+    # JSON API: cache payload câu hỏi (ETag theo bank_version)
+    API_QUESTIONS_MAX_AGE = 31536000
+    API_DEADLINE_GRACE_SECONDS = 30  # trễ mạng: vẫn nhận lưu đáp án sau time_limit
+
+    # Micro-cache leaderboard (giây), 0 = tắt
+    LEADERBOARD_CACHE_SECONDS = 3
+
+    # Cache histogram điểm (percentile trên trang kết quả) trong worker, giây
+    SCORE_HISTOGRAM_CACHE_SECONDS = 5
+
+    # Theo dõi quiz trực tiếp (SSE, app/monitor.py)
+    MONITOR_WINDOW_SECONDS = 6 * 3600       # tính bài nộp trong khoảng này
+    MONITOR_IN_PROGRESS_SECONDS = 3 * 3600  # "đang làm" với quiz không giới hạn thời gian
+    MONITOR_RESYNC_SECONDS = 10             # dựng lại từ DB (gồm bài nộp ở worker khác)
+    MONITOR_BUFFER_SIZE = 16                # sự kiện chờ gửi tối đa mỗi kết nối
+    MONITOR_HEARTBEAT_SECONDS = 15
+    MONITOR_STREAM_SECONDS = 300            # đóng kết nối, trình duyệt tự nối lại
+    MONITOR_MAX_STREAMS = 2                 # mỗi kết nối giữ 1 thread, < QUIZ_THREADS
+
+    # Lịch ôn tập cho quiz practice (app/practice.py), False = rút ngẫu nhiên như exam
+    PRACTICE_SCHEDULER_ENABLED = True
+    PRACTICE_RELEARN_MINUTES = 10  # câu trả lời sai đến hạn ôn lại sau N phút
+
+    # Nhật ký sự kiện khi làm bài (app/attempt_events.py, flask compact-attempt-events)
+    ATTEMPT_EVENTS_ENABLED = True
+    ATTEMPT_EVENTS_FOLDER = "attempt_events"
+    ATTEMPT_EVENTS_BEACON_SECONDS = 10      # trình duyệt gửi lô sự kiện mỗi N giây
+    ATTEMPT_EVENTS_MAX_BATCH = 200          # sự kiện tối đa mỗi beacon
+    ATTEMPT_EVENTS_FLUSH_LINES = 500        # buffer mỗi process: ghi file khi đủ N lô
+    ATTEMPT_EVENTS_FLUSH_SECONDS = 1.0      # ... hoặc sau N giây
+    ATTEMPT_EVENTS_SEGMENT_SECONDS = 300    # mỗi segment nhận ghi tối đa N giây
+    ATTEMPT_EVENTS_PENDING_SECONDS = 24 * 3600  # lượt làm chưa nộp quá lâu → bỏ sự kiện
+
+    # Snapshot nhị phân (mmap) của ngân hàng câu hỏi, dùng chung giữa các worker
+    QUIZ_SNAPSHOTS_ENABLED = True
+    SNAPSHOT_FOLDER = "snapshots"
+
+    # Trang quản lý người dùng: số user mỗi trang
+    USERS_PER_PAGE = 50
+
+    # Tìm kiếm câu hỏi (FTS5): số kết quả mỗi trang
+    SEARCH_PER_PAGE = 20
+
+    # Read-replica cho các trang chỉ đọc (@read_only), None = chỉ dùng primary.
+    # Thử local: REPLICA_DATABASE_URI=sqlite:///.../quiz_replica.db
+    # rồi chạy `flask sync-replica --interval 5` để copy định kỳ.
+    REPLICA_DATABASE_URI = os.environ.get("REPLICA_DATABASE_URI")
+    REPLICA_MAX_LAG_SECONDS = 30     # replica trễ hơn mức này → đọc primary
+    REPLICA_LAG_CHECK_SECONDS = 1    # cache heartbeat trong worker
+
+    # Phòng chờ khi mở đề (giới hạn đặt theo từng quiz: admission_rate / burst)
+    ADMISSION_BACKEND = "memory"    # "redis" khi chạy nhiều worker
+    ADMISSION_REDIS_URL = None      # None = dùng CELERY_BROKER_URL
+    ADMISSION_GRACE_SECONDS = 300   # giữ quyền vào thêm sau time_limit
+    ADMISSION_TTL_SECONDS = 3 * 3600  # quiz không giới hạn thời gian
+    ADMISSION_POLL_SECONDS = 3
+    ADMISSION_TICKET_SECONDS = 60   # không poll lại quá N giây (+ thời gian chờ) → rời hàng
+
+    # Phát hiện câu gần trùng (MinHash/LSH): ngưỡng Jaccard ước lượng
+    DEDUPE_THRESHOLD = 0.7
+
+    # wsgi.py (gunicorn preload): làm nóng cache trong master trước khi fork worker
+    WARMUP_ON_LOAD = True
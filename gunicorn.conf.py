@@ -0,0 +1,47 @@
+"""
+Cấu hình gunicorn (pre-fork) cho production:
+
+    gunicorn -c gunicorn.conf.py
+
+Biến môi trường:
+    QUIZ_BIND          địa chỉ listen (mặc định 127.0.0.1:8000)
+    QUIZ_WORKERS       số worker process (mặc định 2 * CPU + 1)
+    QUIZ_THREADS       số thread mỗi worker
+    QUIZ_MAX_REQUESTS  recycle worker sau ngần này request (0 = không)
+    QUIZ_ACCESS_LOG    "-" = in access log ra stdout
+
+Nhiều worker → trạng thái in-process không còn dùng chung: đặt
+ADMISSION_BACKEND = "redis" nếu có quiz bật phòng chờ.
+Trang theo dõi trực tiếp (SSE) giữ một thread mỗi kết nối: giữ
+MONITOR_MAX_STREAMS nhỏ hơn QUIZ_THREADS.
+"""
+import gc
+import multiprocessing
+import os
+
+wsgi_app = "wsgi:app"
+bind = os.environ.get("QUIZ_BIND", "127.0.0.1:8000")
+
+workers = int(os.environ.get("QUIZ_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.environ.get("QUIZ_THREADS", 4))
+
+# load app + warmup (wsgi.py) trong master, worker fork ra dùng chung trang nhớ
+preload_app = True
+
+# recycle worker định kỳ (chặn rò rỉ bộ nhớ), jitter để không restart cùng lúc
+max_requests = int(os.environ.get("QUIZ_MAX_REQUESTS", 2000))
+max_requests_jitter = max_requests // 10
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = os.environ.get("QUIZ_ACCESS_LOG")
+errorlog = "-"
+
+
+def pre_fork(server, worker):
+    # object đã load trong master vào generation "permanent": GC của worker
+    # không quét chúng nên không ghi vào (và không copy) các trang dùng chung
+    gc.freeze()
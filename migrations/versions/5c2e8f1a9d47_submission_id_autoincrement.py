@@ -0,0 +1,46 @@
+"""submission id autoincrement
+
+Revision ID: 5c2e8f1a9d47
+Revises: b529206a2e5e
+Create Date: 2026-10-19 16:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2e8f1a9d47'
+down_revision = 'b529206a2e5e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite dùng lại id lớn nhất đã xóa (archive) nếu không có AUTOINCREMENT;
+    # Postgres dùng sequence, không cần đổi
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    with op.batch_alter_table(
+        'submissions', recreate='always', table_kwargs={'sqlite_autoincrement': True}
+    ) as batch_op:
+        pass
+
+    # id mới phải lớn hơn cả các id đã chuyển sang archive
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'submissions'")
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'submissions', max(coalesce(max_id, 0)) FROM ("
+        " SELECT max(id) AS max_id FROM submissions"
+        " UNION ALL SELECT max(id) FROM archived_submissions)"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    with op.batch_alter_table(
+        'submissions', recreate='always', table_kwargs={'sqlite_autoincrement': False}
+    ) as batch_op:
+        pass
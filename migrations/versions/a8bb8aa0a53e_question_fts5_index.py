@@ -0,0 +1,42 @@
+"""question fts5 index
+
+Revision ID: a8bb8aa0a53e
+Revises: b34afaa01d1d
+Create Date: 2026-10-19 14:02:31.022823
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8bb8aa0a53e'
+down_revision = 'b34afaa01d1d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 chỉ có trên SQLite, DB khác dùng fallback LIKE trong app/search.py
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS question_fts "
+        "USING fts5(content, explanation, choices, "
+        "tokenize='unicode61 remove_diacritics 2')"
+    )
+    op.execute(
+        "INSERT INTO question_fts(rowid, content, explanation, choices) "
+        "SELECT q.id, coalesce(q.content, ''), coalesce(q.explanation, ''), "
+        "coalesce((SELECT group_concat(c.content, ' ') FROM choices c "
+        "WHERE c.question_id = q.id), '') "
+        "FROM questions q WHERE q.deleted_at IS NULL"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TABLE IF EXISTS question_fts")
@@ -0,0 +1,107 @@
+"""
+Fixture chung: mỗi test một app với DB SQLite + instance/ riêng trong tmp_path.
+
+Chạy: python -m pytest -q (từ thư mục gốc repo).
+"""
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import Answer, Choice, Question, Quiz, Submission, User  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("QUIZ_INSTANCE_PATH", str(tmp_path))
+
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = "sqlite:///" + str(tmp_path / "test.db")
+        TESTING = True
+        WTF_CSRF_ENABLED = False
+        CELERY_ENABLED = False
+        # snapshot mở sẵn được giữ theo quiz_id trong process → tắt để các test không dùng lẫn
+        QUIZ_SNAPSHOTS_ENABLED = False
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def make_user(app):
+    def make(username, role="student"):
+        user = User(username=username, email=f"{username}@example.com", role=role)
+        user.set_password("secret123")
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    return make
+
+
+@pytest.fixture
+def quiz(make_user):
+    admin = make_user("admin", role="admin")
+    quiz = Quiz(title="Quiz", created_by=admin.id, num_questions=10, pass_score=5)
+    db.session.add(quiz)
+    db.session.commit()
+    return quiz
+
+
+@pytest.fixture
+def make_question(app):
+    def make(quiz, choices, type="mcq"):
+        """choices: [(nội dung, đúng?), ...] → (question, [choice, ...])."""
+        question = Question(quiz_id=quiz.id, content="Câu hỏi", type=type)
+        db.session.add(question)
+        db.session.flush()
+        rows = [
+            Choice(question_id=question.id, content=content, is_correct=is_correct)
+            for content, is_correct in choices
+        ]
+        db.session.add_all(rows)
+        db.session.commit()
+        return question, rows
+
+    return make
+
+
+@pytest.fixture
+def make_submission(app):
+    def make(user, quiz, answers, created_at=None):
+        """answers: [(question, choice hoặc text, đúng?), ...] → Submission đã nộp."""
+        correct = sum(1 for _, _, is_correct in answers if is_correct)
+        submission = Submission(
+            user_id=user.id,
+            quiz_id=quiz.id,
+            total_questions=len(answers),
+            correct_answers=correct,
+            score=correct / len(answers) * 10 if answers else 0.0,
+            created_at=created_at or datetime.utcnow(),
+            finished_at=created_at or datetime.utcnow(),
+        )
+        db.session.add(submission)
+        db.session.flush()
+        for question, response, is_correct in answers:
+            db.session.add(Answer(
+                submission_id=submission.id,
+                question_id=question.id,
+                choice_id=response.id if isinstance(response, Choice) else None,
+                user_answer=(response or None) if isinstance(response, str) else None,
+                is_correct=is_correct,
+                score=1.0 if is_correct else 0.0,
+                checked=True,
+            ))
+        db.session.commit()
+        return submission
+
+    return make
@@ -0,0 +1,51 @@
+from app.admission import Admission, MemoryAdmissionBackend, admit
+
+RATE = 1.0
+BURST = 1
+TTL = 600
+TICKET_TTL = 60
+
+
+def _enter(backend, user_id, now):
+    return backend.enter(1, user_id, RATE, BURST, TTL, TICKET_TTL, now)
+
+
+def test_queue_is_fifo_regardless_of_poll_order():
+    backend = MemoryAdmissionBackend()
+    assert _enter(backend, 1, 0.0) == (True, 0, 0.0)
+    assert _enter(backend, 2, 0.0) == (False, 1, None)
+    assert _enter(backend, 3, 0.0) == (False, 2, None)
+
+    # user 3 poll trước khi có lượt mới nhưng vẫn phải đứng sau user 2
+    assert _enter(backend, 3, 1.0) == (False, 1, None)
+    assert _enter(backend, 2, 1.0) == (True, 0, 1.0)
+    assert _enter(backend, 3, 1.5) == (False, 1, None)
+    assert _enter(backend, 3, 2.0) == (True, 0, 2.0)
+
+
+def test_admitted_user_keeps_admission_until_release():
+    backend = MemoryAdmissionBackend()
+    assert _enter(backend, 1, 0.0) == (True, 0, 0.0)
+    # vào lại trong TTL: giữ mốc admitted_at cũ, không tốn lượt
+    assert _enter(backend, 1, 0.5) == (True, 0, 0.0)
+
+    # nhả sau khi nộp: lượt sau phải xếp hàng lại
+    backend.release(1, 1)
+    assert _enter(backend, 1, 0.5) == (False, 1, None)
+
+
+def test_admission_expires_after_ttl():
+    backend = MemoryAdmissionBackend()
+    _enter(backend, 1, 0.0)
+    admitted, _, admitted_at = _enter(backend, 1, TTL + 1.0)
+    assert admitted and admitted_at == TTL + 1.0
+
+
+def test_retry_after():
+    assert Admission(False, position=3, rate=2).retry_after == 2
+    assert Admission(False, position=1, rate=10).retry_after == 1
+    assert Admission(True, rate=2).retry_after == 0
+
+
+def test_admit_without_rate_always_admits(app):
+    assert admit(1, 1, rate=None).admitted
@@ -0,0 +1,57 @@
+import os
+from datetime import datetime, timedelta
+
+from app import archive, db
+from app.archive import archive_submissions
+from app.models import ArchivedSubmission, Submission
+
+OLD = datetime(2020, 1, 15)
+
+
+def _part_names(quiz_id):
+    partition_dir = os.path.join(archive._archive_root(), f"quiz_{quiz_id}", "2020-01")
+    return sorted(os.listdir(partition_dir))
+
+
+def test_archive_round_trip_writes_one_part_per_run(
+    quiz, make_user, make_question, make_submission
+):
+    question, (right, wrong) = make_question(quiz, [("A", True), ("B", False)])
+    fill_in, _ = make_question(quiz, [("Hà Nội", True)], type="fill_in")
+    alice = make_user("alice")
+
+    first = make_submission(
+        alice, quiz, [(question, right, True), (fill_in, "ha noi", True)], created_at=OLD
+    ).id
+    assert archive_submissions() == 1
+    second = make_submission(
+        alice, quiz, [(question, wrong, False)], created_at=OLD + timedelta(days=1)
+    ).id
+    assert archive_submissions() == 1
+
+    # lần archive sau ghi part mới, không ghi lại part cũ
+    names = _part_names(quiz.id)
+    assert len([n for n in names if n.startswith("submissions-")]) == 2
+    assert len([n for n in names if n.startswith("answers-")]) == 2
+
+    records = {r.id: r for r in archive.user_submissions(alice.id)}
+    assert sorted(records) == [first, second]
+    assert records[first].score == 10.0
+    assert {(a.choice_id, a.user_answer) for a in records[first].answers} == {
+        (right.id, None),
+        (None, "ha noi"),
+    }
+    assert [a.choice_id for a in records[second].answers] == [wrong.id]
+    assert archive.get_submission(second).score == 0.0
+    assert Submission.query.count() == 0
+
+
+def test_archived_ids_are_not_reused(quiz, make_user, make_question, make_submission):
+    question, (right, _) = make_question(quiz, [("A", True), ("B", False)])
+    alice = make_user("alice")
+    archived_id = make_submission(alice, quiz, [(question, right, True)], created_at=OLD).id
+    archive_submissions()
+
+    new = make_submission(alice, quiz, [(question, right, True)])
+    assert new.id > archived_id
+    assert db.session.get(ArchivedSubmission, new.id) is None
@@ -0,0 +1,111 @@
+import pytest
+
+from app.grading import AnswerKey, comma_style, normalize_answer, parse_number
+
+
+@pytest.mark.parametrize(
+    "text, decimal_comma, expected",
+    [
+        ("3.5", False, 3.5),
+        ("3,5", False, 3.5),
+        (" 1e3 ", False, 1000.0),
+        ("1,000,000", False, 1000000.0),
+        ("1,000.5", False, 1000.5),
+        ("-1,234.5", False, -1234.5),
+        ("1 000", False, 1000.0),
+        ("3,5.", False, 3.5),
+        # '1,250' mơ hồ: đúng một cách đọc theo decimal_comma
+        ("1,250", False, 1250.0),
+        ("1,250", True, 1.25),
+        ("0,250", False, 0.25),
+        ("1,2,3", False, None),
+        ("abc", False, None),
+        ("nan", False, None),
+        ("inf", False, None),
+    ],
+)
+def test_parse_number(text, decimal_comma, expected):
+    assert parse_number(text, decimal_comma) == expected
+
+
+@pytest.mark.parametrize(
+    "texts, expected",
+    [
+        (["3,5"], True),
+        (["1,000,000"], False),
+        (["1,000.5"], False),
+        (["1,250"], None),
+        (["42", "hà nội"], None),
+    ],
+)
+def test_comma_style(texts, expected):
+    assert comma_style(texts) == expected
+
+
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        ("  Hà   Nội. ", "ha noi"),
+        ("(Đà Nẵng)", "da nang"),
+        ("5.", "5."),
+        (".5", ".5"),
+        ("'3,5'!", "3,5"),
+    ],
+)
+def test_normalize_answer(raw, expected):
+    assert normalize_answer(raw) == expected
+
+
+@pytest.mark.parametrize(
+    "accepted, answer, expected",
+    [
+        (["1000"], "1,000", True),
+        (["1000"], "1 000", True),
+        (["1"], "1,000", False),
+        (["1.5"], "1,5", True),
+        (["1.5"], "1,500", False),
+        (["1250"], "1,250", True),
+        (["1.25"], "1,250", False),
+        (["5"], "5.", True),
+        (["5"], ".5", False),
+        (["0.5"], ".5", True),
+        (["0.5"], "0.50", True),
+        (["Hà Nội"], "ha noi", True),
+        (["Hà Nội"], "Hải Phòng", False),
+        (["1000"], "", False),
+    ],
+)
+def test_answer_key_match(accepted, answer, expected):
+    assert AnswerKey(accepted).match(answer) is expected
+
+
+def test_answer_key_follows_its_own_comma_style():
+    # đáp án viết '1,25' (dấu phẩy thập phân) → '1,250' đọc là 1.25
+    key = AnswerKey(["1,25"])
+    assert key.decimal_comma is True
+    assert key.match("1,250")
+    assert key.match("1.25")
+    assert not key.match("1250")
+
+    # đáp án tự phân cách nghìn → bỏ qua config decimal_comma
+    key = AnswerKey(["1,000,000"], decimal_comma=True)
+    assert key.decimal_comma is False
+    assert key.match("1000000")
+
+
+def test_answer_key_uses_config_when_style_unknown():
+    assert AnswerKey(["1.25"], decimal_comma=True).match("1,250")
+    assert not AnswerKey(["1.25"], decimal_comma=False).match("1,250")
+
+
+def test_answer_key_tolerance():
+    key = AnswerKey(["3.14"], tolerance=0.01)
+    assert key.match("3.141")
+    assert key.match("3,15")
+    assert not key.match("3.2")
+
+
+def test_answer_key_fuzzy_distance():
+    key = AnswerKey(["Hà Nội"])
+    assert key.match("ha noj", fuzzy_distance=1)
+    assert not key.match("ha noj")
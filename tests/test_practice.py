@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import ReviewState
+from app.practice import (
+    MAX_INTERVAL_DAYS,
+    MIN_EASE,
+    QUALITY_CORRECT,
+    QUALITY_WRONG,
+    START_EASE,
+    draw_practice_ids,
+    next_state,
+    record_reviews,
+)
+
+NOW = datetime(2026, 1, 1, 8, 0)
+RELEARN_MINUTES = 10
+
+
+def _next(state, quality):
+    return next_state(state, quality, NOW, RELEARN_MINUTES)
+
+
+def test_first_correct_answers_follow_sm2_intervals():
+    state, due_at = _next(None, QUALITY_CORRECT)
+    assert state == (1, 1, START_EASE, 0)
+    assert due_at == NOW + timedelta(days=1)
+
+    state, due_at = _next(state, QUALITY_CORRECT)
+    assert state == (2, 6, START_EASE, 0)
+
+    state, due_at = _next(state, QUALITY_CORRECT)
+    assert state == (3, 15, START_EASE, 0)
+    assert due_at == NOW + timedelta(days=15)
+
+
+def test_perfect_answer_raises_ease():
+    state, _ = _next(None, 5)
+    assert state[2] == START_EASE + 10
+
+
+def test_wrong_answer_relearns_soon_and_lowers_ease():
+    state, due_at = _next((3, 15, START_EASE, 0), QUALITY_WRONG)
+    assert state == (0, 1, 196, 1)
+    assert due_at == NOW + timedelta(minutes=RELEARN_MINUTES)
+
+
+@pytest.mark.parametrize("quality", [0, 1, 2])
+def test_ease_never_drops_below_minimum(quality):
+    state = None
+    for _ in range(10):
+        state, _ = _next(state, quality)
+    assert state[2] == MIN_EASE
+    assert state[3] == 10
+
+
+def test_interval_is_capped():
+    state, _ = _next((5, 3000, START_EASE, 0), QUALITY_CORRECT)
+    assert state[1] == MAX_INTERVAL_DAYS
+
+
+def test_draw_puts_due_questions_first(quiz, make_user, make_question):
+    quiz.mode = "practice"
+    db.session.commit()
+    known, _ = make_question(quiz, [("A", True)])
+    weak, _ = make_question(quiz, [("A", True)])
+    new, _ = make_question(quiz, [("A", True)])
+    alice = make_user("alice")
+
+    record_reviews(alice.id, quiz.id, [(known.id, QUALITY_CORRECT), (weak.id, QUALITY_WRONG)], NOW)
+    db.session.commit()
+    assert ReviewState.query.count() == 2
+
+    later = NOW + timedelta(hours=1)
+    assert draw_practice_ids(quiz, alice.id, k=1, now=later) == [weak.id]
+    assert set(draw_practice_ids(quiz, alice.id, k=2, now=later)) == {weak.id, new.id}
+    assert set(draw_practice_ids(quiz, alice.id, k=3, now=later)) == {known.id, weak.id, new.id}
+
+    # câu sai trả lời đúng lại → lên lịch theo ngày, cập nhật tại chỗ (upsert)
+    record_reviews(alice.id, quiz.id, [(weak.id, QUALITY_CORRECT)], later)
+    db.session.commit()
+    state = db.session.get(ReviewState, (alice.id, weak.id))
+    assert (state.repetitions, state.lapses) == (1, 1)
+    assert state.due_at == later + timedelta(days=1)
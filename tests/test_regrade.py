@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app.regrade as regrade
+from app import db
+from app.models import Answer, Certificate, Choice, Quiz, RegradeJob, Submission
+from app.regrade import create_job, regrade_questions, run_job
+from app.stats import get_stats, rebuild_stats
+
+
+class _Killed(BaseException):
+    """Process chết giữa chừng (không phải Exception → job không bị đánh failed)."""
+
+
+@pytest.fixture
+def flipped_mcq(quiz, make_user, make_question, make_submission):
+    """5 bài chọn A (đúng), sau đó đổi đáp án đúng sang B."""
+    question, (a, b) = make_question(quiz, [("A", True), ("B", False)])
+    alice = make_user("alice")
+    for _ in range(5):
+        make_submission(alice, quiz, [(question, a, True)])
+    rebuild_stats()
+    assert get_stats(alice.id, quiz.id).best_score == 10.0
+
+    a.is_correct = False
+    b.is_correct = True
+    db.session.commit()
+    return question, alice
+
+
+def test_regrade_mcq_updates_answers_totals_and_stats(quiz, flipped_mcq):
+    question, alice = flipped_mcq
+
+    result = regrade_questions([question.id], chunk_size=2)
+
+    assert (result.answers, result.submissions) == (5, 5)
+    assert Answer.query.filter_by(is_correct=True).count() == 0
+    assert {(s.correct_answers, s.score) for s in Submission.query} == {(0, 0.0)}
+    db.session.expire_all()
+    assert get_stats(alice.id, quiz.id).best_score == 0.0
+    assert db.session.get(Quiz, quiz.id).results_version == 1
+
+
+def test_regrade_fill_in_uses_grading_engine(quiz, make_user, make_question, make_submission):
+    question, (accepted,) = make_question(quiz, [("1000", True)], type="fill_in")
+    alice = make_user("alice")
+    for answer, is_correct in [("1,000", True), ("1000", True), ("999", False), ("", False)]:
+        make_submission(alice, quiz, [(question, answer, is_correct)])
+
+    accepted.content = "999"
+    db.session.commit()
+    result = regrade_questions([question.id])
+
+    assert result.answers == 3
+    verdicts = {a.user_answer: a.is_correct for a in Answer.query}
+    assert verdicts == {"1,000": False, "1000": False, "999": True, None: False}
+
+
+def test_regrade_fill_in_many_distinct_values(
+    quiz, make_user, make_question, make_submission, monkeypatch
+):
+    # quá MAX_IN_VALUES giá trị khác nhau → chấm từng lô trong Python
+    monkeypatch.setattr(regrade, "MAX_IN_VALUES", 2)
+    question, (accepted,) = make_question(quiz, [("1", True)], type="fill_in")
+    alice = make_user("alice")
+    for value in ["1", "2", "3", "4", "5"]:
+        make_submission(alice, quiz, [(question, value, value == "1")])
+
+    accepted.content = "3"
+    db.session.commit()
+    result = regrade_questions([question.id], chunk_size=2)
+
+    assert result.answers == 2
+    assert [a.user_answer for a in Answer.query.filter_by(is_correct=True)] == ["3"]
+
+
+def test_regrade_job_resumes_after_crash(quiz, flipped_mcq, monkeypatch):
+    question, alice = flipped_mcq
+    job_id = create_job(question).id
+
+    # chết sau khi các lô answers đã commit, trước khi dựng lại rollup
+    def crash(pairs=None):
+        raise _Killed
+
+    with monkeypatch.context() as m:
+        m.setattr(regrade, "rebuild_stats", crash)
+        with pytest.raises(_Killed):
+            run_job(job_id)
+    db.session.rollback()
+
+    job = db.session.get(RegradeJob, job_id)
+    assert (job.status, job.answers_changed, job.submissions_changed) == ("running", 5, 5)
+    assert get_stats(alice.id, quiz.id).best_score == 10.0
+
+    # job running chưa quá REGRADE_STALE_SECONDS: chưa được nhận lại
+    assert run_job(job_id) is None
+    job.started_at = datetime.utcnow() - timedelta(hours=2)
+    db.session.commit()
+
+    result = run_job(job_id)
+    db.session.expire_all()
+    job = db.session.get(RegradeJob, job_id)
+    # lần chạy lại không còn answer nào đổi nhưng vẫn giữ tiến độ và dựng lại rollup
+    assert (job.status, job.answers_changed, job.submissions_changed) == ("done", 5, 5)
+    assert result.answers == 5
+    assert get_stats(alice.id, quiz.id).best_score == 0.0
+    assert db.session.get(Quiz, quiz.id).results_version == 2
+
+
+def test_regrade_job_reports_invalid_certificates(quiz, flipped_mcq):
+    question, alice = flipped_mcq
+    db.session.add(Certificate(user_id=alice.id, quiz_id=quiz.id, file_path="c.pdf"))
+    db.session.commit()
+
+    result = run_job(create_job(question).id)
+
+    assert [(c["user_id"], c["best_score"]) for c in result.invalid_certificates] == [
+        (alice.id, 0.0)
+    ]
+    assert Choice.query.filter_by(is_correct=True).count() == 1
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+from app import archive, db
+from app.archive import archive_submissions
+from app.models import (
+    ArchivedSubmission,
+    Question,
+    Quiz,
+    QuizScoreHistogram,
+    RegradeJob,
+    Submission,
+    User,
+    UserQuizStats,
+)
+from app.stats import get_stats, rebuild_stats
+from app.tasks import _purge_question_internal, _purge_quiz_internal, _purge_user_internal
+
+OLD = datetime.utcnow() - timedelta(days=400)
+
+
+def test_purge_user_removes_rows_from_archive_files(
+    quiz, make_user, make_question, make_submission
+):
+    question, (right, wrong) = make_question(quiz, [("A", True), ("B", False)])
+    alice = make_user("alice")
+    bob = make_user("bob")
+    make_submission(alice, quiz, [(question, right, True)], created_at=OLD)
+    bob_sub_id = make_submission(bob, quiz, [(question, wrong, False)], created_at=OLD).id
+    assert archive_submissions() == 2
+
+    alice_id, quiz_id = alice.id, quiz.id
+    alice.deleted_at = datetime.utcnow()
+    db.session.commit()
+    _purge_user_internal(alice_id)
+
+    records = list(archive.iter_submissions())
+    assert [r.user_id for r in records] == [bob.id]
+    assert [a.choice_id for a in records[0].answers] == [wrong.id]
+    assert ArchivedSubmission.query.filter_by(user_id=alice_id).count() == 0
+    assert [r.id for r in archive.user_submissions(bob.id)] == [bob_sub_id]
+    # histogram dựng lại từ archive không còn bài của alice
+    assert sum(h.count for h in QuizScoreHistogram.query.filter_by(quiz_id=quiz_id)) == 1
+    assert db.session.get(User, alice_id) is None
+
+
+def test_purge_question_recomputes_totals_and_stats(
+    quiz, make_user, make_question, make_submission
+):
+    kept, (kept_right, _) = make_question(quiz, [("A", True), ("B", False)])
+    purged, (_, purged_wrong) = make_question(quiz, [("A", True), ("B", False)])
+    alice = make_user("alice")
+    submission = make_submission(
+        alice, quiz, [(kept, kept_right, True), (purged, purged_wrong, False)]
+    )
+    rebuild_stats()
+    assert get_stats(alice.id, quiz.id).best_score == 5.0
+
+    purged_id = purged.id
+    purged.deleted_at = datetime.utcnow()
+    db.session.commit()
+    _purge_question_internal(purged_id)
+    db.session.expire_all()
+
+    submission = db.session.get(Submission, submission.id)
+    assert (submission.total_questions, submission.correct_answers) == (1, 1)
+    assert submission.score == 10.0
+    assert get_stats(alice.id, quiz.id).best_score == 10.0
+    assert db.session.get(Quiz, quiz.id).results_version == 1
+    assert db.session.get(Question, purged_id) is None
+
+
+def test_purge_quiz_removes_regrade_jobs(quiz, make_user, make_question, make_submission):
+    question, (right, _) = make_question(quiz, [("A", True), ("B", False)])
+    make_submission(make_user("alice"), quiz, [(question, right, True)])
+    rebuild_stats()
+    db.session.add(RegradeJob(quiz_id=quiz.id, question_ids=[question.id]))
+    quiz_id = quiz.id
+    quiz.deleted_at = datetime.utcnow()
+    db.session.commit()
+
+    _purge_quiz_internal(quiz_id)
+
+    assert RegradeJob.query.count() == 0
+    assert Submission.query.count() == 0
+    assert UserQuizStats.query.count() == 0
+    assert Question.query.count() == 0
+    assert db.session.get(Quiz, quiz_id) is None
@@ -0,0 +1,16 @@
+"""
+Entry point WSGI cho production:
+
+    gunicorn -c gunicorn.conf.py
+
+gunicorn.conf.py bật preload_app nên module này chạy một lần trong master:
+app được tạo + làm nóng cache trước khi fork, các worker dùng chung bộ nhớ
+đó (copy-on-write). run.py vẫn dùng cho dev server và flask CLI.
+"""
+from app import create_app
+from app.warmup import warm_up
+
+app = create_app()
+
+if app.config.get("WARMUP_ON_LOAD", True):
+    warm_up(app)